@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Rendering benchmark
+Renders synthetic SRS documents of a given length to each output format and
+all formats together (one parse), reporting render time, output size and
+peak Python memory (tracemalloc)
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, 'lambda')
+
+from render import RENDERERS, render_documents
+
+WORDS = ('system shall order cart customer payment service request response validate store '
+         'module record update status discount product inventory shipping address total '
+         'invoice account session token retry timeout queue report audit price tax').split()
+
+def sentence(rng, length):
+    words = [rng.choice(WORDS) for _ in range(length)]
+    if rng.random() < 0.3:
+        words[rng.randrange(length)] = f"**{rng.choice(WORDS)}**"
+    if rng.random() < 0.2:
+        words[rng.randrange(length)] = f"`{rng.choice(WORDS).title()}Service`"
+    return ' '.join(words).capitalize() + '.'
+
+def synthetic_spec(word_target, seed=7):
+    """Markdown shaped like a generated SRS: sections, prose, lists, tables, code"""
+    rng = random.Random(seed)
+    parts = ['# Software Requirements Specification', '**Module:** Benchmark  ', '**Version:** 1.0', '', '---']
+    words = 0
+    section = 0
+    while words < word_target:
+        section += 1
+        parts.append(f"\n## {section}. Section {section}\n")
+        for block in range(6):
+            kind = rng.random()
+            if kind < 0.5:
+                text = ' '.join(sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(3, 6)))
+                parts.append(text + '\n')
+            elif kind < 0.75:
+                items = [f"- {sentence(rng, rng.randint(5, 14))}" for _ in range(rng.randint(3, 7))]
+                text = '\n'.join(items)
+                parts.append(text + '\n')
+            elif kind < 0.9:
+                rows = [f"| FR-{section}.{row} | {sentence(rng, 8)} | {rng.choice(['High', 'Medium', 'Low'])} |"
+                        for row in range(rng.randint(3, 8))]
+                text = '| ID | Requirement | Priority |\n|---|---|---|\n' + '\n'.join(rows)
+                parts.append(text + '\n')
+            else:
+                text = '```csharp\n' + '\n'.join(
+                    f"public void {rng.choice(WORDS).title()}(int id) {{ /* {sentence(rng, 6)} */ }}"
+                    for _ in range(rng.randint(3, 10))
+                ) + '\n```'
+                parts.append(text + '\n')
+            words += len(text.split())
+    return '\n'.join(parts)
+
+def measure(markdown, formats, repeat):
+    """Best-of-repeat render time (ms), output sizes and peak traced memory (MB)"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        outputs = render_documents(markdown, formats)
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    render_documents(markdown, formats)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, sum(len(data) for _, data, _ in outputs), peak / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Markdown rendering')
+    parser.add_argument('--words', type=int, nargs='+', default=[3000, 30000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    format_sets = [[name] for name in RENDERERS] + [list(RENDERERS)]
+    print(f"{'words':>7} {'formats':<16} {'ms':>9} {'output KB':>10} {'peak MB':>8}")
+    for word_target in args.words:
+        markdown = synthetic_spec(word_target)
+        for formats in format_sets:
+            elapsed, size, peak = measure(markdown, formats, args.repeat)
+            print(f"{word_target:>7} {','.join(formats):<16} {elapsed:>9.1f} {size / 1024:>10.1f} {peak:>8.2f}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Cold-import budget check
+Imports every Lambda handler module named in the CDK stack in a fresh Python
+process and fails (exit 1) when any of them takes longer than the budget.
+Handlers should defer heavy work - boto3, clients, rarely used libraries - to
+first use (see lambda/runtime.py); the slowest imports of an over-budget
+module are listed to show what to defer.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+STACK_FILE = os.path.join('lib', 'docgenius-worker-stack.ts')
+LAMBDA_DIR = 'lambda'
+DEFAULT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', '150'))
+
+# Module-level settings read with os.environ[...] need some value to import
+PLACEHOLDER_ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'JOB_TABLE': 'import-check',
+    'INPUT_BUCKET': 'import-check',
+    'OUTPUT_BUCKET': 'import-check',
+    'STATE_MACHINE_ARN': 'arn:aws:states:us-east-1:000000000000:stateMachine:import-check',
+    'BEDROCK_MODEL_ID': 'import-check',
+    'MAX_TOKENS': '4000'
+}
+
+# Run in the child: time the import, then report whether it pulled in boto3
+PROBE = (
+    "import importlib, sys, time\n"
+    "started = time.perf_counter()\n"
+    "importlib.import_module(sys.argv[1])\n"
+    "print((time.perf_counter() - started) * 1000, 'boto3' in sys.modules)\n"
+)
+
+def handler_modules(stack_file):
+    """Modules named by the stack's Lambda 'handler' properties, in order"""
+    with open(stack_file) as f:
+        source = f.read()
+    modules = re.findall(r"handler:\s*'([\w.]+)\.\w+'", source)
+    return list(dict.fromkeys(modules))
+
+def probe(module, env):
+    """(import ms, imported boto3) from one fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE, module],
+        cwd=LAMBDA_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+    elapsed, loaded_boto3 = result.stdout.split()
+    return float(elapsed), loaded_boto3 == 'True'
+
+def slowest_imports(module, env, count):
+    """Top imports by cumulative time, from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=LAMBDA_DIR, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)', line)
+        # Direct imports of the module (one level of indent) are what it can defer
+        if match and len(match.group(2)) == 3:
+            rows.append((int(match.group(1)) / 1000, match.group(3)))
+    return sorted(rows, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail when a Lambda handler module imports too slowly')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=5, help='fresh imports per module; the median is compared')
+    parser.add_argument('--show', type=int, default=5, help='slowest imports listed for over-budget modules')
+    parser.add_argument('modules', nargs='*', help='modules to check (default: every handler in the stack)')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    for name, value in PLACEHOLDER_ENV.items():
+        env.setdefault(name, value)
+    # Bytecode is written on the first (uncounted) run, as the deployed package would carry it
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    modules = args.modules or handler_modules(STACK_FILE)
+    print(f"{'module':<20} {'median ms':>10} {'max ms':>8} {'boto3':>6}  budget {args.budget_ms:.0f} ms")
+    over = []
+    for module in modules:
+        try:
+            probe(module, env)
+            samples = [probe(module, env) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{module:<20} import failed: {e}")
+            over.append(module)
+            continue
+        median = statistics.median(elapsed for elapsed, _ in samples)
+        loaded_boto3 = any(loaded for _, loaded in samples)
+        flag = '  OVER' if median > args.budget_ms else ''
+        print(f"{module:<20} {median:>10.1f} {max(e for e, _ in samples):>8.1f} {'yes' if loaded_boto3 else 'no':>6}{flag}")
+        if median > args.budget_ms:
+            over.append(module)
+            for elapsed, name in slowest_imports(module, env, args.show):
+                print(f"{'':<22}{elapsed:>8.1f} ms  {name}")
+
+    if over:
+        print(f"Import budget exceeded: {', '.join(over)}")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+import json
+import os
+from collections import defaultdict, deque
+
+DISPATCH_QUEUE_URL = os.environ.get('DISPATCH_QUEUE_URL')
+
+# Descriptor 'priority' -> class; lower classes are admitted first
+PRIORITY_CLASSES = {'interactive': 0, 'normal': 1, 'bulk': 2}
+DEFAULT_PRIORITY = 'normal'
+DEFAULT_TENANT = 'default'
+
+# A waiting job moves up one priority class per this many seconds, so bulk work is never starved
+PRIORITY_AGING_SECONDS = int(os.environ.get('PRIORITY_AGING_SECONDS', '900'))
+
+def admission_fields(descriptor):
+    """Tenant and priority class recorded on a job when it is queued"""
+    priority = str(descriptor.get('priority') or DEFAULT_PRIORITY).lower()
+    if priority not in PRIORITY_CLASSES:
+        priority = DEFAULT_PRIORITY
+    return {
+        'tenant': str(descriptor.get('tenant') or DEFAULT_TENANT),
+        'priority': priority
+    }
+
+def signal_dispatch(sqs, reason):
+    """Wake the dispatcher; the jobs table, not the message, is the queue"""
+    if not DISPATCH_QUEUE_URL:
+        return
+    try:
+        sqs.send_message(QueueUrl=DISPATCH_QUEUE_URL, MessageBody=json.dumps({'reason': reason}))
+    except Exception as e:
+        # The scheduled dispatch picks the job up within a minute anyway
+        print(f"Error signalling dispatcher ({reason}): {e}")
+
+def effective_class(job, now_ms):
+    """Priority class after aging"""
+    base = PRIORITY_CLASSES.get(job.get('priority'), PRIORITY_CLASSES[DEFAULT_PRIORITY])
+    waited = max(0, now_ms - int(job.get('queuedAt', now_ms))) / 1000
+    return max(0, base - int(waited // PRIORITY_AGING_SECONDS))
+
+def schedule(queued_jobs, in_flight_by_tenant, now_ms):
+    """Order queued jobs for admission.
+
+    Lower (aged) priority classes go first. Within a class the next slot goes
+    to the tenant with the fewest jobs in flight or already scheduled ahead,
+    so one tenant's bulk run cannot crowd out others; ties go to the oldest job.
+    """
+    by_tenant = defaultdict(list)
+    for job in queued_jobs:
+        by_tenant[job.get('tenant', DEFAULT_TENANT)].append(job)
+    heads = {
+        tenant: deque(sorted(jobs, key=lambda job: (effective_class(job, now_ms), int(job.get('queuedAt', 0)))))
+        for tenant, jobs in by_tenant.items()
+    }
+    load = defaultdict(int, in_flight_by_tenant)
+
+    order = []
+    while heads:
+        tenant = min(heads, key=lambda t: (
+            effective_class(heads[t][0], now_ms), load[t], int(heads[t][0].get('queuedAt', 0))
+        ))
+        order.append(heads[tenant].popleft())
+        load[tenant] += 1
+        if not heads[tenant]:
+            del heads[tenant]
+    return order
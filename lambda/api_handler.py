@@ -1,106 +1,592 @@
 import json
-import boto3
+import base64
+import binascii
+import io
+import math
+import runtime
+import threading
 import uuid
 import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import unquote_plus
 from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+from admission import admission_fields, signal_dispatch
+from errors import BadRequest
+from jobs import cleanup_bucket
+from webhooks import callback_fields
+import dedup
+import metrics
+import model_router
+import source_manifest
+import source_selection
 
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-stepfunctions = boto3.client('stepfunctions')
+s3 = runtime.lazy_client('s3')
+sqs = runtime.lazy_client('sqs')
 
 INPUT_BUCKET = os.environ['INPUT_BUCKET']
+OUTPUT_BUCKET = os.environ.get('OUTPUT_BUCKET')
 JOB_TABLE = os.environ['JOB_TABLE']
-STATE_MACHINE_ARN = os.environ['STATE_MACHINE_ARN']
 
+# Two-phase (presigned) upload settings
+MAX_ARCHIVE_BYTES = int(os.environ.get('MAX_ARCHIVE_BYTES', str(50 * 1024 * 1024)))
+UPLOAD_URL_EXPIRY = int(os.environ.get('UPLOAD_URL_EXPIRY', '900'))  # 15 minutes
+MULTIPART_THRESHOLD_BYTES = int(os.environ.get('MULTIPART_THRESHOLD_BYTES', str(16 * 1024 * 1024)))
+MULTIPART_PART_SIZE = int(os.environ.get('MULTIPART_PART_SIZE', str(8 * 1024 * 1024)))
+
+# ?mode=sync: archives up to this size are generated in-process and returned directly
+SYNC_MAX_ARCHIVE_BYTES = int(os.environ.get('SYNC_MAX_ARCHIVE_BYTES', str(256 * 1024)))
+# Stay under API Gateway's 29 s integration timeout; slower jobs continue asynchronously
+SYNC_TIMEOUT_SECONDS = float(os.environ.get('SYNC_TIMEOUT_SECONDS', '25'))
+
+# POST /generate-spec/batch: one archive, up to this many descriptors
+MAX_BATCH_JOBS = int(os.environ.get('MAX_BATCH_JOBS', '100'))
+
+ARCHIVE_NAME = 'archive.zip'
+
+@metrics.instrumented('ApiHandler')
 def handler(event, context):
     try:
+        # POST /generate-spec/{jobId}/complete finalizes a presigned upload
+        path_parameters = event.get('pathParameters') or {}
+        if path_parameters.get('jobId'):
+            return finalize_upload(path_parameters['jobId'], event)
+
+        # POST /generate-spec/batch shares one archive across many descriptors
+        if event.get('resource') == '/generate-spec/batch':
+            return submit_batch(event)
+
         # Generate job ID
         job_id = str(uuid.uuid4())
-        
-        # Parse multipart form data (simplified for PoC)
-        body = event.get('body', '')
-        if event.get('isBase64Encoded'):
-            import base64
-            body = base64.b64decode(body).decode('utf-8')
-        
-        # For PoC, assume JSON payload with archive and descriptor
+
+        # Parse multipart form data (simplified for PoC);
+        # for PoC, assume JSON payload with archive and descriptor
         try:
+            body = event.get('body', '')
+            if event.get('isBase64Encoded'):
+                body = base64.b64decode(body).decode('utf-8')
             payload = json.loads(body)
             archive_content = payload.get('archive')
             descriptor = payload.get('descriptor')
         except:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Invalid JSON payload'})
-            }
-        
+            return response(400, {'error': 'Invalid JSON payload'})
+
+        # Reject a bad callbackUrl or job setting before anything is stored
+        if isinstance(descriptor, dict):
+            check_descriptor(descriptor)
+            # A delta submission carries only changed files on top of a finished job
+            if payload.get('baseJobId') is not None:
+                descriptor = delta_descriptor(descriptor, payload)
+
+        # Without an inline archive the client asks for upload URLs instead
+        if descriptor and not archive_content and 'archiveSize' in payload:
+            return create_upload_job(job_id, descriptor, payload['archiveSize'], request_header(event, 'Idempotency-Key'))
+
         if not archive_content or not descriptor:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Both archive and descriptor required'})
-            }
-        
-        # Store files in S3
-        input_key = f"{job_id}/archive.zip"
-        descriptor_key = f"{job_id}/descriptor.json"
-        
+            return response(400, {'error': 'Both archive and descriptor required'})
+
         # Store archive (base64 decoded)
-        import base64
-        archive_data = base64.b64decode(archive_content)
+        archive_data = decode_archive(archive_content)
+        metrics.add('bytesIn', len(archive_data))
+
+        # A retried or concurrent duplicate gets the job already submitted
+        with metrics.span('dedup'):
+            existing, claims = dedup.find_duplicate(
+                runtime.table(JOB_TABLE), job_id, archive_data, descriptor,
+                request_header(event, 'Idempotency-Key')
+            )
+        if existing:
+            return response(202, {'jobId': existing['jobId'], 'status': existing['status'], 'deduplicated': True})
+
+        try:
+            return submit_job(job_id, archive_data, descriptor, event)
+        except Exception:
+            dedup.release(runtime.table(JOB_TABLE), claims, job_id)
+            raise
+
+    except dedup.IdempotencyKeyReused as e:
+        return response(422, {'error': str(e)})
+    except dedup.SubmissionInProgress as e:
+        return response(409, {'error': str(e), 'jobId': e.job_id})
+    except BadRequest as e:
+        return response(400, {'error': str(e)})
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return response(500, {'error': 'Internal server error'})
+
+def submit_job(job_id, archive_data, descriptor, event):
+    """Store an inline submission and queue it (or run it now with ?mode=sync)"""
+    # Small archives can skip the workflow entirely with ?mode=sync
+    query = event.get('queryStringParameters') or {}
+    if query.get('mode') == 'sync' and len(archive_data) <= SYNC_MAX_ARCHIVE_BYTES:
+        return run_sync(job_id, archive_data, descriptor)
+
+    # Store files in S3
+    input_key = f"{job_id}/{ARCHIVE_NAME}"
+    descriptor_key = f"{job_id}/descriptor.json"
+
+    with metrics.span('upload'):
         s3.put_object(
             Bucket=INPUT_BUCKET,
             Key=input_key,
             Body=archive_data,
             ContentType='application/zip'
         )
-        
+
         # Store descriptor
-        s3.put_object(
+        store_descriptor(descriptor_key, descriptor)
+
+    # Create job record in DynamoDB
+    with metrics.span('record'):
+        put_job_record(job_id, 'Queued', input_key, descriptor_key, admission=job_fields(descriptor))
+
+        # The dispatcher starts the Step Functions execution when there is capacity
+        enqueue_job(job_id)
+
+    return response(202, {'jobId': job_id})
+
+def delta_descriptor(descriptor, payload):
+    """The descriptor of a delta submission, with baseJobId and deletedFiles folded in.
+
+    BadRequest unless the base job succeeded for the same tenant and the
+    archives its sources come from have not expired. A base generated by map-reduce passes
+    the mode on, so only the changed files are summarized again.
+    """
+    base_job_id = payload['baseJobId']
+    deleted_files = payload.get('deletedFiles') or []
+    if not isinstance(base_job_id, str) or not isinstance(deleted_files, list) \
+            or not all(isinstance(name, str) for name in deleted_files):
+        raise BadRequest('baseJobId must be a job ID and deletedFiles a list of file paths')
+
+    base = runtime.table(JOB_TABLE).get_item(
+        Key={'jobId': base_job_id},
+        ProjectionExpression='#status, tenant, sourcesKey, generationMode',
+        ExpressionAttributeNames={'#status': 'status'}
+    ).get('Item')
+    if not base or base.get('tenant') != admission_fields(descriptor)['tenant']:
+        raise BadRequest(f'Base job {base_job_id} not found')
+    if base.get('status') != 'Succeeded' or 'sourcesKey' not in base:
+        raise BadRequest(f'Base job {base_job_id} has no stored sources to build on')
+    # Chained deltas read files from older jobs' archives, which expire first
+    try:
+        for key in source_manifest.archive_keys(source_manifest.load(s3, OUTPUT_BUCKET, base['sourcesKey'])):
+            s3.head_object(Bucket=OUTPUT_BUCKET, Key=key)
+    except ClientError:
+        raise BadRequest(f'Sources of base job {base_job_id} have expired; submit the full archive')
+
+    descriptor = dict(descriptor, baseJobId=base_job_id, deletedFiles=deleted_files)
+    if base.get('generationMode') == 'map-reduce':
+        descriptor.setdefault('generationMode', 'map-reduce')
+    return descriptor
+
+def submit_batch(event):
+    """Queue one job per descriptor against a single stored archive"""
+    # A batch has no single job for a key to name; refuse rather than silently ignore it
+    if request_header(event, 'Idempotency-Key') is not None:
+        return response(400, {'error': 'Idempotency-Key is not supported for batch submissions'})
+
+    try:
+        body = event.get('body', '')
+        if event.get('isBase64Encoded'):
+            body = base64.b64decode(body).decode('utf-8')
+        payload = json.loads(body)
+        archive_content = payload.get('archive')
+        descriptors = payload.get('descriptors')
+    except (ValueError, AttributeError):
+        return response(400, {'error': 'Invalid JSON payload'})
+
+    if not archive_content or not isinstance(descriptors, list) or not descriptors:
+        return response(400, {'error': 'archive and a non-empty descriptors list required'})
+    if len(descriptors) > MAX_BATCH_JOBS:
+        return response(400, {'error': f'At most {MAX_BATCH_JOBS} descriptors per batch'})
+    if not all(isinstance(descriptor, dict) for descriptor in descriptors):
+        return response(400, {'error': 'Every descriptor must be an object'})
+    for descriptor in descriptors:
+        check_descriptor(descriptor)
+
+    batch_id = str(uuid.uuid4())
+    input_key = f"batches/{batch_id}/{ARCHIVE_NAME}"
+    descriptor_key = f"batches/{batch_id}/descriptors.json"
+
+    # One archive and one descriptor list, whatever the batch size
+    s3.put_object(
+        Bucket=INPUT_BUCKET,
+        Key=input_key,
+        Body=decode_archive(archive_content),
+        ContentType='application/zip'
+    )
+    store_descriptor(descriptor_key, descriptors)
+
+    job_ids = [str(uuid.uuid4()) for _ in descriptors]
+    table = runtime.table(JOB_TABLE)
+    with table.batch_writer() as batch:
+        for index, (job_id, descriptor) in enumerate(zip(job_ids, descriptors)):
+            item = job_record(job_id, 'Queued', input_key, descriptor_key, admission=job_fields(descriptor))
+            item.update({'batchId': batch_id, 'descriptorIndex': index})
+            batch.put_item(Item=item)
+
+    # A single signal: the dispatcher admits the whole batch as capacity allows
+    signal_dispatch(sqs, f"batch {batch_id} ({len(job_ids)} jobs)")
+
+    return response(202, {'batchId': batch_id, 'jobIds': job_ids})
+
+def run_sync(job_id, archive_data, descriptor):
+    """Generate a small job in-process and return its outputs in the response.
+
+    If generation outlasts SYNC_TIMEOUT_SECONDS the in-process attempt is
+    cancelled and the job is handed to the async workflow (202, as usual).
+    """
+    # Only the sync path needs the generator and its configuration
+    import spec_generator
+
+    table = runtime.table(JOB_TABLE)
+    admission = job_fields(descriptor)
+    attempt = str(uuid.uuid4())
+    start_time = put_job_record(job_id, 'Running', None, None, admission=admission, attempt=attempt)
+
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future = executor.submit(
+            spec_generator.generate_spec, job_id, io.BytesIO(archive_data), descriptor, table, start_time,
+            stream=False, cancelled=cancelled, attempt=attempt
+        )
+        result = future.result(timeout=SYNC_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        cancelled.set()
+        print(f"Sync generation for job {job_id} exceeded {SYNC_TIMEOUT_SECONDS}s; continuing asynchronously")
+        input_key = f"{job_id}/{ARCHIVE_NAME}"
+        descriptor_key = f"{job_id}/descriptor.json"
+        s3.put_object(Bucket=INPUT_BUCKET, Key=input_key, Body=archive_data, ContentType='application/zip')
+        store_descriptor(descriptor_key, descriptor)
+        # Lambda may thaw the abandoned generation thread in a later invocation;
+        # a new attempt on the record keeps it from finalizing the handed-off job
+        put_job_record(job_id, 'Queued', input_key, descriptor_key, admission=admission, attempt=str(uuid.uuid4()))
+        enqueue_job(job_id)
+        return response(202, {'jobId': job_id, 'mode': 'async'})
+    except Exception as e:
+        print(f"Sync generation failed for job {job_id}: {e}")
+        spec_generator.fail_job(table, job_id, str(e), attempt)
+        return response(500, {'jobId': job_id, 'status': 'Failed', 'errorMessage': str(e)})
+    finally:
+        # Never wait for a cancelled generation
+        executor.shutdown(wait=False)
+
+    urls = {}
+    for name, key in (('downloadUrl', result['outputKey']), ('markdownUrl', f"{job_id}/spec.md")):
+        urls[name] = s3.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': spec_generator.OUTPUT_BUCKET, 'Key': key},
+            ExpiresIn=86400  # 24 hours, as in job-status
+        )
+
+    return response(200, dict(urls, jobId=job_id, status='Succeeded', mode='sync'))
+
+def create_upload_job(job_id, descriptor, archive_size, idempotency_key=None):
+    """Register a job and hand out presigned URLs for a direct-to-S3 upload.
+
+    A retry under the same Idempotency-Key gets the job it created, with fresh
+    upload URLs while the archive has still not been uploaded.
+    """
+    try:
+        archive_size = int(archive_size)
+    except (TypeError, ValueError):
+        return response(400, {'error': 'archiveSize must be an integer'})
+
+    if archive_size <= 0 or archive_size > MAX_ARCHIVE_BYTES:
+        return response(400, {'error': f'archiveSize must be between 1 and {MAX_ARCHIVE_BYTES} bytes'})
+
+    claims = []
+    if idempotency_key is not None:
+        table = runtime.table(JOB_TABLE)
+        with metrics.span('dedup'):
+            existing, claims = dedup.find_key_duplicate(
+                table, job_id, idempotency_key, descriptor, dedup.upload_request_hash(archive_size, descriptor)
+            )
+        if existing:
+            body = {'jobId': existing['jobId'], 'status': existing['status'], 'deduplicated': True}
+            # Same key and archiveSize, so the same upload layout
+            if existing['status'] == 'AwaitingUpload':
+                body['upload'] = upload_instructions(existing['jobId'], archive_size, existing.get('uploadId'))
+            return response(202, body)
+
+    try:
+        return start_upload_job(job_id, descriptor, archive_size)
+    except Exception:
+        dedup.release(runtime.table(JOB_TABLE), claims, job_id)
+        raise
+
+def start_upload_job(job_id, descriptor, archive_size):
+    """Store the descriptor, open the upload and record the job as AwaitingUpload"""
+    input_key = f"{job_id}/{ARCHIVE_NAME}"
+    descriptor_key = f"{job_id}/descriptor.json"
+
+    store_descriptor(descriptor_key, descriptor)
+
+    upload_id = None
+    if archive_size > MULTIPART_THRESHOLD_BYTES:
+        multipart = s3.create_multipart_upload(
             Bucket=INPUT_BUCKET,
-            Key=descriptor_key,
-            Body=json.dumps(descriptor),
-            ContentType='application/json'
+            Key=input_key,
+            ContentType='application/zip'
         )
-        
-        # Create job record in DynamoDB
-        table = dynamodb.Table(JOB_TABLE)
-        submit_time = int(datetime.utcnow().timestamp() * 1000)
-        expires_at = int((datetime.utcnow() + timedelta(days=30)).timestamp())
-        
-        table.put_item(
-            Item={
-                'jobId': job_id,
-                'status': 'Pending',
-                'submitTime': submit_time,
-                'inputKey': input_key,
-                'descriptorKey': descriptor_key,
-                'expiresAt': expires_at
+        upload_id = multipart['UploadId']
+    upload = upload_instructions(job_id, archive_size, upload_id)
+
+    # The S3 upload-complete event (or the finalize call) starts the job
+    put_job_record(job_id, 'AwaitingUpload', input_key, descriptor_key, upload_id=upload_id,
+                   admission=job_fields(descriptor))
+
+    return response(202, {
+        'jobId': job_id,
+        'status': 'AwaitingUpload',
+        'upload': upload
+    })
+
+def upload_instructions(job_id, archive_size, upload_id=None):
+    """Presigned URLs for uploading a job's archive: one PUT, or every part of upload_id"""
+    input_key = f"{job_id}/{ARCHIVE_NAME}"
+    if upload_id:
+        part_count = math.ceil(archive_size / MULTIPART_PART_SIZE)
+        upload = {
+            'method': 'MULTIPART',
+            'uploadId': upload_id,
+            'partSize': MULTIPART_PART_SIZE,
+            'parts': [
+                {
+                    'partNumber': part_number,
+                    'url': s3.generate_presigned_url(
+                        'upload_part',
+                        Params={
+                            'Bucket': INPUT_BUCKET,
+                            'Key': input_key,
+                            'UploadId': upload_id,
+                            'PartNumber': part_number
+                        },
+                        ExpiresIn=UPLOAD_URL_EXPIRY
+                    )
+                }
+                for part_number in range(1, part_count + 1)
+            ],
+            'completePath': f"/generate-spec/{job_id}/complete"
+        }
+    else:
+        upload = {
+            'method': 'PUT',
+            'url': s3.generate_presigned_url(
+                'put_object',
+                Params={
+                    'Bucket': INPUT_BUCKET,
+                    'Key': input_key,
+                    'ContentType': 'application/zip'
+                },
+                ExpiresIn=UPLOAD_URL_EXPIRY
+            ),
+            'headers': {'Content-Type': 'application/zip'}
+        }
+    upload['expiresIn'] = UPLOAD_URL_EXPIRY
+    return upload
+
+def finalize_upload(job_id, event):
+    """Complete a presigned upload and start the job (idempotent)"""
+    table = runtime.table(JOB_TABLE)
+    item = table.get_item(Key={'jobId': job_id}).get('Item')
+
+    if not item:
+        return response(404, {'error': 'Job not found'})
+
+    if item['status'] != 'AwaitingUpload':
+        # Already started by the S3 event or an earlier finalize call
+        return response(202, {'jobId': job_id, 'status': item['status']})
+
+    if item.get('uploadId'):
+        try:
+            body = event.get('body') or '{}'
+            if event.get('isBase64Encoded'):
+                body = base64.b64decode(body).decode('utf-8')
+            parts = json.loads(body).get('parts') or []
+            parts = sorted(
+                ({'PartNumber': int(part['partNumber']), 'ETag': part['etag']} for part in parts),
+                key=lambda part: part['PartNumber']
+            )
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return response(400, {'error': 'parts must be a list of {partNumber, etag}'})
+
+        if not parts:
+            return response(400, {'error': 'parts required to complete a multipart upload'})
+
+        try:
+            s3.complete_multipart_upload(
+                Bucket=INPUT_BUCKET,
+                Key=item['inputKey'],
+                UploadId=item['uploadId'],
+                MultipartUpload={'Parts': parts}
+            )
+        except ClientError as e:
+            print(f"Error completing multipart upload for job {job_id}: {e}")
+            return response(409, {'error': 'Archive upload is incomplete'})
+    else:
+        try:
+            s3.head_object(Bucket=INPUT_BUCKET, Key=item['inputKey'])
+        except ClientError:
+            return response(409, {'error': 'Archive has not been uploaded'})
+
+    start_uploaded_job(job_id)
+
+    return response(202, {'jobId': job_id, 'status': 'Queued'})
+
+@metrics.instrumented('UploadCompleteHandler')
+def upload_complete_handler(event, context):
+    """S3 ObjectCreated trigger: start jobs whose archive upload just finished"""
+    started = 0
+
+    for record in event.get('Records', []):
+        key = unquote_plus(record['s3']['object']['key'])
+        parts = key.split('/')
+
+        # Only {job_id}/archive.zip belongs to a job
+        if len(parts) != 2 or parts[1] != ARCHIVE_NAME:
+            continue
+
+        size = record['s3']['object'].get('size', 0)
+        if size > MAX_ARCHIVE_BYTES:
+            print(f"Archive for job {parts[0]} is {size} bytes, above the {MAX_ARCHIVE_BYTES} byte limit")
+            fail_upload_job(parts[0], 'Archive exceeds maximum size')
+            continue
+
+        try:
+            if start_uploaded_job(parts[0]):
+                started += 1
+        except Exception as e:
+            print(f"Error starting job {parts[0]} after upload: {e}")
+
+    return {'started': started}
+
+def start_uploaded_job(job_id):
+    """Move an AwaitingUpload job into the admission queue; False if already queued"""
+    table = runtime.table(JOB_TABLE)
+    upload_time = int(datetime.utcnow().timestamp() * 1000)
+
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET #status = :queued, uploadTime = :upload_time, queuedAt = :upload_time',
+            ConditionExpression='#status = :awaiting',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':queued': 'Queued',
+                ':awaiting': 'AwaitingUpload',
+                ':upload_time': upload_time
             }
         )
-        
-        # Start Step Functions execution
-        stepfunctions.start_execution(
-            stateMachineArn=STATE_MACHINE_ARN,
-            name=f"job-{job_id}",
-            input=json.dumps({
-                'jobId': job_id,
-                'inputKey': input_key,
-                'descriptorKey': descriptor_key
-            })
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+    enqueue_job(job_id)
+    return True
+
+def fail_upload_job(job_id, error_message):
+    """Mark an AwaitingUpload job as Failed without starting it"""
+    table = runtime.table(JOB_TABLE)
+
+    try:
+        table.update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET #status = :failed, errorMessage = :error',
+            ConditionExpression='#status = :awaiting',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={
+                ':failed': 'Failed',
+                ':awaiting': 'AwaitingUpload',
+                ':error': error_message
+            }
         )
-        
-        return {
-            'statusCode': 202,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'jobId': job_id})
-        }
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': 'Internal server error'})
-        }
\ No newline at end of file
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def store_descriptor(descriptor_key, descriptor):
+    """Store the feature descriptor next to the archive"""
+    s3.put_object(
+        Bucket=INPUT_BUCKET,
+        Key=descriptor_key,
+        Body=json.dumps(descriptor),
+        ContentType='application/json'
+    )
+
+def put_job_record(job_id, status, input_key, descriptor_key, upload_id=None, admission=None, attempt=None):
+    """Create the job record in DynamoDB; returns its submit time"""
+    item = job_record(job_id, status, input_key, descriptor_key, upload_id, admission)
+    if attempt:
+        # The generation attempt allowed to finalize the job (see spec_generator.complete_job)
+        item['attempt'] = attempt
+    runtime.table(JOB_TABLE).put_item(Item=item)
+    return item['submitTime']
+
+def job_record(job_id, status, input_key, descriptor_key, upload_id=None, admission=None):
+    """A new job item"""
+    submit_time = int(datetime.utcnow().timestamp() * 1000)
+    expires_at = int((datetime.utcnow() + timedelta(days=30)).timestamp())
+
+    item = {
+        'jobId': job_id,
+        'status': status,
+        'submitTime': submit_time,
+        'expiresAt': expires_at,
+        # Until cleaned, the job is listed in the cleanup-index under its submission hour
+        'cleanupBucket': cleanup_bucket(submit_time)
+    }
+    # Sync jobs never store their inputs
+    if input_key:
+        item['inputKey'] = input_key
+        item['descriptorKey'] = descriptor_key
+    if upload_id:
+        item['uploadId'] = upload_id
+    if admission:
+        item.update(admission)
+    if status == 'Queued':
+        item['queuedAt'] = submit_time
+
+    return item
+
+def job_fields(descriptor):
+    """Admission and delivery attributes recorded on a job; BadRequest if invalid"""
+    return dict(admission_fields(descriptor), **callback_fields(descriptor))
+
+def check_descriptor(descriptor):
+    """BadRequest if a descriptor's callback or job settings cannot be used"""
+    callback_fields(descriptor)
+    model_router.max_output_tokens(descriptor)
+    source_selection.descriptor_budget_bytes(descriptor)
+
+def decode_archive(archive_content):
+    """The submitted archive's bytes; BadRequest unless it is base64"""
+    try:
+        return base64.b64decode(archive_content)
+    except (binascii.Error, TypeError):
+        raise BadRequest('archive must be base64-encoded')
+
+def enqueue_job(job_id):
+    """Tell the dispatcher a job is waiting for admission"""
+    signal_dispatch(sqs, f"submitted {job_id}")
+
+def request_header(event, name):
+    """Case-insensitive request header lookup"""
+    headers = event.get('headers') or {}
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+def response(status_code, body):
+    """API Gateway proxy response with CORS headers"""
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body)
+    }
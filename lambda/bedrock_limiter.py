@@ -0,0 +1,255 @@
+import os
+import random
+import threading
+import time
+from decimal import Decimal
+
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE')
+
+# Requests per second shared by every SpecGenerator container for one model
+BEDROCK_RATE_INITIAL = float(os.environ.get('BEDROCK_RATE_INITIAL', '4'))
+BEDROCK_RATE_MIN = float(os.environ.get('BEDROCK_RATE_MIN', '0.5'))
+BEDROCK_RATE_MAX = float(os.environ.get('BEDROCK_RATE_MAX', '20'))
+BEDROCK_BURST = float(os.environ.get('BEDROCK_BURST', '8'))
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', '6'))
+BEDROCK_ACQUIRE_TIMEOUT_SECONDS = float(os.environ.get('BEDROCK_ACQUIRE_TIMEOUT_SECONDS', '120'))
+
+# AIMD: add INCREASE requests/second per rate's worth of successes, multiply by DECREASE on throttling
+RATE_INCREASE = 1.0
+RATE_DECREASE = 0.5
+# Throttles reported within this window are one congestion event, not several
+DECREASE_COOLDOWN_SECONDS = 1.0
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+
+# Compared case-insensitively: stream error events use lowerCamelCase ('throttlingException')
+THROTTLE_CODES = (
+    'throttlingexception',
+    'toomanyrequestsexception',
+    'serviceunavailableexception',
+    'modelnotreadyexception',
+)
+
+class Throttled(Exception):
+    """Raised for throttling that does not arrive as a ClientError (e.g. stream error events)"""
+
+class RateLimitTimeout(Exception):
+    """No request slot became available within the acquire timeout"""
+
+def is_throttle_code(code):
+    """True for a Bedrock throttling or capacity error code, in either casing"""
+    return bool(code) and code.lower() in THROTTLE_CODES
+
+def is_throttle(error):
+    """True for Bedrock throttling and capacity errors"""
+    if isinstance(error, Throttled):
+        return True
+    # ClientError and botocore's EventStreamError both carry response['Error']['Code']
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return is_throttle_code(code)
+
+class InMemoryBucketStore:
+    """Bucket state in process memory; the local stand-in for DynamoBucketStore"""
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            return dict(item) if item else None
+
+    def put(self, key, state, expected_version):
+        """Write state only if the stored version is still expected_version"""
+        with self._lock:
+            current = self._items.get(key)
+            if (current['version'] if current else None) != expected_version:
+                return False
+            self._items[key] = dict(state)
+            return True
+
+class DynamoBucketStore:
+    """Bucket state in a DynamoDB table, updated with optimistic conditional writes"""
+
+    def __init__(self, table):
+        self._table = table
+
+    def get(self, key):
+        item = self._table.get_item(Key={'limiterKey': key}, ConsistentRead=True).get('Item')
+        if not item:
+            return None
+        return {name: float(item[name]) if isinstance(item[name], Decimal) else item[name]
+                for name in ('tokens', 'rate', 'updatedAt', 'lastDecrease', 'version')}
+
+    def put(self, key, state, expected_version):
+        item = {name: Decimal(str(round(value, 6))) if isinstance(value, float) else value
+                for name, value in state.items()}
+        item['limiterKey'] = key
+        try:
+            if expected_version is None:
+                self._table.put_item(Item=item, ConditionExpression='attribute_not_exists(limiterKey)')
+            else:
+                self._table.put_item(
+                    Item=item,
+                    ConditionExpression='version = :expected',
+                    ExpressionAttributeValues={':expected': expected_version}
+                )
+        except Exception as e:
+            if getattr(e, 'response', {}).get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                return False
+            raise
+        return True
+
+class RateLimiter:
+    """Token bucket shared through a store, with an AIMD-adjusted refill rate.
+
+    Every container that calls a model takes a token before each request.
+    Successes slowly raise the shared rate; a throttle halves it and empties
+    the bucket, so the whole fleet backs off together instead of each
+    container discovering the limit on its own. Successes are counted
+    locally and folded into the next token write, so a call costs one
+    read-modify-write of the shared item.
+    """
+
+    def __init__(self, store, key, initial_rate=None, min_rate=None, max_rate=None, burst=None,
+                 max_retries=None, acquire_timeout=None, clock=time.time, sleep=time.sleep):
+        self._store = store
+        self._key = key
+        self._initial_rate = BEDROCK_RATE_INITIAL if initial_rate is None else initial_rate
+        self._min_rate = BEDROCK_RATE_MIN if min_rate is None else min_rate
+        self._max_rate = BEDROCK_RATE_MAX if max_rate is None else max_rate
+        self._burst = BEDROCK_BURST if burst is None else burst
+        self._max_retries = BEDROCK_MAX_RETRIES if max_retries is None else max_retries
+        self._acquire_timeout = BEDROCK_ACQUIRE_TIMEOUT_SECONDS if acquire_timeout is None else acquire_timeout
+        self._clock = clock
+        self._sleep = sleep
+        # Section threads share one limiter; guards the per-job counters and pending successes
+        self._stats_lock = threading.Lock()
+        self._successes = 0
+        self.reset_stats()
+
+    def _update(self, change):
+        """Read-modify-write the bucket; change(state, now) returns the result to hand back"""
+        while True:
+            now = self._clock()
+            state = self._store.get(self._key)
+            version = state['version'] if state else None
+            if state is None:
+                state = {'tokens': self._burst, 'rate': self._initial_rate,
+                         'updatedAt': now, 'lastDecrease': 0.0, 'version': 0}
+
+            # Refill for the time since the last update
+            elapsed = max(0.0, now - state['updatedAt'])
+            state['tokens'] = min(self._burst, state['tokens'] + elapsed * state['rate'])
+            state['updatedAt'] = now
+
+            result = change(state, now)
+            state['version'] = (version or 0) + 1
+            if self._store.put(self._key, state, version):
+                return result
+            # Lost the race with another caller; re-read and try again
+            self._sleep(random.uniform(0, 0.01))
+
+    def acquire(self):
+        """Block until a token is taken from the shared bucket, applying successes since the last write"""
+        deadline = self._clock() + self._acquire_timeout
+        successes = self._take_successes()
+
+        def take(state, now):
+            self._increase(state, successes)
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0.0
+            return (1 - state['tokens']) / state['rate']
+
+        while True:
+            wait = self._update(take)
+            successes = 0  # Written; later rounds of the wait only take tokens
+            if wait == 0.0:
+                return
+            if self._clock() + wait > deadline:
+                raise RateLimitTimeout(f"No Bedrock capacity within {self._acquire_timeout}s")
+            # Jitter so waiting containers do not all retry at the same instant
+            wait *= random.uniform(1.0, 1.5)
+            with self._stats_lock:
+                self.waited_seconds += wait
+            self._sleep(wait)
+
+    def on_success(self):
+        """Count a success; its increase is written with the next acquire"""
+        with self._stats_lock:
+            self._successes += 1
+
+    def _take_successes(self):
+        """Successes not yet applied to the shared rate, now claimed by the caller"""
+        with self._stats_lock:
+            successes, self._successes = self._successes, 0
+        return successes
+
+    def _increase(self, state, successes):
+        """Additive increase, spread over roughly one second of successful calls"""
+        for _ in range(successes):
+            state['rate'] = min(self._max_rate, state['rate'] + RATE_INCREASE / max(state['rate'], 1.0))
+
+    def on_throttle(self):
+        """Multiplicative decrease and an empty bucket, once per congestion event"""
+        # Successes from before the congestion no longer argue for a higher rate
+        self._take_successes()
+
+        def decrease(state, now):
+            if now - state['lastDecrease'] >= DECREASE_COOLDOWN_SECONDS:
+                state['rate'] = max(self._min_rate, state['rate'] * RATE_DECREASE)
+                state['lastDecrease'] = now
+            state['tokens'] = min(state['tokens'], 0.0)
+        self._update(decrease)
+
+    def rate(self):
+        """Current shared request rate"""
+        state = self._store.get(self._key)
+        return state['rate'] if state else self._initial_rate
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn under the limiter, retrying throttles with full-jitter exponential backoff"""
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_throttle(e) or attempt >= self._max_retries:
+                    raise
+                self.on_throttle()
+                delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+                print(f"Bedrock throttled (attempt {attempt + 1}); retrying in {delay:.1f}s")
+                with self._stats_lock:
+                    self.throttles += 1
+                    self.waited_seconds += delay
+                self._sleep(delay)
+                attempt += 1
+                continue
+            self.on_success()
+            return result
+
+    def reset_stats(self):
+        """Start counting for a new job (the limiter outlives invocations)"""
+        with self._stats_lock:
+            self.throttles = 0
+            self.waited_seconds = 0.0
+
+    def stats(self):
+        """Throttle and wait totals for the job record"""
+        with self._stats_lock:
+            return {
+                'bedrockThrottles': self.throttles,
+                'bedrockWaitMs': int(self.waited_seconds * 1000)
+            }
+
+def from_env(dynamodb, model_id):
+    """Limiter for model_id backed by RATE_LIMIT_TABLE, or process memory when unset"""
+    if RATE_LIMIT_TABLE:
+        store = DynamoBucketStore(dynamodb.Table(RATE_LIMIT_TABLE))
+    else:
+        store = InMemoryBucketStore()
+    return RateLimiter(store, f"bedrock:{model_id}")
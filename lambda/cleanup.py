@@ -1,101 +1,315 @@
 import json
-import boto3
+import runtime
 import os
 from datetime import datetime, timedelta
+from jobs import CLEANUP_BUCKET_FORMAT, cleanup_bucket
+from parallel import run_parallel
+import metrics
 
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3 = runtime.lazy_client('s3')
 
-INPUT_BUCKET = os.environ['INPUT_BUCKET']
-OUTPUT_BUCKET = os.environ['OUTPUT_BUCKET']
+INPUT_BUCKET = os.environ.get('INPUT_BUCKET')
+OUTPUT_BUCKET = os.environ.get('OUTPUT_BUCKET')
 JOB_TABLE = os.environ['JOB_TABLE']
 
+# Jobs are swept this long after submission
+RETENTION_HOURS = int(os.environ.get('CLEANUP_RETENTION_HOURS', '24'))
+# Stop taking new pages when the Lambda has less than this left, and checkpoint
+TIME_RESERVE_SECONDS = int(os.environ.get('CLEANUP_TIME_RESERVE_SECONDS', '30'))
+CLEANUP_CONCURRENCY = int(os.environ.get('CLEANUP_CONCURRENCY', '16'))
+
+# Width of a cleanup-index partition (admission.CLEANUP_BUCKET_FORMAT)
+BUCKET_WIDTH = timedelta(hours=1)
+# Without a checkpoint the sweep starts this far back (job records expire after 30 days)
+MAX_LOOKBACK = timedelta(days=30)
+INDEX_PAGE_SIZE = 200
+DELETE_BATCH_SIZE = 1000  # delete_objects limit
+
+# Sweep progress lives in the job table under this key
+CHECKPOINT_ID = 'cleanup#checkpoint'
+# Progress of the one-off scan that indexes jobs created before the cleanup-index
+LEGACY_SCAN_ID = 'cleanup#legacy-scan'
+
+# Attributes cleanup needs; the cleanup-index projects the same ones
+CLEANUP_ATTRIBUTES = ['jobId', 'status', 'inputKey', 'descriptorKey', 'batchId']
+
+@metrics.instrumented('Cleanup')
 def handler(event, context):
     """Clean up expired job artifacts"""
     try:
         # Handle both Step Functions invocation and EventBridge scheduled runs
         job_id = event.get('jobId')
-        
+
         if job_id:
             # Direct cleanup for specific job
             cleanup_job(job_id)
-        else:
-            # Scheduled cleanup - find expired jobs
-            cleanup_expired_jobs()
-        
-        return {'status': 'cleanup_completed'}
-        
+            return {'status': 'cleanup_completed'}
+
+        # Scheduled cleanup - sweep expired jobs, resuming from the last checkpoint
+        return dict(cleanup_expired_jobs(context), status='cleanup_completed')
+
     except Exception as e:
         print(f"Error during cleanup: {str(e)}")
         return {'status': 'cleanup_failed', 'error': str(e)}
 
 def cleanup_job(job_id):
     """Clean up artifacts for a specific job"""
-    try:
-        # Get job details
-        table = dynamodb.Table(JOB_TABLE)
-        response = table.get_item(Key={'jobId': job_id})
-        
-        if 'Item' not in response:
-            print(f"Job {job_id} not found")
-            return
-        
-        job = response['Item']
-        
-        # Delete input files
-        if 'inputKey' in job:
-            try:
-                s3.delete_object(Bucket=INPUT_BUCKET, Key=job['inputKey'])
-                print(f"Deleted input: {job['inputKey']}")
-            except Exception as e:
-                print(f"Error deleting input {job['inputKey']}: {e}")
-        
-        if 'descriptorKey' in job:
-            try:
-                s3.delete_object(Bucket=INPUT_BUCKET, Key=job['descriptorKey'])
-                print(f"Deleted descriptor: {job['descriptorKey']}")
-            except Exception as e:
-                print(f"Error deleting descriptor {job['descriptorKey']}: {e}")
-        
-        # Delete output files (optional - may keep for download period)
-        if job.get('status') == 'Failed' and 'outputKey' in job:
-            try:
-                s3.delete_object(Bucket=OUTPUT_BUCKET, Key=job['outputKey'])
-                print(f"Deleted failed output: {job['outputKey']}")
-            except Exception as e:
-                print(f"Error deleting output {job['outputKey']}: {e}")
-        
-        # Update job status
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression='SET cleanupTime = :cleanup_time',
-            ExpressionAttributeValues={
-                ':cleanup_time': int(datetime.utcnow().timestamp() * 1000)
-            }
-        )
-        
+    table = runtime.table(JOB_TABLE)
+    names = {f'#a{index}': name for index, name in enumerate(CLEANUP_ATTRIBUTES)}
+    response = table.get_item(
+        Key={'jobId': job_id},
+        ProjectionExpression=', '.join(names),
+        ExpressionAttributeNames=names
+    )
+
+    if 'Item' not in response:
+        print(f"Job {job_id} not found")
+        return
+
+    cleaned, failed = cleanup_jobs(table, [response['Item']])
+    if cleaned:
         print(f"Cleanup completed for job {job_id}")
-        
-    except Exception as e:
-        print(f"Error cleaning up job {job_id}: {e}")
+    else:
+        print(f"Cleanup incomplete for job {job_id}; the scheduled sweep will retry")
+
+def cleanup_jobs(table, jobs):
+    """Delete the artifacts of a page of jobs and mark them cleaned.
+
+    Objects are removed with delete_objects in batches of up to 1000 keys per
+    bucket. Jobs whose objects could not all be deleted are left in the
+    cleanup-index for the next sweep. Returns (cleaned, failed) counts.
+    """
+    if not jobs:
+        return 0, 0
+
+    keys_by_bucket = {INPUT_BUCKET: [], OUTPUT_BUCKET: []}
+    for job in jobs:
+        # A batch's shared inputs expire with the bucket lifecycle rule
+        if 'batchId' not in job:
+            keys_by_bucket[INPUT_BUCKET].extend(
+                job[name] for name in ('inputKey', 'descriptorKey') if name in job
+            )
+
+    # Failed jobs lose everything under their output prefix (partial and rendered files)
+    failed_jobs = [job['jobId'] for job in jobs if job.get('status') == 'Failed']
+    with metrics.span('list'):
+        listings, errors = run_parallel(failed_jobs, list_output_prefix, CLEANUP_CONCURRENCY)
+    unfinished = {failed_jobs[index] for index in errors}
+    for keys in listings:
+        keys_by_bucket[OUTPUT_BUCKET].extend(keys or [])
+
+    batches = [
+        (bucket, keys[start:start + DELETE_BATCH_SIZE])
+        for bucket, keys in keys_by_bucket.items()
+        for start in range(0, len(keys), DELETE_BATCH_SIZE)
+    ]
+    with metrics.span('delete'):
+        results, errors = run_parallel(batches, delete_batch, CLEANUP_CONCURRENCY, retries=2)
+    for index, error in errors.items():
+        print(f"Error deleting {len(batches[index][1])} objects from {batches[index][0]}: {error}")
+        unfinished.update(job_id_of(key) for key in batches[index][1])
+    for undeleted in results:
+        unfinished.update(job_id_of(key) for key in undeleted or [])
+
+    done = [job['jobId'] for job in jobs if job['jobId'] not in unfinished]
+    with metrics.span('mark'):
+        _, errors = run_parallel(done, lambda job_id: mark_cleaned(table, job_id), CLEANUP_CONCURRENCY, retries=2)
+    for index, error in errors.items():
+        print(f"Error marking job {done[index]} cleaned: {error}")
+
+    return len(done) - len(errors), len(unfinished) + len(errors)
+
+def list_output_prefix(job_id):
+    """Every output object of a job"""
+    keys = []
+    kwargs = {'Bucket': OUTPUT_BUCKET, 'Prefix': f"{job_id}/"}
+    while True:
+        page = s3.list_objects_v2(**kwargs)
+        keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        if not page.get('IsTruncated'):
+            return keys
+        kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+def delete_batch(batch):
+    """delete_objects for up to 1000 keys; returns the keys S3 could not delete"""
+    bucket, keys = batch
+    result = s3.delete_objects(
+        Bucket=bucket,
+        Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+    )
+    for error in result.get('Errors', []):
+        print(f"Error deleting {error['Key']}: {error.get('Code')} {error.get('Message')}")
+    return [error['Key'] for error in result.get('Errors', [])]
+
+def job_id_of(key):
+    """Job ID from a per-job object key ('<jobId>/<name>')"""
+    return key.split('/', 1)[0]
+
+def mark_cleaned(table, job_id):
+    """Record the cleanup and drop the job from the cleanup-index"""
+    table.update_item(
+        Key={'jobId': job_id},
+        UpdateExpression='SET cleanupTime = :cleanup_time REMOVE cleanupBucket',
+        ExpressionAttributeValues={
+            ':cleanup_time': int(datetime.utcnow().timestamp() * 1000)
+        }
+    )
+
+def cleanup_expired_jobs(context=None):
+    """Sweep jobs older than RETENTION_HOURS through the cleanup-index.
+
+    Walks hour buckets from the checkpoint up to the cutoff, following every
+    page. When the time budget runs low the position is checkpointed and the
+    next scheduled run resumes there. The checkpoint never moves past a bucket
+    with jobs that failed to clean, so they are retried.
+    """
+    from boto3.dynamodb.conditions import Key  # boto3 loads on first use (see runtime)
+
+    table = runtime.table(JOB_TABLE)
+    now = datetime.utcnow()
+    cutoff = now - timedelta(hours=RETENTION_HOURS)
+    cutoff_ms = int(cutoff.timestamp() * 1000)
+
+    if not index_legacy_jobs(table, context):
+        print("Cleanup paused while indexing jobs created before the cleanup-index")
+        return {'cleaned': 0, 'failed': 0, 'complete': False}
+
+    bucket_time, start_key = load_checkpoint(table, now)
+    retry_from = None
+    cleaned = failed = 0
+
+    while True:
+        bucket = bucket_time.strftime(CLEANUP_BUCKET_FORMAT)
+        kwargs = {
+            'IndexName': 'cleanup-index',
+            'KeyConditionExpression': Key('cleanupBucket').eq(bucket) & Key('submitTime').lt(cutoff_ms),
+            'Limit': INDEX_PAGE_SIZE
+        }
+        while True:
+            if out_of_time(context):
+                if retry_from:
+                    save_checkpoint(table, retry_from, None)
+                else:
+                    save_checkpoint(table, bucket, start_key)
+                print(f"Cleanup paused at {bucket}: {cleaned} cleaned, {failed} failed")
+                return {'cleaned': cleaned, 'failed': failed, 'complete': False}
+
+            if start_key:
+                kwargs['ExclusiveStartKey'] = start_key
+            with metrics.span('query'):
+                page = table.query(**kwargs)
+            page_cleaned, page_failed = cleanup_jobs(table, page['Items'])
+            cleaned += page_cleaned
+            failed += page_failed
+            if page_failed and retry_from is None:
+                retry_from = bucket
+
+            start_key = page.get('LastEvaluatedKey')
+            if not start_key:
+                break
+
+        # The cutoff's own bucket keeps filling up as more of it expires
+        if bucket_time + BUCKET_WIDTH > cutoff:
+            break
+        bucket_time += BUCKET_WIDTH
+
+    save_checkpoint(table, retry_from or bucket_time.strftime(CLEANUP_BUCKET_FORMAT), None)
+    print(f"Scheduled cleanup: {cleaned} cleaned, {failed} failed")
+    return {'cleaned': cleaned, 'failed': failed, 'complete': True}
+
+def index_legacy_jobs(table, context=None):
+    """Give jobs created before the cleanup-index their cleanupBucket; True once done.
+
+    Only new job records get the key, so older ones were invisible to the
+    sweep. Every scheduled run scans a checkpointed stretch of the table until
+    the scan finishes once, then this is a single read. The sweep checkpoint
+    is moved back to the earliest hour indexed, so those jobs are swept (and
+    retried) like any other.
+    """
+    state = table.get_item(Key={'jobId': LEGACY_SCAN_ID}, ConsistentRead=True).get('Item') or {}
+    if state.get('complete'):
+        return True
+    start_key = json.loads(state['lastEvaluatedKey']) if state.get('lastEvaluatedKey') else None
+
+    kwargs = {
+        'ProjectionExpression': 'jobId, submitTime',
+        # Unindexed, uncleaned job records; claims and checkpoints have no submitTime
+        'FilterExpression': 'attribute_exists(submitTime) AND attribute_not_exists(cleanupBucket) '
+                            'AND attribute_not_exists(cleanupTime)',
+        'Limit': INDEX_PAGE_SIZE
+    }
+    indexed = 0
+    while True:
+        if out_of_time(context):
+            item = {'jobId': LEGACY_SCAN_ID}
+            if start_key:
+                item['lastEvaluatedKey'] = json.dumps(start_key, default=int)
+            table.put_item(Item=item)
+            print(f"Indexed {indexed} older jobs; the next sweep continues")
+            return False
+
+        if start_key:
+            kwargs['ExclusiveStartKey'] = start_key
+        with metrics.span('scan'):
+            page = table.scan(**kwargs)
+        jobs = page['Items']
+        _, errors = run_parallel(jobs, lambda job: index_job(table, job), CLEANUP_CONCURRENCY, retries=2)
+        if errors:
+            # Resume from this page next time rather than skip the jobs
+            raise next(iter(errors.values()))
+        if jobs:
+            rewind_checkpoint(table, min(cleanup_bucket(int(job['submitTime'])) for job in jobs))
+        indexed += len(jobs)
+
+        start_key = page.get('LastEvaluatedKey')
+        if not start_key:
+            break
+
+    table.put_item(Item={'jobId': LEGACY_SCAN_ID, 'complete': True})
+    print(f"Indexed {indexed} older jobs; legacy scan complete")
+    return True
+
+def index_job(table, job):
+    """Put a job into the cleanup-index unless it was cleaned meanwhile"""
+    from botocore.exceptions import ClientError
 
-def cleanup_expired_jobs():
-    """Find and clean up jobs older than 24 hours"""
     try:
-        table = dynamodb.Table(JOB_TABLE)
-        
-        # Scan for jobs older than 24 hours
-        cutoff_time = int((datetime.utcnow() - timedelta(hours=24)).timestamp() * 1000)
-        
-        response = table.scan(
-            FilterExpression='submitTime < :cutoff AND attribute_not_exists(cleanupTime)',
-            ExpressionAttributeValues={':cutoff': cutoff_time}
+        table.update_item(
+            Key={'jobId': job['jobId']},
+            UpdateExpression='SET cleanupBucket = :bucket',
+            ConditionExpression='attribute_exists(jobId) AND attribute_not_exists(cleanupTime)',
+            ExpressionAttributeValues={':bucket': cleanup_bucket(int(job['submitTime']))}
         )
-        
-        for job in response['Items']:
-            cleanup_job(job['jobId'])
-        
-        print(f"Scheduled cleanup processed {len(response['Items'])} expired jobs")
-        
-    except Exception as e:
-        print(f"Error during scheduled cleanup: {e}")
\ No newline at end of file
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def rewind_checkpoint(table, bucket):
+    """Move the sweep back to bucket if it is already past it"""
+    item = table.get_item(Key={'jobId': CHECKPOINT_ID}, ConsistentRead=True).get('Item')
+    if item and item['cleanupCursor'] > bucket:
+        save_checkpoint(table, bucket, None)
+
+def out_of_time(context):
+    """True once the invocation is within TIME_RESERVE_SECONDS of its timeout"""
+    return context is not None and context.get_remaining_time_in_millis() < TIME_RESERVE_SECONDS * 1000
+
+def load_checkpoint(table, now):
+    """(bucket start time, ExclusiveStartKey or None) to resume the sweep from"""
+    earliest = (now - MAX_LOOKBACK).replace(minute=0, second=0, microsecond=0)
+    item = table.get_item(Key={'jobId': CHECKPOINT_ID}, ConsistentRead=True).get('Item')
+    if not item:
+        return earliest, None
+
+    bucket_time = datetime.strptime(item['cleanupCursor'], CLEANUP_BUCKET_FORMAT)
+    if bucket_time < earliest:
+        return earliest, None
+    start_key = json.loads(item['lastEvaluatedKey']) if item.get('lastEvaluatedKey') else None
+    return bucket_time, start_key
+
+def save_checkpoint(table, bucket, start_key):
+    """Remember where the next sweep starts"""
+    item = {'jobId': CHECKPOINT_ID, 'cleanupCursor': bucket}
+    if start_key:
+        item['lastEvaluatedKey'] = json.dumps(start_key, default=int)
+    table.put_item(Item=item)
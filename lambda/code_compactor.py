@@ -0,0 +1,256 @@
+import re
+from prompt_packer import estimate_tokens
+
+LANGUAGES = {
+    '.cs': 'csharp',
+    '.java': 'java',
+    '.js': 'javascript',
+    '.py': 'python',
+}
+
+# Comments and string literals; strings are matched so comment markers inside them survive
+C_TOKENS = re.compile(
+    r'(?P<comment>//[^\n]*|/\*.*?\*/)'
+    r'|(?P<string>@"(?:[^"]|"")*"|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`)',
+    re.DOTALL
+)
+PYTHON_TOKENS = re.compile(
+    r'(?P<comment>#[^\n]*)'
+    r'|(?P<string>"""(?:\\.|[^\\])*?"""|\'\'\'(?:\\.|[^\\])*?\'\'\'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')',
+    re.DOTALL
+)
+
+# Lines that cost tokens without describing behaviour
+BOILERPLATE = {
+    'csharp': re.compile(r'^\s*(using\s+[\w.=\s]+;|#\s*(region|endregion|pragma)\b.*)$'),
+    'java': re.compile(r'^\s*import\s+[\w.*\s]+;$'),
+    'javascript': re.compile(r'^\s*(import\s.*\bfrom\s.*|import\s+[\'"].*|(const|let|var)\s+[\w{},\s]+=\s*require\(.*\);?|[\'"]use strict[\'"];?)$'),
+    'python': re.compile(r'^\s*(import\s+[\w.,\s]+|from\s+[\w.]+\s+import\s+[\w.,\s*()]+)$'),
+}
+
+TYPE_DECLARATION = re.compile(r'\b(class|interface|struct|enum|record|namespace)\b')
+PRIVATE_MEMBER = re.compile(
+    r'^\s*(\[[^\]]*\]\s*)*((static|readonly|final|async|override|virtual|unsafe|extern|new)\s+)*private\b'
+    r'|^\s*(static\s+|async\s+)*#\w+'
+)
+PYTHON_BLOCK = re.compile(r'^(async\s+def|def|class)\s+(\w+)')
+
+BODY_MARKER = '{ ... }'
+
+def language_for(filename):
+    """Language key for a source file, or None if we do not compact it"""
+    dot = filename.rfind('.')
+    return LANGUAGES.get(filename[dot:].lower()) if dot >= 0 else None
+
+def _tokens(language):
+    return PYTHON_TOKENS if language == 'python' else C_TOKENS
+
+def strip_comments(content, language):
+    """Remove comments, leaving string literals untouched"""
+    def replace(match):
+        return match.group('string') if match.group('string') is not None else ''
+    return _tokens(language).sub(replace, content)
+
+def mask_strings(content, language):
+    """Same-length copy of content with string literal bodies blanked out"""
+    def replace(match):
+        if match.group('string') is None:
+            return match.group(0)
+        return re.sub(r'[^\n]', '_', match.group(0))
+    return _tokens(language).sub(replace, content)
+
+def string_continuation_lines(content, language):
+    """Indices of lines that begin inside a multi-line string literal"""
+    continued = set()
+    for match in _tokens(language).finditer(content):
+        if match.group('string') is None or '\n' not in match.group(0):
+            continue
+        first = content.count('\n', 0, match.start())
+        last = content.count('\n', 0, match.end())
+        continued.update(range(first + 1, last + 1))
+    return continued
+
+def collapse_whitespace(content):
+    """Drop blank lines and trailing spaces; one space per indentation level"""
+    lines = [line.expandtabs(4).rstrip() for line in content.split('\n')]
+    lines = [line for line in lines if line.strip()]
+
+    indents = [len(line) - len(line.lstrip()) for line in lines]
+    unit = min((indent for indent in indents if indent), default=1)
+
+    return '\n'.join(
+        ' ' * (indent // unit) + line.lstrip()
+        for line, indent in zip(lines, indents)
+    )
+
+def compact(content, language):
+    """Strip comments, boilerplate and redundant whitespace"""
+    content = strip_comments(content, language)
+    boilerplate = BOILERPLATE[language]
+    content = '\n'.join(line for line in content.split('\n') if not boilerplate.match(line))
+    return collapse_whitespace(content)
+
+def skeleton(content, language):
+    """Reduce compacted code to type declarations, signatures, properties and public APIs"""
+    if language == 'python':
+        return _python_skeleton(content)
+    return _brace_skeleton(content, language)
+
+def _drop_attributes(out):
+    """Remove attribute/annotation lines left behind by a dropped member"""
+    while out and out[-1].lstrip().startswith(('[', '@')):
+        out.pop()
+
+def _brace_skeleton(content, language):
+    lines = content.split('\n')
+    masks = mask_strings(content, language).split('\n')
+    out = []
+    depth = 0
+    skip_depth = None
+    pending = None  # (index in out, private) of a signature whose body may start on the next line
+
+    for line, mask in zip(lines, masks):
+        opens, closes = mask.count('{'), mask.count('}')
+
+        if skip_depth is not None:
+            depth += opens - closes
+            if depth <= skip_depth:
+                skip_depth = None
+            continue
+
+        stripped = mask.strip()
+        if pending is not None and stripped.startswith('{'):
+            index, private = pending
+            pending = None
+            before = depth
+            depth += opens - closes
+            if private:
+                del out[index:]
+                _drop_attributes(out)
+            else:
+                out[index] += ' ' + BODY_MARKER
+            if depth > before:
+                skip_depth = before
+            continue
+        pending = None
+
+        is_signature = ('(' in mask and ')' in mask or '=>' in mask) and not TYPE_DECLARATION.search(mask)
+        private = bool(PRIVATE_MEMBER.match(mask))
+
+        if is_signature and opens > closes:
+            # Body opens on the signature line (K&R style)
+            if private:
+                _drop_attributes(out)
+            else:
+                out.append(line[:mask.index('{')].rstrip() + ' ' + BODY_MARKER)
+            skip_depth = depth
+            depth += opens - closes
+            continue
+
+        depth += opens - closes
+        if private and stripped.endswith((';', '}')):
+            _drop_attributes(out)
+            continue  # private field or one-line private member
+        if is_signature and not stripped.endswith((';', ',', '(')):
+            pending = (len(out), private)
+        out.append(line)
+
+    return '\n'.join(out)
+
+def _python_skeleton(content):
+    lines = content.split('\n')
+    masks = mask_strings(content, 'python').split('\n')
+    continued = string_continuation_lines(content, 'python')
+    out = []
+    decorators = []
+    skip_indent = None
+    index = 0
+
+    while index < len(lines):
+        line = lines[index]
+        indent = len(line) - len(line.lstrip())
+
+        if skip_indent is not None:
+            # Lines inside a multi-line string may be dedented; they still belong to the body
+            if indent > skip_indent or index in continued:
+                index += 1
+                continue
+            skip_indent = None
+
+        stripped = line.lstrip()
+        if stripped.startswith('@'):
+            decorators.append(line)
+            index += 1
+            continue
+
+        block = PYTHON_BLOCK.match(stripped)
+        if not block:
+            out.extend(decorators)
+            decorators = []
+            out.append(line)
+            index += 1
+            continue
+
+        # Signature may span lines until the closing colon
+        end = index
+        while end < len(lines) - 1 and not masks[end].rstrip().endswith(':'):
+            end += 1
+        name = block.group(2)
+        private = name.startswith('_') and not name.endswith('__')
+
+        if private:
+            decorators = []
+            skip_indent = indent
+            index = end + 1
+            continue
+
+        out.extend(decorators)
+        decorators = []
+        out.extend(lines[index:end + 1])
+        index = end + 1
+
+        if block.group(1) == 'class':
+            continue
+
+        # Keep the first line of the docstring, then drop the body
+        if index < len(lines) and lines[index].lstrip().startswith(('"""', "'''")):
+            docstring = lines[index].strip()
+            quote = docstring[:3]
+            first_line = docstring[3:].split(quote)[0].strip()
+            if first_line:
+                out.append(' ' * (indent + 1) + quote + first_line + quote)
+        out.append(' ' * (indent + 1) + '...')
+        skip_indent = indent
+
+    return '\n'.join(out)
+
+def compact_sources(source_files):
+    """Light compaction of every file (comments, boilerplate, whitespace)"""
+    compacted = []
+    for file_info in source_files:
+        language = language_for(file_info['filename'])
+        content = compact(file_info['content'], language) if language else file_info['content']
+        compacted.append({
+            'filename': file_info['filename'],
+            'content': content,
+            'compaction': 'light' if language else 'none'
+        })
+    return compacted
+
+def fit_to_budget(compacted_files, budget_tokens):
+    """Skeletonize compacted files from the lowest priority up while over budget"""
+    fitted = [dict(file_info) for file_info in compacted_files]
+
+    total = sum(estimate_tokens(file_info['content']) for file_info in fitted)
+    for file_info in reversed(fitted):
+        if total <= budget_tokens:
+            break
+        language = language_for(file_info['filename'])
+        if not language:
+            continue
+        reduced = skeleton(file_info['content'], language)
+        total -= estimate_tokens(file_info['content']) - estimate_tokens(reduced)
+        file_info['content'] = reduced
+        file_info['compaction'] = 'skeleton'
+
+    return fitted
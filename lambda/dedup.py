@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import time
+from botocore.exceptions import ClientError
+from errors import BadRequest
+from result_cache import NON_CONTENT_FIELDS
+
+# Submission claims live in the job table next to the jobs, under
+# 'idempotency#<hash>' (client Idempotency-Key) and 'inflight#<hash>'
+# (archive + descriptor). A claim points at the job it created; a conditional
+# put decides which of several concurrent identical requests creates the job.
+
+# An Idempotency-Key is honored this long after its first use
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+# A claim whose job does not exist yet is still being submitted for this long;
+# after that the request that made it is presumed dead and the claim is reused
+CLAIM_GRACE_SECONDS = int(os.environ.get('CLAIM_GRACE_SECONDS', '60'))
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# Identical submissions collapse onto a job in one of these statuses
+ACTIVE_STATUSES = ('Queued', 'Pending', 'Running')
+CLAIM_ATTEMPTS = 3
+
+class SubmissionInProgress(Exception):
+    """A matching request holds the claim but has not created its job yet"""
+
+    def __init__(self, job_id):
+        super().__init__(f"A matching submission for job {job_id} is still in progress")
+        self.job_id = job_id
+
+class IdempotencyKeyReused(BadRequest):
+    """The Idempotency-Key was first used with a different request"""
+
+def request_hash(archive_data, descriptor):
+    """SHA-256 over the archive bytes and the canonical descriptor JSON.
+
+    Fields that do not change the result are left out, so a retry with
+    another callbackUrl or priority still finds the job it duplicates.
+    """
+    content = {k: v for k, v in descriptor.items() if k not in NON_CONTENT_FIELDS}
+    digest = hashlib.sha256(archive_data)
+    digest.update(b'\0')
+    digest.update(json.dumps(content, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    return digest.hexdigest()
+
+def upload_request_hash(archive_size, descriptor):
+    """request_hash for a presigned-upload submission, which has no archive bytes yet"""
+    return request_hash(f'upload:{archive_size}'.encode('utf-8'), descriptor)
+
+def idempotency_claim_id(key, descriptor):
+    """Claim item ID for a client Idempotency-Key, scoped to the descriptor's tenant"""
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise BadRequest(f'Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters')
+    scope = f"{descriptor.get('tenant', 'default')}\0{key}"
+    return 'idempotency#' + hashlib.sha256(scope.encode('utf-8')).hexdigest()
+
+def inflight_claim_id(hash_value):
+    """Claim item ID for a request hash"""
+    return f'inflight#{hash_value}'
+
+def claim(table, claim_id, job_id, hash_value, ttl_seconds, reusable):
+    """Claim claim_id for job_id, or find the job an earlier identical request created.
+
+    Returns None when this request won the claim and should create job_id, or
+    the existing job item when reusable(job) says to return it instead. A
+    claim whose job is finished (not reusable) or abandoned is taken over
+    with a compare-and-set, so only one of several racing requests wins it.
+    Raises SubmissionInProgress while a fresh claim's job does not exist yet.
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        now = int(time.time())
+        item = {
+            'jobId': claim_id,
+            'targetJobId': job_id,
+            'requestHash': hash_value,
+            'claimedAt': now,
+            'expiresAt': now + ttl_seconds
+        }
+        try:
+            table.put_item(
+                Item=item,
+                ConditionExpression='attribute_not_exists(jobId) OR expiresAt < :now',
+                ExpressionAttributeValues={':now': now}
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+        existing = table.get_item(Key={'jobId': claim_id}, ConsistentRead=True).get('Item')
+        if not existing:
+            continue  # Expired and deleted in between; claim again
+
+        target = existing['targetJobId']
+        job = table.get_item(Key={'jobId': target}, ConsistentRead=True).get('Item')
+        if job and reusable(job, existing):
+            return job
+        if not job and now - int(existing['claimedAt']) < CLAIM_GRACE_SECONDS:
+            raise SubmissionInProgress(target)
+
+        try:
+            table.put_item(
+                Item=item,
+                ConditionExpression='targetJobId = :target',
+                ExpressionAttributeValues={':target': target}
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # Another request took it over first; look again
+
+    raise SubmissionInProgress(job_id)
+
+def repoint(table, claim_id, from_job_id, to_job_id):
+    """Move a claim this request holds onto the job it was deduplicated against"""
+    try:
+        table.update_item(
+            Key={'jobId': claim_id},
+            UpdateExpression='SET targetJobId = :to',
+            ConditionExpression='targetJobId = :from',
+            ExpressionAttributeValues={':to': to_job_id, ':from': from_job_id}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+def release(table, claim_ids, job_id):
+    """Drop claims made for job_id when its submission failed, so a retry starts afresh"""
+    for claim_id in claim_ids:
+        try:
+            table.delete_item(
+                Key={'jobId': claim_id},
+                ConditionExpression='targetJobId = :job',
+                ExpressionAttributeValues={':job': job_id}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+def find_key_duplicate(table, job_id, idempotency_key, descriptor, hash_value):
+    """(job, None) when the Idempotency-Key already names a job, else (None, [key claim ID]).
+
+    The same key always returns its job (any status); a request whose
+    hash_value differs from the key's first request raises IdempotencyKeyReused.
+    Needs no archive bytes, so presigned uploads can use it too.
+    """
+    key_claim = idempotency_claim_id(idempotency_key, descriptor)
+
+    def same_request(job, existing):
+        if existing['requestHash'] != hash_value:
+            raise IdempotencyKeyReused('Idempotency-Key was already used with a different request')
+        return True
+
+    job = claim(table, key_claim, job_id, hash_value, IDEMPOTENCY_TTL_HOURS * 3600, same_request)
+    if job:
+        return job, None
+    return None, [key_claim]
+
+def find_duplicate(table, job_id, archive_data, descriptor, idempotency_key=None):
+    """(existing job, None) for a duplicate submission, else (None, claim IDs now held for job_id).
+
+    With an Idempotency-Key the key is checked first (find_key_duplicate).
+    Either way a request matching a queued or running job returns that job.
+    """
+    hash_value = request_hash(archive_data, descriptor)
+    ttl_seconds = IDEMPOTENCY_TTL_HOURS * 3600
+    claim_ids = []
+
+    if idempotency_key is not None:
+        job, claim_ids = find_key_duplicate(table, job_id, idempotency_key, descriptor, hash_value)
+        if job:
+            return job, None
+
+    try:
+        job = claim(
+            table, inflight_claim_id(hash_value), job_id, hash_value, ttl_seconds,
+            lambda job, existing: job.get('status') in ACTIVE_STATUSES
+        )
+    except Exception:
+        release(table, claim_ids, job_id)
+        raise
+    if job:
+        # The key now names the job it was deduplicated against
+        for claim_id in claim_ids:
+            repoint(table, claim_id, job_id, job['jobId'])
+        return job, None
+    return None, claim_ids + [inflight_claim_id(hash_value)]
@@ -0,0 +1,145 @@
+import json
+import runtime
+import os
+from datetime import datetime
+from botocore.exceptions import ClientError
+from admission import schedule
+import metrics
+
+stepfunctions = runtime.lazy_client('stepfunctions')
+
+JOB_TABLE = os.environ['JOB_TABLE']
+STATE_MACHINE_ARN = os.environ['STATE_MACHINE_ARN']
+
+# Global cap on jobs admitted to the workflow (Pending or Running)
+MAX_INFLIGHT_JOBS = int(os.environ.get('MAX_INFLIGHT_JOBS', '10'))
+# Typical end-to-end job time, used for estimatedStartTime
+ESTIMATED_JOB_SECONDS = int(os.environ.get('ESTIMATED_JOB_SECONDS', '90'))
+
+IN_FLIGHT_STATUSES = ('Pending', 'Running')
+# In-flight jobs older than the state machine timeout died without updating their record
+STALE_IN_FLIGHT_SECONDS = int(os.environ.get('STALE_IN_FLIGHT_SECONDS', '1800'))
+
+@metrics.instrumented('Dispatcher')
+def handler(event, context):
+    """Admit queued jobs up to the in-flight cap and publish queue positions.
+
+    Invoked by SQS signals (submit, job finished) and on a schedule. Runs
+    with a reserved concurrency of one; admission is also guarded by a
+    conditional Queued -> Pending update, so a duplicate run is harmless.
+    """
+    table = runtime.table(JOB_TABLE)
+    now_ms = int(datetime.utcnow().timestamp() * 1000)
+
+    in_flight_by_tenant = {}
+    with metrics.span('query'):
+        for status in IN_FLIGHT_STATUSES:
+            for job in query_status(table, status, ['jobId', 'tenant', 'admittedAt', 'submitTime']):
+                started = int(job.get('admittedAt', job.get('submitTime', now_ms)))
+                if now_ms - started > STALE_IN_FLIGHT_SECONDS * 1000:
+                    continue
+                tenant = job.get('tenant', 'default')
+                in_flight_by_tenant[tenant] = in_flight_by_tenant.get(tenant, 0) + 1
+
+        queued = list(query_status(
+            table, 'Queued',
+            ['jobId', 'tenant', 'priority', 'queuedAt', 'inputKey', 'descriptorKey', 'descriptorIndex', 'queuePosition']
+        ))
+    in_flight = sum(in_flight_by_tenant.values())
+    order = schedule(queued, in_flight_by_tenant, now_ms)
+
+    admitted = 0
+    waiting = []
+    with metrics.span('admit'):
+        for job in order:
+            if in_flight + admitted < MAX_INFLIGHT_JOBS and admit(table, job, now_ms):
+                admitted += 1
+            else:
+                waiting.append(job)
+
+    # Jobs free a slot every ESTIMATED_JOB_SECONDS / MAX_INFLIGHT_JOBS on average;
+    # only jobs whose place in line moved are rewritten
+    for position, job in enumerate(waiting, 1):
+        if int(job.get('queuePosition', 0)) == position:
+            continue
+        estimated_start = now_ms + position * ESTIMATED_JOB_SECONDS * 1000 // MAX_INFLIGHT_JOBS
+        try:
+            table.update_item(
+                Key={'jobId': job['jobId']},
+                UpdateExpression='SET queuePosition = :position, estimatedStartTime = :estimate',
+                ConditionExpression='#status = :queued',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':position': position,
+                    ':estimate': estimated_start,
+                    ':queued': 'Queued'
+                }
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+
+    print(f"Dispatch: {in_flight} in flight, admitted {admitted}, {len(waiting)} waiting")
+    return {'inFlight': in_flight, 'admitted': admitted, 'queued': len(waiting)}
+
+def query_status(table, status, attributes):
+    """All jobs with a status, via the status index"""
+    from boto3.dynamodb.conditions import Key  # boto3 loads on first use (see runtime)
+
+    names = {f'#a{index}': name for index, name in enumerate(attributes)}
+    kwargs = {
+        'IndexName': 'status-index',
+        'KeyConditionExpression': Key('status').eq(status),
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
+    while True:
+        result = table.query(**kwargs)
+        yield from result['Items']
+        if 'LastEvaluatedKey' not in result:
+            return
+        kwargs['ExclusiveStartKey'] = result['LastEvaluatedKey']
+
+def admit(table, job, now_ms):
+    """Move a job from Queued to Pending and start its execution; False if it was taken"""
+    try:
+        table.update_item(
+            Key={'jobId': job['jobId']},
+            UpdateExpression='SET #status = :pending, admittedAt = :now REMOVE queuePosition, estimatedStartTime',
+            ConditionExpression='#status = :queued',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':pending': 'Pending', ':queued': 'Queued', ':now': now_ms}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+    execution_input = {
+        'jobId': job['jobId'],
+        'inputKey': job['inputKey'],
+        'descriptorKey': job['descriptorKey']
+    }
+    # Batch jobs share one descriptor list
+    if 'descriptorIndex' in job:
+        execution_input['descriptorIndex'] = int(job['descriptorIndex'])
+
+    try:
+        stepfunctions.start_execution(
+            stateMachineArn=STATE_MACHINE_ARN,
+            name=f"job-{job['jobId']}",
+            input=json.dumps(execution_input)
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ExecutionAlreadyExists':
+            return True
+        # Put it back in line for the next dispatch
+        print(f"Error starting job {job['jobId']}: {e}")
+        table.update_item(
+            Key={'jobId': job['jobId']},
+            UpdateExpression='SET #status = :queued',
+            ExpressionAttributeNames={'#status': 'status'},
+            ExpressionAttributeValues={':queued': 'Queued'}
+        )
+        return False
+    return True
@@ -0,0 +1,29 @@
+import os
+from datetime import datetime
+
+DOWNLOAD_URL_EXPIRY = int(os.environ.get('DOWNLOAD_URL_EXPIRY', '86400'))  # 24 hours
+# URLs signed with a Lambda role's temporary credentials stop working when those
+# credentials expire, which can be well before ExpiresIn; reuse them for less
+DOWNLOAD_URL_REUSE_SECONDS = int(os.environ.get('DOWNLOAD_URL_REUSE_SECONDS', '3600'))
+# Hand out a fresh URL rather than one about to lapse
+REFRESH_MARGIN_SECONDS = 300
+
+def presign(s3, bucket, key):
+    """Presigned GET for an output, with the time until which it may be reused (ms)"""
+    url = s3.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket, 'Key': key},
+        ExpiresIn=DOWNLOAD_URL_EXPIRY
+    )
+    reuse_seconds = min(DOWNLOAD_URL_EXPIRY, DOWNLOAD_URL_REUSE_SECONDS)
+    return {
+        'downloadUrl': url,
+        'downloadUrlExpiresAt': int(datetime.utcnow().timestamp() * 1000) + reuse_seconds * 1000
+    }
+
+def is_fresh(job):
+    """True if the job's stored download URL can still be handed out"""
+    if 'downloadUrl' not in job or 'downloadUrlExpiresAt' not in job:
+        return False
+    now_ms = int(datetime.utcnow().timestamp() * 1000)
+    return int(job['downloadUrlExpiresAt']) - now_ms > REFRESH_MARGIN_SECONDS * 1000
@@ -0,0 +1,11 @@
+class BadRequest(ValueError):
+    """A submission the client has to fix; the API answers 400 with the message"""
+
+def positive_int(descriptor, field):
+    """A descriptor setting as a positive integer, or None when unset; BadRequest otherwise"""
+    value = descriptor.get(field)
+    if not value:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+        raise BadRequest(f'{field} must be a positive integer')
+    return int(value)
@@ -1,71 +1,341 @@
 import json
-import boto3
+import base64
+import runtime
+import hashlib
 import os
+import time
 from botocore.exceptions import ClientError
+import download_urls
+import metrics
 
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
+dynamodb = runtime.lazy_resource('dynamodb')
+s3 = runtime.lazy_client('s3')
 
 JOB_TABLE = os.environ['JOB_TABLE']
 OUTPUT_BUCKET = os.environ['OUTPUT_BUCKET']
 
+# Statuses after which a job no longer changes
+FINAL_STATUSES = ('Succeeded', 'Failed')
+
+# ?waitSeconds= long-poll cap; API Gateway gives up on the request after 29 s
+MAX_WAIT_SECONDS = int(os.environ.get('MAX_WAIT_SECONDS', '20'))
+# Re-read the job this often while long-polling, backing off to the max
+POLL_INTERVAL_SECONDS = 0.5
+MAX_POLL_INTERVAL_SECONDS = 2.0
+
+# POST /job-status/batch limit (one BatchGetItem request)
+MAX_STATUS_BATCH = 100
+
+# Only the attributes a status response needs
+STATUS_ATTRIBUTES = [
+    'jobId', 'status', 'outputKey', 'downloadUrl', 'downloadUrlExpiresAt', 'errorMessage',
+    'partialKey', 'generatedTokens', 'partialAvailable', 'generationComplete',
+    'queuePosition', 'estimatedStartTime', 'breakdown', 'profileKeys'
+]
+
+@metrics.instrumented('JobStatusHandler')
 def handler(event, context):
     try:
-        job_id = event['pathParameters']['jobId']
-        
-        # Get job from DynamoDB
-        table = dynamodb.Table(JOB_TABLE)
-        response = table.get_item(Key={'jobId': job_id})
-        
-        if 'Item' not in response:
-            return {
-                'statusCode': 404,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Job not found'})
-            }
-        
-        job = response['Item']
-        
-        result = {
-            'jobId': job_id,
-            'status': job['status']
+        # POST /job-status/batch
+        if event.get('resource') == '/job-status/batch':
+            return batch_job_status(event)
+
+        path_parameters = event.get('pathParameters') or {}
+
+        # GET /batch-status/{batchId}
+        if 'batchId' in path_parameters:
+            return batch_status(path_parameters['batchId'])
+
+        job_id = path_parameters['jobId']
+        table = runtime.table(JOB_TABLE)
+        if_none_match = request_header(event, 'If-None-Match')
+
+        job = get_job(table, job_id)
+        if job is None:
+            return respond(404, {'error': 'Job not found'})
+
+        result = job_result(job)
+        etag = job_etag(result)
+
+        # Long-poll: hold the request until the job changes (the client's
+        # ETag, or else the current status, is the baseline) or time runs out
+        wait_seconds = requested_wait(event, context)
+        if wait_seconds:
+            wait_started = time.perf_counter()
+            deadline = time.monotonic() + wait_seconds
+            initial_status = job['status']
+            interval = POLL_INTERVAL_SECONDS
+            while job['status'] not in FINAL_STATUSES and time.monotonic() + interval < deadline:
+                if if_none_match and etag != if_none_match:
+                    break
+                if not if_none_match and job['status'] != initial_status:
+                    break
+                time.sleep(interval)
+                interval = min(MAX_POLL_INTERVAL_SECONDS, interval * 1.5)
+                job = get_job(table, job_id) or job
+                result = job_result(job)
+                etag = job_etag(result)
+            # Long-polls would swamp the handler's own latency; keep them apart
+            metrics.current().record('wait', (time.perf_counter() - wait_started) * 1000)
+
+        # Unchanged since the client's last poll
+        if etag == if_none_match:
+            return respond(304, None, etag)
+
+        return respond(200, result, etag)
+
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        return respond(500, {'error': 'Internal server error'})
+
+def get_job(table, job_id):
+    """Job item with the status projection, or None"""
+    names = projection_names()
+    response = table.get_item(
+        Key={'jobId': job_id},
+        ProjectionExpression=', '.join(names),
+        ExpressionAttributeNames=names
+    )
+    item = response.get('Item')
+    # Submission claims (see dedup.py) share the table but are not jobs
+    return item if item and 'status' in item else None
+
+def requested_wait(event, context):
+    """Seconds to long-poll for (?waitSeconds=), capped by MAX_WAIT_SECONDS and the Lambda's time left"""
+    query = event.get('queryStringParameters') or {}
+    try:
+        wait_seconds = float(query.get('waitSeconds') or 0)
+    except ValueError:
+        return 0
+    if context is not None:
+        wait_seconds = min(wait_seconds, context.get_remaining_time_in_millis() / 1000 - 2)
+    return max(0, min(wait_seconds, MAX_WAIT_SECONDS))
+
+def job_result(job):
+    """Status response for one job item"""
+    result = {
+        'jobId': job['jobId'],
+        'status': job['status']
+    }
+
+    # Queued jobs report their place in line
+    if job['status'] == 'Queued':
+        if 'queuePosition' in job:
+            result['queuePosition'] = int(job['queuePosition'])
+        if 'estimatedStartTime' in job:
+            result['estimatedStartTime'] = int(job['estimatedStartTime'])
+
+    # Add download URL if succeeded (signed at completion; re-signed only once stale)
+    if job['status'] == 'Succeeded' and 'outputKey' in job:
+        if download_urls.is_fresh(job):
+            result['downloadUrl'] = job['downloadUrl']
+            result['downloadUrlExpiresAt'] = int(job['downloadUrlExpiresAt'])
+        else:
+            try:
+                signed = download_urls.presign(s3, OUTPUT_BUCKET, job['outputKey'])
+                store_download_url(job['jobId'], signed)
+                result.update(signed)
+            except ClientError as e:
+                print(f"Error generating presigned URL: {e}")
+
+    # Streaming jobs expose progress and the partial output while running
+    if job['status'] == 'Running' and 'partialKey' in job:
+        result['progress'] = {
+            'generatedTokens': int(job.get('generatedTokens', 0)),
+            'partialAvailable': bool(job.get('partialAvailable', False)),
+            'generationComplete': bool(job.get('generationComplete', False))
         }
-        
-        # Add download URL if succeeded
-        if job['status'] == 'Succeeded' and 'outputKey' in job:
+        try:
+            result['partialUrl'] = s3.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': OUTPUT_BUCKET, 'Key': job['partialKey']},
+                ExpiresIn=900  # 15 minutes; the partial output keeps changing
+            )
+        except ClientError as e:
+            print(f"Error generating partial presigned URL: {e}")
+
+    # Add error message if failed
+    if job['status'] == 'Failed' and 'errorMessage' in job:
+        result['errorMessage'] = job['errorMessage']
+
+    # Profiled jobs link their profile.* files (CPU report, folded stacks)
+    if job.get('profileKeys'):
+        urls = {}
+        for key in job['profileKeys']:
             try:
-                download_url = s3.generate_presigned_url(
+                urls[key.rsplit('/', 1)[-1]] = s3.generate_presigned_url(
                     'get_object',
-                    Params={'Bucket': OUTPUT_BUCKET, 'Key': job['outputKey']},
-                    ExpiresIn=86400  # 24 hours
+                    Params={'Bucket': OUTPUT_BUCKET, 'Key': key},
+                    ExpiresIn=3600
                 )
-                result['downloadUrl'] = download_url
             except ClientError as e:
-                print(f"Error generating presigned URL: {e}")
-        
-        # Add error message if failed
-        if job['status'] == 'Failed' and 'errorMessage' in job:
-            result['errorMessage'] = job['errorMessage']
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(result)
+                print(f"Error generating profile presigned URL: {e}")
+        result['profileUrls'] = urls
+
+    # Where a finished job spent its time: stage milliseconds, bytes and tokens
+    if job['status'] in FINAL_STATUSES and 'breakdown' in job:
+        breakdown = job['breakdown']
+        result['breakdown'] = dict(
+            {name: int(value) for name, value in breakdown.items() if name != 'stagesMs'},
+            stagesMs={stage: int(ms) for stage, ms in breakdown.get('stagesMs', {}).items()}
+        )
+
+    return result
+
+def store_download_url(job_id, signed):
+    """Save a re-signed download URL so later polls (and ETags) reuse it"""
+    try:
+        runtime.table(JOB_TABLE).update_item(
+            Key={'jobId': job_id},
+            UpdateExpression='SET downloadUrl = :url, downloadUrlExpiresAt = :expires_at',
+            ExpressionAttributeValues={
+                ':url': signed['downloadUrl'],
+                ':expires_at': signed['downloadUrlExpiresAt']
+            }
+        )
+    except ClientError as e:
+        print(f"Error storing download URL for job {job_id}: {e}")
+
+def job_etag(result):
+    """ETag for a status result; partial and profile URLs are re-signed per poll so they are left out"""
+    state = {name: value for name, value in result.items() if name not in ('partialUrl', 'profileUrls')}
+    # Only which profile files exist changes the job
+    if 'profileUrls' in result:
+        state['profileFiles'] = sorted(result['profileUrls'])
+    digest = hashlib.sha256(json.dumps(state, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+def batch_job_status(event):
+    """Status of many jobs in one call, via BatchGetItem.
+
+    Jobs whose ETag is listed in the request's 'etags' map come back as
+    {'jobId', 'notModified': true}; the whole response also carries an ETag
+    and honors If-None-Match.
+    """
+    try:
+        body = event.get('body') or '{}'
+        if event.get('isBase64Encoded'):
+            body = base64.b64decode(body).decode('utf-8')
+        payload = json.loads(body)
+        job_ids = list(dict.fromkeys(payload.get('jobIds') or []))
+        known_etags = payload.get('etags') or {}
+    except (ValueError, AttributeError, TypeError):
+        return respond(400, {'error': 'Invalid JSON payload'})
+
+    if not job_ids or not all(isinstance(job_id, str) for job_id in job_ids):
+        return respond(400, {'error': 'jobIds must be a non-empty list of job IDs'})
+    if not isinstance(known_etags, dict):
+        return respond(400, {'error': 'etags must be an object of jobId -> ETag'})
+    if len(job_ids) > MAX_STATUS_BATCH:
+        return respond(400, {'error': f'At most {MAX_STATUS_BATCH} jobIds per request'})
+
+    jobs = batch_get_jobs(job_ids)
+
+    results = []
+    for job_id in job_ids:
+        if job_id not in jobs:
+            results.append({'jobId': job_id, 'status': 'NotFound'})
+            continue
+        result = job_result(jobs[job_id])
+        etag = job_etag(result)
+        if known_etags.get(job_id) == etag:
+            results.append({'jobId': job_id, 'etag': etag, 'notModified': True})
+        else:
+            results.append(dict(result, etag=etag))
+
+    body = {'jobs': results}
+    # Per-job ETags already leave out the re-signed URLs
+    etag = job_etag({'jobs': [r['etag'] if 'etag' in r else r for r in results]})
+    if etag == request_header(event, 'If-None-Match'):
+        return respond(304, None, etag)
+    return respond(200, body, etag)
+
+def batch_get_jobs(job_ids):
+    """Fetch job items by ID with the status projection; returns jobId -> item"""
+    names = projection_names()
+    request = {
+        JOB_TABLE: {
+            'Keys': [{'jobId': job_id} for job_id in job_ids],
+            'ProjectionExpression': ', '.join(names),
+            'ExpressionAttributeNames': names
         }
-        
-    except Exception as e:
-        print(f"Error: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'error': 'Internal server error'})
-        }
\ No newline at end of file
+    }
+
+    jobs = {}
+    attempt = 0
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+        for item in response['Responses'].get(JOB_TABLE, []):
+            if 'status' in item:
+                jobs[item['jobId']] = item
+        request = response.get('UnprocessedKeys') or None
+        if request:
+            # Throttled keys come back unprocessed; back off before asking again
+            attempt += 1
+            time.sleep(min(1.0, 0.05 * (2 ** attempt)))
+    return jobs
+
+def projection_names():
+    """Expression attribute names for STATUS_ATTRIBUTES ('status' is a reserved word)"""
+    return {f'#a{index}': name for index, name in enumerate(STATUS_ATTRIBUTES)}
+
+def request_header(event, name):
+    """Case-insensitive request header lookup"""
+    headers = event.get('headers') or {}
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            return value
+    return None
+
+def respond(status_code, body, etag=None):
+    """API Gateway proxy response with CORS headers"""
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if etag:
+        headers['ETag'] = etag
+        headers['Access-Control-Expose-Headers'] = 'ETag'
+        # Clients must revalidate, but may keep the body to use on 304
+        headers['Cache-Control'] = 'no-cache'
+    return {
+        'statusCode': status_code,
+        'headers': headers,
+        'body': '' if body is None else json.dumps(body)
+    }
+
+def batch_status(batch_id):
+    """Aggregate status of every job submitted in one batch"""
+    from boto3.dynamodb.conditions import Key  # boto3 loads on first use (see runtime)
+
+    table = runtime.table(JOB_TABLE)
+    kwargs = {
+        'IndexName': 'batch-index',
+        'KeyConditionExpression': Key('batchId').eq(batch_id),
+        'ProjectionExpression': 'jobId, #status, descriptorIndex',
+        'ExpressionAttributeNames': {'#status': 'status'}
+    }
+
+    jobs = []
+    while True:
+        page = table.query(**kwargs)
+        jobs.extend(page['Items'])
+        if 'LastEvaluatedKey' not in page:
+            break
+        kwargs['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    if not jobs:
+        return respond(404, {'error': 'Batch not found'})
+
+    jobs.sort(key=lambda job: int(job.get('descriptorIndex', 0)))
+    counts = {}
+    for job in jobs:
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+
+    return respond(200, {
+        'batchId': batch_id,
+        'total': len(jobs),
+        'counts': counts,
+        'complete': all(job['status'] in FINAL_STATUSES for job in jobs),
+        'jobs': [{'jobId': job['jobId'], 'status': job['status']} for job in jobs]
+    })
@@ -0,0 +1,9 @@
+from datetime import datetime
+
+# Jobs are indexed by submission hour in the sparse cleanup-index; the key is
+# removed once a job is cleaned, so the index only holds pending work
+CLEANUP_BUCKET_FORMAT = '%Y-%m-%dT%H'
+
+def cleanup_bucket(submit_time):
+    """cleanup-index partition for a job submitted at submit_time (epoch ms)"""
+    return datetime.utcfromtimestamp(submit_time / 1000).strftime(CLEANUP_BUCKET_FORMAT)
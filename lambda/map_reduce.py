@@ -0,0 +1,132 @@
+import os
+from prompt_packer import CHARS_PER_TOKEN, DECLARATION, estimate_tokens
+from parallel import run_parallel
+
+MAP_CONCURRENCY = int(os.environ.get('MAP_CONCURRENCY', '4'))
+MAP_MAX_RETRIES = int(os.environ.get('MAP_MAX_RETRIES', '2'))
+MAP_CHUNK_TOKENS = int(os.environ.get('MAP_CHUNK_TOKENS', '6000'))
+MAP_SUMMARY_TOKENS = int(os.environ.get('MAP_SUMMARY_TOKENS', '600'))
+
+# Bump whenever build_map_prompt changes so cached summaries are not reused
+MAP_PROMPT_VERSION = '1'
+
+def split_map_items(source_files, chunk_tokens=None):
+    """One map item per file; files over chunk_tokens are split at declaration lines"""
+    if chunk_tokens is None:
+        chunk_tokens = MAP_CHUNK_TOKENS
+    chunk_chars = int(chunk_tokens * CHARS_PER_TOKEN)
+
+    items = []
+    for file_info in source_files:
+        content = file_info['content']
+        if len(content) <= chunk_chars:
+            items.append({'filename': file_info['filename'], 'content': content})
+            continue
+
+        parts = []
+        current = []
+        size = 0
+        for line in content.split('\n'):
+            # Prefer to cut where a declaration starts once the chunk is well filled
+            if current and (size + len(line) > chunk_chars or (size > chunk_chars * 0.75 and DECLARATION.match(line))):
+                parts.append('\n'.join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            parts.append('\n'.join(current))
+
+        for number, part in enumerate(parts, 1):
+            items.append({
+                'filename': f"{file_info['filename']} (part {number}/{len(parts)})",
+                'content': part
+            })
+
+    return items
+
+def build_map_prompt(item, descriptor):
+    """Prompt asking for a compact, requirement-oriented summary of one file or chunk"""
+    return f"""You are a technical writer for a .NET e-commerce platform.
+Summarize the following source file for a later Software Requirements Specification.
+List, as short bullet points:
+- Responsibilities and business rules it implements
+- Public operations (name, inputs, outputs)
+- Data entities and fields
+- API endpoints, validation, security or performance concerns
+
+Only describe what the code shows. Keep it under {MAP_SUMMARY_TOKENS // 2} words.
+
+Module: {descriptor.get('moduleName', 'Unknown Module')}
+
+--- {item['filename']} ---
+{item['content']}
+"""
+
+def summarize(items, descriptor, invoke, concurrency=None, retries=None, summary_cache=None):
+    """Map step: summarize every item concurrently; returns (summaries, failed filenames).
+
+    With a summary_cache only items whose content is not cached go to the model.
+    """
+    if concurrency is None:
+        concurrency = MAP_CONCURRENCY
+    if retries is None:
+        retries = MAP_MAX_RETRIES
+
+    results = [None] * len(items)
+    if summary_cache:
+        context = f"{descriptor.get('moduleName', '')}\0{MAP_SUMMARY_TOKENS}"
+        keys = [summary_cache.key(item['content'], context) for item in items]
+        cached = summary_cache.get_many(keys)
+        for index, key in enumerate(keys):
+            results[index] = cached.get(key)
+    pending = [index for index, result in enumerate(results) if result is None]
+
+    def summarize_item(index):
+        return invoke(build_map_prompt(items[index], descriptor), MAP_SUMMARY_TOKENS).strip()
+
+    fresh, errors = run_parallel(pending, summarize_item, concurrency, retries=retries)
+    errors = {pending[position]: error for position, error in errors.items()}
+    for position, index in enumerate(pending):
+        if index not in errors:
+            results[index] = fresh[position]
+
+    for index, error in errors.items():
+        print(f"Map step failed for {items[index]['filename']}: {error}")
+    if items and len(errors) == len(items):
+        raise RuntimeError(f"All {len(items)} map items failed")
+
+    if summary_cache:
+        summary_cache.put_many({keys[index]: results[index] for index in pending if index not in errors})
+
+    summaries = [
+        {'filename': item['filename'], 'content': results[index]}
+        for index, item in enumerate(items)
+        if index not in errors
+    ]
+    return summaries, [items[index]['filename'] for index in sorted(errors)]
+
+def map_reduce(source_files, descriptor, invoke, build_reduce_prompt, summary_cache=None, synthesize=None):
+    """Summarize files in parallel, then synthesize the SRS from the summaries.
+
+    invoke(prompt, max_tokens) calls the model; build_reduce_prompt(summaries,
+    descriptor) builds the synthesis prompt; synthesize(prompt), if given,
+    replaces invoke for the final call (e.g. to stream it).
+    """
+    items = split_map_items(source_files)
+    summaries, failed = summarize(items, descriptor, invoke, summary_cache=summary_cache)
+
+    prompt = build_reduce_prompt(summaries, descriptor)
+    print(f"Map-reduce: {len(items)} map items, {len(failed)} failed, "
+          f"~{estimate_tokens(prompt)} synthesis prompt tokens")
+
+    stats = {
+        'mapItems': len(items),
+        'mapFailures': len(failed),
+        'promptTokens': estimate_tokens(prompt)
+    }
+    if summary_cache:
+        stats.update(summary_cache.stats())
+
+    if synthesize is None:
+        return invoke(prompt, None), stats
+    return synthesize(prompt), stats
@@ -0,0 +1,153 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Stage timings and counters per invocation, logged as CloudWatch Embedded
+# Metric Format (EMF) lines: CloudWatch turns them into metrics, so p50/p95 per
+# stage come straight from the logs with no PutMetricData calls.
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'DocGenius')
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
+# End-to-end target from submission to completion; slower jobs count as SLA breaches
+SLA_SECONDS = float(os.environ.get('SLA_SECONDS', '120'))
+
+# CloudWatch units of the counters; anything else is a plain count
+COUNTER_UNITS = {
+    'bytesIn': 'Bytes',
+    'bytesOut': 'Bytes',
+    'inputTokens': 'Count',
+    'outputTokens': 'Count'
+}
+
+class Recorder:
+    """Stage durations and counters for one invocation.
+
+    Spans may be recorded from worker threads. A stage seen more than once
+    (one span per Bedrock call, say) accumulates.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.started = time.perf_counter()
+        self._stages = {}
+        self._counters = {}
+        self._job_metrics = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - started) * 1000)
+
+    def record(self, stage, milliseconds):
+        with self._lock:
+            self._stages[stage] = self._stages.get(stage, 0) + milliseconds
+
+    def add(self, name, value):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def job_completed(self, latency_ms):
+        """Record a job's end-to-end latency (submission to completion) against the SLA"""
+        with self._lock:
+            self._job_metrics = {
+                'JobLatencyMs': latency_ms,
+                'SlaBreached': 1 if latency_ms > SLA_SECONDS * 1000 else 0
+            }
+
+    def breakdown(self):
+        """Whole-millisecond stages and counters, as stored on the job item"""
+        with self._lock:
+            result = {'stagesMs': {stage: int(round(ms)) for stage, ms in self._stages.items()}}
+            result.update({name: int(value) for name, value in self._counters.items()})
+        return result
+
+    def emit(self):
+        """Log one EMF line per stage (Function, Stage) and one for the invocation (Function)"""
+        if not METRICS_ENABLED:
+            return
+        timestamp = int(time.time() * 1000)
+        with self._lock:
+            stages = dict(self._stages)
+            counters = dict(self._counters)
+            job_metrics = dict(self._job_metrics)
+
+        for stage, milliseconds in stages.items():
+            print(json.dumps(emf_document(
+                timestamp, [['Function', 'Stage']], {'StageMs': (milliseconds, 'Milliseconds')},
+                {'Function': self.function, 'Stage': stage}
+            )))
+
+        values = {'DurationMs': ((time.perf_counter() - self.started) * 1000, 'Milliseconds')}
+        for name, value in counters.items():
+            values[name[0].upper() + name[1:]] = (value, COUNTER_UNITS.get(name, 'Count'))
+        print(json.dumps(emf_document(timestamp, [['Function']], values, {'Function': self.function})))
+
+        # Job latency is also published without dimensions, so one alarm covers
+        # jobs finished by the workflow and by the synchronous API path alike
+        if job_metrics:
+            values = {
+                'JobLatencyMs': (job_metrics['JobLatencyMs'], 'Milliseconds'),
+                'SlaBreached': (job_metrics['SlaBreached'], 'Count')
+            }
+            print(json.dumps(emf_document(timestamp, [['Function'], []], values, {'Function': self.function})))
+
+def emf_document(timestamp, dimension_sets, values, dimensions):
+    """One EMF log event: values maps metric name to (value, unit)"""
+    document = {
+        '_aws': {
+            'Timestamp': timestamp,
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': dimension_sets,
+                'Metrics': [{'Name': name, 'Unit': unit} for name, (_, unit) in values.items()]
+            }]
+        }
+    }
+    document.update(dimensions)
+    document.update({name: round(value, 2) for name, (value, _) in values.items()})
+    return document
+
+# Lambda runs one invocation per container at a time, so the invocation's
+# recorder is global (and therefore visible to its worker threads)
+_current = Recorder('unknown')
+
+def current():
+    return _current
+
+def start(function):
+    """Begin a fresh recorder for an invocation of function"""
+    global _current
+    _current = Recorder(function)
+    return _current
+
+def span(stage):
+    """Time a block as a stage of the current invocation"""
+    return _current.span(stage)
+
+def add(name, value):
+    """Add to a counter of the current invocation"""
+    _current.add(name, value)
+
+def instrumented(function):
+    """Handler decorator: a fresh recorder per invocation, emitted however the handler exits"""
+    def decorate(handler):
+        @wraps(handler)
+        def wrapper(event, context):
+            recorder = start(function)
+            try:
+                return handler(event, context)
+            finally:
+                try:
+                    recorder.emit()
+                except Exception as e:
+                    print(f"Error emitting metrics: {e}")
+        return wrapper
+    return decorate
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from errors import BadRequest, positive_int
+
+# JSON list of routes, smallest first:
+#   [{"name", "modelId", "maxInputTokens", "maxTokens", "contextTokens"}, ...]
+# Unset: one route built from BEDROCK_MODEL_ID / MAX_TOKENS / MODEL_CONTEXT_TOKENS
+MODEL_ROUTES = os.environ.get('MODEL_ROUTES')
+
+# Hedge a call once it runs past this percentile of the route's recent latencies
+HEDGING_ENABLED = os.environ.get('HEDGING_ENABLED', 'false').lower() == 'true'
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', '95'))
+# Threshold used until a route has HEDGE_MIN_SAMPLES latencies
+HEDGE_DEFAULT_MS = int(os.environ.get('HEDGE_DEFAULT_MS', '30000'))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+# Descriptor 'detail' hint: scale the route's output budget
+DETAIL_SCALE = {'brief': 0.5, 'standard': 1.0, 'detailed': 1.5}
+
+def load_routes(default_model_id, default_max_tokens, default_context_tokens):
+    """Routes from MODEL_ROUTES, sorted by the input size they accept"""
+    if not MODEL_ROUTES:
+        return [{
+            'name': 'default',
+            'modelId': default_model_id,
+            'maxInputTokens': None,
+            'maxTokens': default_max_tokens,
+            'contextTokens': default_context_tokens
+        }]
+
+    routes = json.loads(MODEL_ROUTES)
+    for route in routes:
+        route.setdefault('maxTokens', default_max_tokens)
+        route.setdefault('contextTokens', default_context_tokens)
+        route.setdefault('maxInputTokens', None)
+    # Open-ended route (no maxInputTokens) last
+    return sorted(routes, key=lambda r: float('inf') if r['maxInputTokens'] is None else r['maxInputTokens'])
+
+def choose_route(routes, input_tokens, descriptor):
+    """Pick a route for the job's input size, honoring descriptor hints.
+
+    'modelRoute' names a route outright; 'detail' (brief/standard/detailed)
+    scales the output budget; 'maxOutputTokens' caps it.
+    """
+    route = None
+    if descriptor.get('modelRoute'):
+        route = next((r for r in routes if r['name'] == descriptor['modelRoute']), None)
+        if route is None:
+            print(f"Unknown model route {descriptor['modelRoute']!r}; routing by size")
+    if route is None:
+        route = next(
+            (r for r in routes if r['maxInputTokens'] is None or input_tokens <= r['maxInputTokens']),
+            routes[-1]
+        )
+
+    max_tokens = int(route['maxTokens'] * DETAIL_SCALE.get(descriptor.get('detail'), 1.0))
+    try:
+        cap = max_output_tokens(descriptor)
+    except BadRequest as e:
+        # Checked at submission; a job queued before that check runs uncapped
+        print(f"{e}; ignoring it")
+        cap = None
+    if cap:
+        max_tokens = min(max_tokens, cap)
+    # Never let the output budget eat the whole context window
+    max_tokens = max(1, min(max_tokens, route['contextTokens'] // 2))
+
+    return dict(route, maxTokens=max_tokens)
+
+def max_output_tokens(descriptor):
+    """The descriptor's 'maxOutputTokens' cap, or None; BadRequest unless a positive integer"""
+    return positive_int(descriptor, 'maxOutputTokens')
+
+def token_bucket(max_tokens):
+    """Latency key part for an output budget: budgets within a factor of two share samples"""
+    return 1 << max(0, int(max_tokens) - 1).bit_length()
+
+class LatencyTracker:
+    """Recent successful call latencies per key, kept for the container's lifetime.
+
+    Keys are (route, output token bucket): a 600-token map call and a
+    4,000-token synthesis call on one route take very different times.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self._window)).append(seconds)
+
+    def threshold(self, name, percentile=None):
+        """Seconds after which a call with this key is slow enough to hedge"""
+        if percentile is None:
+            percentile = HEDGE_PERCENTILE
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_MS / 1000
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+class HedgedCaller:
+    """Runs calls for one route, racing a second request when the first is slow.
+
+    The first response wins; the loser is abandoned and its result ignored.
+    Counts how often a job hedged and how often the hedge came back first.
+    """
+
+    def __init__(self, route, tracker, enabled=None):
+        self.route = route
+        self._tracker = tracker
+        self._enabled = HEDGING_ENABLED if enabled is None else enabled
+        self._lock = threading.Lock()
+        self.hedged_calls = 0
+        self.hedge_wins = 0
+
+    def _timed(self, key, fn, args):
+        started = time.monotonic()
+        result = fn(*args)
+        self._tracker.record(key, time.monotonic() - started)
+        return result
+
+    def call(self, fn, *args, max_tokens=None):
+        """fn(*args), hedged against the latency of earlier calls with a similar output budget"""
+        key = (self.route['name'], token_bucket(max_tokens or self.route['maxTokens']))
+        if not self._enabled:
+            return self._timed(key, fn, args)
+
+        threshold = self._tracker.threshold(key)
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            primary = executor.submit(self._timed, key, fn, args)
+            done, _ = wait([primary], timeout=threshold)
+            if done:
+                return primary.result()
+
+            print(f"Call on route {self.route['name']} ({key[1]}-token bucket) exceeded {threshold:.1f}s; hedging")
+            hedge = executor.submit(self._timed, key, fn, args)
+            with self._lock:
+                self.hedged_calls += 1
+
+            pending = {primary, hedge}
+            first_error = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        first_error = first_error or e
+                        continue
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return result
+            raise first_error
+        finally:
+            # Never wait for the loser
+            executor.shutdown(wait=False)
+
+    def stats(self):
+        """Route and hedging outcome for the job record"""
+        return {
+            'route': self.route['name'],
+            'modelId': self.route['modelId'],
+            'maxOutputTokens': self.route['maxTokens'],
+            'hedgedCalls': self.hedged_calls,
+            'hedgeWins': self.hedge_wins,
+            'hedgeWon': self.hedge_wins > 0
+        }
@@ -1,30 +1,43 @@
 import json
-import boto3
+import runtime
 import os
 from datetime import datetime
+from admission import signal_dispatch
+import download_urls
+import metrics
+import webhooks
 
-sns = boto3.client('sns')
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+sns = runtime.lazy_client('sns')
+sqs = runtime.lazy_client('sqs')
+s3 = runtime.lazy_client('s3')
+secretsmanager = runtime.lazy_client('secretsmanager')
 
-SNS_TOPIC_ARN = os.environ['SNS_TOPIC_ARN']
+SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
 OUTPUT_BUCKET = os.environ.get('OUTPUT_BUCKET')
 JOB_TABLE = os.environ['JOB_TABLE']
+WEBHOOK_SECRET_ARN = os.environ.get('WEBHOOK_SECRET_ARN')
 
+# Signing secret, fetched once per container
+signing_secret = None
+
+@metrics.instrumented('NotifySuccess')
 def success_handler(event, context):
     """Handle successful job completion notification"""
     try:
         job_id = event['jobId']
         output_key = event.get('outputKey')
         
-        # Generate presigned URL if output exists
+        # A workflow slot just freed up
+        signal_dispatch(sqs, f"finished {job_id}")
+        
+        job = get_job(job_id)
+
+        # Reuse the URL signed at completion if it is still good
         download_url = None
-        if output_key and OUTPUT_BUCKET:
-            download_url = s3.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': OUTPUT_BUCKET, 'Key': output_key},
-                ExpiresIn=86400  # 24 hours
-            )
+        if download_urls.is_fresh(job):
+            download_url = job['downloadUrl']
+        elif output_key and OUTPUT_BUCKET:
+            download_url = download_urls.presign(s3, OUTPUT_BUCKET, output_key)['downloadUrl']
         
         # Prepare notification message
         message = {
@@ -44,6 +57,9 @@ def success_handler(event, context):
             Message=json.dumps(message),
             Subject=f'Digital Worker Job {job_id} Completed Successfully'
         )
+
+        if 'callbackUrl' in job:
+            webhooks.enqueue_delivery(sqs, job['callbackUrl'], message)
         
         return {'status': 'notification_sent'}
         
@@ -51,11 +67,16 @@ def success_handler(event, context):
         print(f"Error sending success notification: {str(e)}")
         return {'status': 'notification_failed', 'error': str(e)}
 
+@metrics.instrumented('NotifyFailure')
 def failure_handler(event, context):
     """Handle failed job notification"""
+    # A workflow slot just freed up
+    signal_dispatch(sqs, f"failed {event.get('jobId')}")
+    
     try:
         job_id = event['jobId']
-        error_message = event.get('errorMessage', 'Unknown error')
+        # The workflow's catch puts the error under 'error'
+        error_message = event.get('errorMessage') or event.get('error', {}).get('Cause', 'Unknown error')
         
         # Prepare notification message
         message = {
@@ -75,9 +96,59 @@ def failure_handler(event, context):
             Message=json.dumps(message),
             Subject=f'Digital Worker Job {job_id} Failed'
         )
+
+        job = get_job(job_id)
+        if 'callbackUrl' in job:
+            webhooks.enqueue_delivery(sqs, job['callbackUrl'], message)
         
         return {'status': 'notification_sent'}
         
     except Exception as e:
         print(f"Error sending failure notification: {str(e)}")
-        return {'status': 'notification_failed', 'error': str(e)}
\ No newline at end of file
+        return {'status': 'notification_failed', 'error': str(e)}
+
+@metrics.instrumented('WebhookDelivery')
+def webhook_handler(event, context):
+    """Deliver queued webhooks; failed records are retried with backoff, then dead-lettered"""
+    secret = get_signing_secret()
+    failures = []
+
+    for record in event['Records']:
+        # A malformed message fails only its own record, never the batch
+        delivery_id = record.get('messageId')
+        try:
+            delivery = json.loads(record['body'])
+            delivery_id = delivery['deliveryId']
+            with metrics.span('deliver'):
+                status = webhooks.deliver(delivery, secret)
+            print(f"Webhook {delivery_id} for job {delivery['payload'].get('jobId')} delivered ({status})")
+        except Exception as e:
+            receive_count = int(record['attributes'].get('ApproximateReceiveCount', '1'))
+            print(f"Webhook {delivery_id} attempt {receive_count} failed: {e}")
+            failures.append({'itemIdentifier': record['messageId']})
+            try:
+                sqs.change_message_visibility(
+                    QueueUrl=webhooks.WEBHOOK_QUEUE_URL,
+                    ReceiptHandle=record['receiptHandle'],
+                    VisibilityTimeout=webhooks.retry_delay(receive_count)
+                )
+            except Exception as visibility_error:
+                # Falls back to the queue's visibility timeout
+                print(f"Error delaying webhook retry: {visibility_error}")
+
+    return {'batchItemFailures': failures}
+
+def get_job(job_id):
+    """Delivery-related attributes of a job ({} if unknown)"""
+    result = runtime.table(JOB_TABLE).get_item(
+        Key={'jobId': job_id},
+        ProjectionExpression='callbackUrl, downloadUrl, downloadUrlExpiresAt'
+    )
+    return result.get('Item', {})
+
+def get_signing_secret():
+    """Webhook signing secret from Secrets Manager"""
+    global signing_secret
+    if signing_secret is None:
+        signing_secret = secretsmanager.get_secret_value(SecretId=WEBHOOK_SECRET_ARN)['SecretString']
+    return signing_secret
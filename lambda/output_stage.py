@@ -0,0 +1,70 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from parallel import run_parallel
+
+OUTPUT_UPLOAD_CONCURRENCY = int(os.environ.get('OUTPUT_UPLOAD_CONCURRENCY', '4'))
+OUTPUT_UPLOAD_RETRIES = 2
+GZIP_LEVEL = 6
+
+# Stored gzip-compressed with Content-Encoding: gzip; clients decode transparently
+COMPRESSIBLE_TYPES = ('text/', 'application/json')
+
+MANIFEST_NAME = 'manifest.json'
+
+def prepare(name, body, content_type):
+    """An artifact ready to upload: compressed if it is text, with its manifest entry"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    entry = {
+        'name': name,
+        'contentType': content_type,
+        'size': len(body),
+        'sha256': hashlib.sha256(body).hexdigest()
+    }
+    if content_type.startswith(COMPRESSIBLE_TYPES):
+        # mtime=0 keeps the stored bytes (and ETag) identical for identical outputs
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        entry['contentEncoding'] = 'gzip'
+    entry['storedSize'] = len(body)
+    return {'entry': entry, 'body': body}
+
+def upload_outputs(s3, bucket, job_id, rendered):
+    """Upload rendered outputs and their manifest under the job's prefix, concurrently.
+
+    rendered is a list of (name, body, content type). Returns (outputs, stats):
+    outputs maps artifact name to S3 key (manifest included), stats holds the
+    raw and stored byte counts.
+    """
+    artifacts = [prepare(name, body, content_type) for name, body, content_type in rendered]
+    manifest = {
+        'createdAt': int(datetime.utcnow().timestamp() * 1000),
+        'artifacts': [artifact['entry'] for artifact in artifacts]
+    }
+    # Entries carry names, not keys, so cached outputs can be copied to another job's prefix
+    artifacts.append(prepare(MANIFEST_NAME, json.dumps(manifest, indent=2), 'application/json'))
+
+    def put(artifact):
+        entry = artifact['entry']
+        extra = {'ContentEncoding': entry['contentEncoding']} if 'contentEncoding' in entry else {}
+        s3.put_object(
+            Bucket=bucket,
+            Key=f"{job_id}/{entry['name']}",
+            Body=artifact['body'],
+            ContentType=entry['contentType'],
+            **extra
+        )
+
+    _, errors = run_parallel(artifacts, put, OUTPUT_UPLOAD_CONCURRENCY, retries=OUTPUT_UPLOAD_RETRIES)
+    if errors:
+        index, error = next(iter(errors.items()))
+        raise RuntimeError(f"Uploading {artifacts[index]['entry']['name']} failed: {error}")
+
+    outputs = {artifact['entry']['name']: f"{job_id}/{artifact['entry']['name']}" for artifact in artifacts}
+    stats = {
+        'outputBytes': sum(artifact['entry']['size'] for artifact in artifacts),
+        'outputStoredBytes': sum(artifact['entry']['storedSize'] for artifact in artifacts)
+    }
+    return outputs, stats
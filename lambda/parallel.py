@@ -0,0 +1,76 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+
+def call_with_timeout(fn, item, timeout):
+    """fn(item), or TimeoutError once timeout seconds pass (the call is abandoned)"""
+    if timeout is None:
+        return fn(item)
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        return executor.submit(fn, item).result(timeout=timeout)
+    except FutureTimeout:
+        raise TimeoutError(f"Attempt timed out after {timeout:.1f}s")
+    finally:
+        executor.shutdown(wait=False)
+
+def with_retries(fn, item, retries, backoff_seconds, attempt_timeout=None, deadline=None):
+    """Call fn(item), retrying failures (and attempts over attempt_timeout) with jittered exponential backoff.
+
+    No attempt is started, or allowed to run, past deadline (a time.monotonic() value).
+    """
+    attempt = 0
+    while True:
+        timeout = attempt_timeout
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        try:
+            return call_with_timeout(fn, item, timeout)
+        except Exception as e:
+            delay = backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.5)
+            if attempt >= retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                raise
+            print(f"Attempt {attempt + 1} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+def run_parallel(items, fn, max_workers, retries=0, backoff_seconds=1.0, timeout=None, attempt_timeout=None):
+    """Run fn(item) for every item on a thread pool.
+
+    Returns (results, errors): results in item order (None where an item
+    failed) and a dict of item index -> exception. An attempt running longer
+    than attempt_timeout fails and is retried like any other error; items
+    still running when timeout seconds have passed overall are abandoned and
+    reported as TimeoutError.
+    """
+    results = [None] * len(items)
+    errors = {}
+    if not items:
+        return results, errors
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    try:
+        futures = {
+            executor.submit(with_retries, fn, item, retries, backoff_seconds, attempt_timeout, deadline): index
+            for index, item in enumerate(items)
+        }
+        done, not_done = wait(futures, timeout=timeout)
+
+        for future in done:
+            index = futures[future]
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                errors[index] = e
+
+        for future in not_done:
+            future.cancel()
+            errors[futures[future]] = TimeoutError(f"Timed out after {timeout}s")
+    finally:
+        # Never block on abandoned work; the threads finish in the background
+        executor.shutdown(wait=False)
+
+    return results, errors
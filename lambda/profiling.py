@@ -0,0 +1,165 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+# Opt-in job profiling: a wall-clock sampling profiler over every thread plus
+# tracemalloc, written next to the job's outputs as profile.*. With the
+# descriptor flag unset and a zero sample rate nothing is started, imported or
+# hooked, so unprofiled jobs pay nothing.
+
+# Fraction of jobs profiled without asking (descriptor 'profile': true always profiles)
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get('PROFILE_INTERVAL_SECONDS', '0.01'))
+# Frames kept per allocation; deeper tracebacks cost more memory while tracing
+PROFILE_TRACE_FRAMES = int(os.environ.get('PROFILE_TRACE_FRAMES', '8'))
+
+# A new heap snapshot is taken whenever traced memory grows this much past the last one
+SNAPSHOT_GROWTH = 1.2
+SNAPSHOT_MIN_BYTES = 1024 * 1024
+
+TOP_FUNCTIONS = 40
+TOP_ALLOCATORS = 25
+TOP_TRACEBACKS = 10
+
+SUMMARY_NAME = 'profile.txt'
+STACKS_NAME = 'profile.folded'
+
+def should_profile(descriptor):
+    """Whether this job runs under the profiler"""
+    flag = descriptor.get('profile')
+    if flag is not None:
+        return bool(flag)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+class JobProfiler:
+    """Samples every thread's stack from a background thread while tracemalloc traces allocations.
+
+    Stacks are counted in collapsed ('folded') form, one line per distinct
+    stack, which flame graph tools read directly. Heap snapshots are taken as
+    traced memory grows, so the report shows the allocators at the high-water
+    mark rather than whatever is left at the end.
+    """
+
+    def __init__(self, interval=None, trace_frames=None):
+        self._interval = interval or PROFILE_INTERVAL_SECONDS
+        self._trace_frames = trace_frames or PROFILE_TRACE_FRAMES
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._snapshot_size = 0
+        self._started = None
+        self._elapsed = 0.0
+        self._peak = 0
+        self._started_tracing = False
+        self.samples = 0
+
+    def start(self):
+        import tracemalloc
+
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(self._trace_frames)
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='job-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        import tracemalloc
+
+        self._stop.set()
+        self._thread.join()
+        self._elapsed = time.perf_counter() - self._started
+        self._take_snapshot(force=self._snapshot is None)
+        self._peak = tracemalloc.get_traced_memory()[1]
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own:
+                    self._stacks[folded_stack(frame)] += 1
+            self.samples += 1
+            self._take_snapshot()
+
+    def _take_snapshot(self, force=False):
+        import tracemalloc
+
+        current = tracemalloc.get_traced_memory()[0]
+        if force or current >= max(SNAPSHOT_MIN_BYTES, self._snapshot_size * SNAPSHOT_GROWTH):
+            self._snapshot = tracemalloc.take_snapshot()
+            self._snapshot_size = current
+
+    def folded(self):
+        """Collapsed stacks with sample counts, heaviest first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def summary(self, job_id):
+        """Readable report: top functions by self and total samples, then top allocators"""
+        import tracemalloc
+
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+        thread_samples = sum(self._stacks.values()) or 1
+
+        lines = [
+            f"Profile of job {job_id}",
+            f"Wall time {self._elapsed:.2f} s, {self.samples} samples every {self._interval * 1000:.0f} ms "
+            f"across all threads (idle pool threads show up waiting)",
+            "",
+            f"Top {TOP_FUNCTIONS} functions by self samples",
+            f"{'self %':>7} {'total %':>8}  function"
+        ]
+        for frame, count in self_counts.most_common(TOP_FUNCTIONS):
+            lines.append(f"{100 * count / thread_samples:>7.1f} {100 * total_counts[frame] / thread_samples:>8.1f}  {frame}")
+
+        lines += [
+            "",
+            f"Traced memory peak {self._peak / 1024 / 1024:.1f} MB; "
+            f"allocations live at the largest snapshot ({self._snapshot_size / 1024 / 1024:.1f} MB):",
+            "",
+            f"Top {TOP_ALLOCATORS} allocation sites"
+        ]
+        # Leave out the profiler's own bookkeeping
+        snapshot = self._snapshot.filter_traces([
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, tracemalloc.__file__)
+        ])
+        for stat in snapshot.statistics('lineno')[:TOP_ALLOCATORS]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1024:>10.1f} KB {stat.count:>8} blocks  {frame.filename}:{frame.lineno}")
+
+        lines += ["", f"Top {TOP_TRACEBACKS} allocation tracebacks"]
+        for stat in snapshot.statistics('traceback')[:TOP_TRACEBACKS]:
+            lines.append(f"{stat.size / 1024:.1f} KB in {stat.count} blocks")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        return '\n'.join(lines) + '\n'
+
+def folded_stack(frame):
+    """'outer;...;inner' for a frame, one 'function (file:first line)' entry per level"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def upload_profile(s3, bucket, job_id, profiler):
+    """Store the report and folded stacks under the job's prefix; returns their keys"""
+    keys = []
+    for name, body in ((SUMMARY_NAME, profiler.summary(job_id)), (STACKS_NAME, profiler.folded())):
+        key = f"{job_id}/{name}"
+        s3.put_object(Bucket=bucket, Key=key, Body=body.encode('utf-8'), ContentType='text/plain; charset=utf-8')
+        keys.append(key)
+    return keys
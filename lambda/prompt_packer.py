@@ -0,0 +1,145 @@
+import math
+import os
+import re
+
+# Rough tokenizer stand-in: source code averages ~3.5 characters per token
+CHARS_PER_TOKEN = 3.5
+
+MODEL_CONTEXT_TOKENS = int(os.environ.get('MODEL_CONTEXT_TOKENS', '128000'))
+# Optional hard cap on prompt size, independent of the model's window
+PROMPT_BUDGET_TOKENS = int(os.environ.get('PROMPT_BUDGET_TOKENS', '0'))
+# Headroom for estimation error
+SAFETY_MARGIN = 0.1
+
+OMITTED_MARKER = '...'
+
+# Lines that open a scope or declare something in C#, Java, JavaScript or Python
+DECLARATION = re.compile(
+    r'^\s*('
+    r'(namespace|package|import|using|from|class|interface|enum|struct|record|def|async\s+def|function|export|module\.exports)\b'
+    r'|@\w+'
+    r'|((public|private|protected|internal|static|abstract|sealed|override|virtual|async|final|readonly|partial)\s+)+'
+    r'|(const|let|var)\s+\w+\s*=\s*(async\s*)?(\(|function)'
+    r')'
+)
+
+def estimate_tokens(text):
+    """Cheap token estimate for a piece of prompt text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def file_header(filename):
+    """Separator build_prompt writes in front of every file"""
+    return f"\n--- {filename} ---\n"
+
+def input_token_budget(max_output_tokens, context_tokens=None):
+    """Tokens available for the prompt once the output budget is reserved"""
+    if context_tokens is None:
+        context_tokens = MODEL_CONTEXT_TOKENS
+    budget = int((context_tokens - max_output_tokens) * (1 - SAFETY_MARGIN))
+    if PROMPT_BUDGET_TOKENS:
+        budget = min(budget, PROMPT_BUDGET_TOKENS)
+    return max(budget, 0)
+
+def split_chunks(content):
+    """Split a file into chunks that each start at a declaration line"""
+    chunks = []
+    current = None
+
+    for line in content.split('\n'):
+        if current is None or DECLARATION.match(line):
+            current = {'declaration': line, 'body': []}
+            chunks.append(current)
+        else:
+            current['body'].append(line)
+
+    for chunk in chunks:
+        # A declaration without its body costs an extra omission marker line
+        indent = len(chunk['declaration']) - len(chunk['declaration'].lstrip())
+        marker = indent + len(OMITTED_MARKER) + 5
+        chunk['declaration_tokens'] = (len(chunk['declaration']) + 1 + marker) / CHARS_PER_TOKEN
+        chunk['body_tokens'] = sum(len(line) + 1 for line in chunk['body']) / CHARS_PER_TOKEN
+
+    return chunks
+
+def render_partial(chunks, kept_declarations, kept_bodies):
+    """Rebuild a file from the chunks that made it in, marking omitted code"""
+    lines = []
+    for index, chunk in enumerate(chunks):
+        if index not in kept_declarations:
+            if not lines or lines[-1].strip() != OMITTED_MARKER:
+                lines.append(OMITTED_MARKER)
+            continue
+        lines.append(chunk['declaration'])
+        if index in kept_bodies:
+            lines.extend(chunk['body'])
+        elif any(line.strip() for line in chunk['body']):
+            indent = re.match(r'\s*', chunk['declaration']).group(0)
+            lines.append(f"{indent}    {OMITTED_MARKER}")
+    return '\n'.join(lines)
+
+def pack_sources(source_files, budget_tokens):
+    """Fill the token budget with source files in priority order.
+
+    Whole files go in first. Files that do not fit are packed partially:
+    declarations of every remaining file first, then their bodies chunk by
+    chunk, so the model always sees the shape of each file.
+    """
+    remaining = budget_tokens
+    packed = [None] * len(source_files)
+    partial = []
+
+    for index, file_info in enumerate(source_files):
+        cost = estimate_tokens(file_header(file_info['filename'])) + estimate_tokens(file_info['content'])
+        if cost <= remaining:
+            packed[index] = {'filename': file_info['filename'], 'content': file_info['content'], 'partial': False}
+            remaining -= cost
+        else:
+            partial.append(index)
+
+    # Declarations first, across all files that did not fit whole
+    layouts = {}
+    for index in partial:
+        header_cost = estimate_tokens(file_header(source_files[index]['filename']))
+        if header_cost > remaining:
+            continue
+        remaining -= header_cost
+        chunks = split_chunks(source_files[index]['content'])
+        kept = set()
+        for chunk_index, chunk in enumerate(chunks):
+            if chunk['declaration_tokens'] <= remaining:
+                kept.add(chunk_index)
+                remaining -= chunk['declaration_tokens']
+        layouts[index] = (chunks, kept, set())
+
+    # Then bodies, in file priority and source order
+    for index in partial:
+        if index not in layouts:
+            continue
+        chunks, kept, bodies = layouts[index]
+        for chunk_index in sorted(kept):
+            if chunks[chunk_index]['body_tokens'] <= remaining:
+                bodies.add(chunk_index)
+                remaining -= chunks[chunk_index]['body_tokens']
+
+    for index, (chunks, kept, bodies) in layouts.items():
+        packed[index] = {
+            'filename': source_files[index]['filename'],
+            'content': render_partial(chunks, kept, bodies),
+            'partial': True
+        }
+
+    files = [file_info for file_info in packed if file_info is not None]
+    tokens = sum(
+        estimate_tokens(file_header(file_info['filename'])) + estimate_tokens(file_info['content'])
+        for file_info in files
+    )
+
+    return {
+        'files': files,
+        'tokens': tokens,
+        'budgetTokens': budget_tokens,
+        'partialFiles': [file_info['filename'] for file_info in files if file_info['partial']],
+        'omittedFiles': [
+            file_info['filename'] for index, file_info in enumerate(source_files) if packed[index] is None
+        ]
+    }
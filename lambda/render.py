@@ -0,0 +1,793 @@
+import html
+import io
+import os
+import re
+import zipfile
+import zlib
+from datetime import datetime
+
+# Formats rendered besides Markdown (descriptor 'outputFormats' overrides); the PDF is always made
+OUTPUT_FORMATS = [f.strip() for f in os.environ.get('OUTPUT_FORMATS', 'html,pdf').split(',') if f.strip()]
+
+TITLE = 'Software Requirements Specification'
+
+# Bump whenever rendered outputs change so cached results are not reused
+RENDER_VERSION = '3'
+
+# Markdown block syntax (the subset format_as_markdown and the models produce)
+HEADING = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+RULE = re.compile(r'^\s{0,3}([-*_])(\s*\1){2,}\s*$')
+FENCE = re.compile(r'^\s{0,3}(```|~~~)\s*([\w+-]*)')
+BULLET = re.compile(r'^(\s*)[-*+]\s+(.*)$')
+ORDERED = re.compile(r'^(\s*)(\d{1,9})[.)]\s+(.*)$')
+QUOTE = re.compile(r'^\s{0,3}>\s?(.*)$')
+TABLE_SEPARATOR = re.compile(r'^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$')
+INLINE = re.compile(
+    r'(?P<code>`+)(?P<code_text>.+?)(?P=code)'
+    r'|\*\*(?P<strong>.+?)\*\*|__(?P<strong2>.+?)__'
+    r'|\*(?P<em>[^\s*](?:.*?[^\s*])?)\*|(?<!\w)_(?P<em2>[^\s_](?:.*?[^\s_])?)_(?!\w)'
+    r'|\[(?P<link>[^\]]+)\]\((?P<href>(?:[^()\s]|\([^()\s]*\))+)\)'
+)
+# Model-written links only become links with these schemes; anything else
+# (javascript:, data:, relative paths) renders as its plain text
+SAFE_LINK = re.compile(r'^(?:https?://|mailto:)', re.IGNORECASE)
+
+def output_formats(descriptor):
+    """Rendered formats for a job, in render order; always includes the PDF"""
+    requested = descriptor.get('outputFormats') or OUTPUT_FORMATS
+    formats = [f for f in dict.fromkeys(str(f).lower() for f in requested) if f in RENDERERS]
+    return formats if 'pdf' in formats else formats + ['pdf']
+
+def output_names(formats):
+    """File names rendered for formats"""
+    return [RENDERERS[f][0] for f in formats]
+
+def render_documents(markdown, formats):
+    """Parse the Markdown once and stream its blocks to every requested backend.
+
+    Returns [(file name, bytes, content type)] in the order of formats.
+    """
+    buffers = [io.BytesIO() for _ in formats]
+    renderers = [RENDERERS[f][2](buffer, TITLE) for f, buffer in zip(formats, buffers)]
+    for block in parse_markdown(markdown):
+        for renderer in renderers:
+            renderer.block(block)
+    for renderer in renderers:
+        renderer.close()
+    return [(RENDERERS[f][0], buffer.getvalue(), RENDERERS[f][1]) for f, buffer in zip(formats, buffers)]
+
+# --- Parsing -----------------------------------------------------------------
+
+def parse_markdown(text):
+    """Yield block nodes (dicts with a 'type') for a Markdown document.
+
+    Inline content is a list of spans: (text, style, href) with style a
+    combination of 'b' and 'i', or 'code'. A '\\n' span text is a hard break.
+    """
+    lines = text.replace('\r\n', '\n').split('\n')
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if not line.strip():
+            index += 1
+            continue
+
+        fence = FENCE.match(line)
+        if fence:
+            marker, code = fence.group(1), []
+            index += 1
+            while index < len(lines) and not lines[index].lstrip().startswith(marker):
+                code.append(lines[index])
+                index += 1
+            index += 1
+            yield {'type': 'code', 'language': fence.group(2), 'text': '\n'.join(code)}
+            continue
+
+        heading = HEADING.match(line)
+        if heading:
+            yield {'type': 'heading', 'level': len(heading.group(1)), 'spans': parse_inline(heading.group(2))}
+            index += 1
+            continue
+
+        if RULE.match(line):
+            yield {'type': 'rule'}
+            index += 1
+            continue
+
+        if '|' in line and index + 1 < len(lines) and TABLE_SEPARATOR.match(lines[index + 1]):
+            header = [parse_inline(cell) for cell in table_cells(line)]
+            rows = []
+            index += 2
+            while index < len(lines) and '|' in lines[index] and lines[index].strip():
+                cells = table_cells(lines[index])
+                cells = (cells + [''] * len(header))[:len(header)]
+                rows.append([parse_inline(cell) for cell in cells])
+                index += 1
+            yield {'type': 'table', 'header': header, 'rows': rows}
+            continue
+
+        if QUOTE.match(line):
+            quoted = []
+            while index < len(lines) and QUOTE.match(lines[index]):
+                quoted.append(QUOTE.match(lines[index]).group(1))
+                index += 1
+            yield {'type': 'quote', 'spans': parse_inline(join_lines(quoted))}
+            continue
+
+        if BULLET.match(line) or ORDERED.match(line):
+            items = []
+            while index < len(lines) and lines[index].strip():
+                bullet, ordered = BULLET.match(lines[index]), ORDERED.match(lines[index])
+                if bullet and not RULE.match(lines[index]):
+                    indent, marker, content = bullet.group(1), '\u2022', bullet.group(2)
+                elif ordered:
+                    indent, marker, content = ordered.group(1), f"{ordered.group(2)}.", ordered.group(3)
+                elif lines[index].startswith((' ', '\t')) and items:
+                    # Continuation of the previous item
+                    items[-1]['text'].append(lines[index].strip())
+                    index += 1
+                    continue
+                else:
+                    break
+                level = min(3, len(indent.expandtabs(4)) // 2)
+                items.append({'level': level, 'marker': marker, 'text': [content]})
+                index += 1
+            yield {
+                'type': 'list',
+                'items': [
+                    {'level': item['level'], 'marker': item['marker'], 'spans': parse_inline(join_lines(item['text']))}
+                    for item in items
+                ]
+            }
+            continue
+
+        paragraph = []
+        while index < len(lines) and lines[index].strip() and not starts_block(lines, index):
+            paragraph.append(lines[index])
+            index += 1
+        if not paragraph:
+            # A line that looks like a block start but did not parse as one
+            paragraph.append(lines[index])
+            index += 1
+        yield {'type': 'paragraph', 'spans': parse_inline(join_lines(paragraph))}
+
+def starts_block(lines, index):
+    """True if lines[index] begins a block other than a paragraph"""
+    line = lines[index]
+    return bool(
+        FENCE.match(line) or HEADING.match(line) or RULE.match(line) or QUOTE.match(line)
+        or BULLET.match(line) or ORDERED.match(line)
+        or ('|' in line and index + 1 < len(lines) and TABLE_SEPARATOR.match(lines[index + 1]))
+    )
+
+def join_lines(lines):
+    """Join source lines; a trailing double space or backslash is a hard break"""
+    parts = []
+    for number, line in enumerate(lines):
+        if number == len(lines) - 1:
+            parts.append(line.strip())
+        elif line.endswith('  ') or line.endswith('\\'):
+            parts.append(line.rstrip(' \\').strip() + '\n')
+        else:
+            parts.append(line.strip() + ' ')
+    return ''.join(parts)
+
+def table_cells(line):
+    """Cells of a pipe table row"""
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [cell.strip() for cell in line.split('|')]
+
+def parse_inline(text, style='', href=None):
+    """Spans for inline Markdown (bold, italic, code, links, hard breaks)"""
+    spans = []
+    position = 0
+    for match in INLINE.finditer(text):
+        if match.start() > position:
+            spans.extend(plain_spans(text[position:match.start()], style, href))
+        if match.group('code'):
+            spans.append((match.group('code_text').strip(), 'code', href))
+        elif match.group('strong') or match.group('strong2'):
+            spans.extend(parse_inline(match.group('strong') or match.group('strong2'), merge_style(style, 'b'), href))
+        elif match.group('em') or match.group('em2'):
+            spans.extend(parse_inline(match.group('em') or match.group('em2'), merge_style(style, 'i'), href))
+        else:
+            link = match.group('href') if SAFE_LINK.match(match.group('href')) else href
+            spans.extend(parse_inline(match.group('link'), style, link))
+        position = match.end()
+    if position < len(text):
+        spans.extend(plain_spans(text[position:], style, href))
+    return spans
+
+def plain_spans(text, style, href):
+    """Text spans, with hard breaks split out"""
+    spans = []
+    for number, part in enumerate(text.split('\n')):
+        if number:
+            spans.append(('\n', style, None))
+        if part:
+            spans.append((part, style, href))
+    return spans
+
+def merge_style(style, flag):
+    return ''.join(sorted(set(style + flag))) if style != 'code' else style
+
+def spans_text(spans):
+    """Plain text of a list of spans"""
+    return ''.join(text for text, _, _ in spans)
+
+# --- HTML --------------------------------------------------------------------
+
+class HtmlRenderer:
+    """Standalone HTML document"""
+
+    STYLE = (
+        'body{font-family:Arial,Helvetica,sans-serif;max-width:50em;margin:40px auto;padding:0 1em;'
+        'line-height:1.5;color:#222}h1,h2,h3{color:#333}code{background:#f3f3f3;padding:0 .2em}'
+        'pre{background:#f5f5f5;padding:10px;overflow-x:auto}table{border-collapse:collapse;margin:1em 0}'
+        'th,td{border:1px solid #ccc;padding:4px 8px;text-align:left;vertical-align:top}'
+        'blockquote{border-left:3px solid #ccc;margin-left:0;padding-left:1em;color:#555}'
+    )
+
+    def __init__(self, out, title):
+        self.out = out
+        self.write(f'<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+                   f'<title>{html.escape(title)}</title>\n<style>{self.STYLE}</style>\n</head>\n<body>\n')
+
+    def write(self, text):
+        self.out.write(text.encode('utf-8'))
+
+    def block(self, node):
+        kind = node['type']
+        if kind == 'heading':
+            level = min(node['level'], 6)
+            self.write(f"<h{level}>{self.inline(node['spans'])}</h{level}>\n")
+        elif kind == 'paragraph':
+            self.write(f"<p>{self.inline(node['spans'])}</p>\n")
+        elif kind == 'quote':
+            self.write(f"<blockquote><p>{self.inline(node['spans'])}</p></blockquote>\n")
+        elif kind == 'code':
+            language = f' class="language-{html.escape(node["language"])}"' if node['language'] else ''
+            self.write(f"<pre><code{language}>{html.escape(node['text'])}</code></pre>\n")
+        elif kind == 'rule':
+            self.write('<hr>\n')
+        elif kind == 'list':
+            self.list(node['items'])
+        elif kind == 'table':
+            self.write('<table>\n<thead><tr>')
+            self.write(''.join(f'<th>{self.inline(cell)}</th>' for cell in node['header']))
+            self.write('</tr></thead>\n<tbody>\n')
+            for row in node['rows']:
+                self.write('<tr>' + ''.join(f'<td>{self.inline(cell)}</td>' for cell in row) + '</tr>\n')
+            self.write('</tbody>\n</table>\n')
+
+    def list(self, items):
+        """Nested <ul>/<ol> from flat items with levels"""
+        stack = []
+        for item in items:
+            tag = 'ul' if item['marker'] == '\u2022' else 'ol'
+            while len(stack) > item['level'] + 1 or (len(stack) == item['level'] + 1 and stack[-1] != tag):
+                self.write(f'</li></{stack.pop()}>\n')
+            if len(stack) == item['level'] + 1:
+                self.write('</li>\n')
+            while len(stack) < item['level'] + 1:
+                numbered_from = item['marker'][:-1]
+                start = '' if tag == 'ul' or stack or numbered_from == '1' else f' start="{numbered_from}"'
+                self.write(f'<{tag}{start}>\n')
+                stack.append(tag)
+            self.write(f"<li>{self.inline(item['spans'])}")
+        while stack:
+            self.write(f'</li></{stack.pop()}>\n')
+
+    def inline(self, spans):
+        parts = []
+        for text, style, href in spans:
+            if text == '\n':
+                parts.append('<br>')
+                continue
+            markup = html.escape(text)
+            if style == 'code':
+                markup = f'<code>{markup}</code>'
+            else:
+                if 'i' in style:
+                    markup = f'<em>{markup}</em>'
+                if 'b' in style:
+                    markup = f'<strong>{markup}</strong>'
+            if href:
+                markup = f'<a href="{html.escape(href)}">{markup}</a>'
+            parts.append(markup)
+        return ''.join(parts)
+
+    def close(self):
+        self.write('</body>\n</html>\n')
+
+# --- PDF ---------------------------------------------------------------------
+
+# Advance widths (1/1000 em) of ASCII 32..126 in the standard Helvetica fonts;
+# the oblique faces share them and Courier is fixed at 600
+HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+]
+HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+]
+# WinAnsi punctuation the models like to use
+EXTRA_WIDTHS = {'\u2022': 350, '\u2013': 556, '\u2014': 1000, '\u2018': 222, '\u2019': 222,
+                '\u201c': 333, '\u201d': 333, '\u2026': 1000}
+
+class PdfRenderer:
+    """Compact PDF 1.4 writer using the standard 14 fonts (nothing embedded).
+
+    Each page's content stream is deflated and written as soon as the page is
+    full, so memory stays at one page regardless of document length.
+    """
+
+    PAGE_WIDTH = 595.28  # A4
+    PAGE_HEIGHT = 841.89
+    MARGIN = 56
+    BODY_SIZE = 10.5
+    CODE_SIZE = 8.5
+    LEADING = 1.4
+    HEADING_SIZES = {1: 20, 2: 15, 3: 12.5}
+    LIST_INDENT = 18
+
+    # Resource name, base font; object numbers 3.. follow this order
+    FONTS = [('F1', 'Helvetica'), ('F2', 'Helvetica-Bold'), ('F3', 'Helvetica-Oblique'),
+             ('F4', 'Helvetica-BoldOblique'), ('F5', 'Courier')]
+    STYLE_FONTS = {'': 'F1', 'b': 'F2', 'i': 'F3', 'bi': 'F4', 'code': 'F5'}
+
+    def __init__(self, out, title):
+        self.out = out
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        # 1 catalog, 2 page tree, 3-7 fonts, 8 info; pages follow
+        self.next_id = 9
+        self.title = title
+        self.ops = []
+        self.y = self.PAGE_HEIGHT - self.MARGIN
+
+        self.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for number, (_, base_font) in enumerate(self.FONTS, 3):
+            self.object(number, f'<< /Type /Font /Subtype /Type1 /BaseFont /{base_font} '
+                                f'/Encoding /WinAnsiEncoding >>'.encode('ascii'))
+
+    # Low-level output
+
+    def write(self, data):
+        self.out.write(data)
+        self.position += len(data)
+
+    def object(self, number, body):
+        self.offsets[number] = self.position
+        self.write(f'{number} 0 obj\n'.encode('ascii') + body + b'\nendobj\n')
+
+    def allocate(self):
+        number = self.next_id
+        self.next_id += 1
+        return number
+
+    def flush_page(self):
+        """Write the current page and start a new one"""
+        page_number = len(self.page_ids) + 1
+        self.text_run(self.PAGE_WIDTH / 2 - 10, self.MARGIN / 2, [(str(page_number), 'F1', 8)])
+        stream = zlib.compress('\n'.join(self.ops).encode('latin-1'), 6)
+        content_id, page_id = self.allocate(), self.allocate()
+        self.object(content_id, f'<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n'.encode('ascii')
+                    + stream + b'\nendstream')
+        fonts = ' '.join(f'/{name} {number} 0 R' for number, (name, _) in enumerate(self.FONTS, 3))
+        self.object(page_id, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.PAGE_WIDTH} {self.PAGE_HEIGHT}] '
+            f'/Resources << /Font << {fonts} >> >> /Contents {content_id} 0 R >>'
+        ).encode('ascii'))
+        self.page_ids.append(page_id)
+        self.ops = []
+        self.y = self.PAGE_HEIGHT - self.MARGIN
+
+    def close(self):
+        self.flush_page()
+        kids = ' '.join(f'{number} 0 R' for number in self.page_ids)
+        self.object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>'.encode('ascii'))
+        self.object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        created = datetime.utcnow().strftime('%Y%m%d%H%M%SZ')
+        self.object(8, b'<< /Title ' + pdf_string(self.title) + b' /Producer (DocGenius Worker) '
+                    + f'/CreationDate (D:{created}) >>'.encode('ascii'))
+
+        xref_offset = self.position
+        lines = [f'xref\n0 {self.next_id}\n0000000000 65535 f \n']
+        for number in range(1, self.next_id):
+            lines.append(f'{self.offsets.get(number, 0):010d} 00000 n \n')
+        lines.append(f'trailer\n<< /Size {self.next_id} /Root 1 0 R /Info 8 0 R >>\n'
+                     f'startxref\n{xref_offset}\n%%EOF\n')
+        self.write(''.join(lines).encode('ascii'))
+
+    # Layout
+
+    @property
+    def width(self):
+        return self.PAGE_WIDTH - 2 * self.MARGIN
+
+    def ensure(self, height):
+        """Start a new page unless height points still fit on this one"""
+        if self.y - height < self.MARGIN and self.y < self.PAGE_HEIGHT - self.MARGIN:
+            self.flush_page()
+
+    def space(self, points):
+        self.y -= points
+
+    def text_run(self, x, y, runs):
+        """Draw (text, font, size) runs left to right from x on baseline y"""
+        parts = [f'BT {x:.2f} {y:.2f} Td']
+        current = None
+        for text, font, size in runs:
+            if (font, size) != current:
+                parts.append(f'/{font} {size} Tf')
+                current = (font, size)
+            parts.append(pdf_string(text).decode('latin-1') + ' Tj')
+        parts.append('ET')
+        self.ops.append(' '.join(parts))
+
+    def paragraph(self, spans, size, x_offset=0, width=None, bold=False, marker=None):
+        """Wrap spans to the width and draw them, breaking pages between lines"""
+        width = width or self.width - x_offset
+        leading = size * self.LEADING
+        x = self.MARGIN + x_offset
+        for number, line in enumerate(wrap(spans, size, width, bold)):
+            self.ensure(leading)
+            self.y -= leading
+            if number == 0 and marker:
+                self.text_run(x - self.LIST_INDENT + 4, self.y, [(marker, 'F1', size)])
+            if line:
+                self.text_run(x, self.y, line)
+
+    def block(self, node):
+        kind = node['type']
+        if kind == 'heading':
+            size = self.HEADING_SIZES.get(node['level'], 11)
+            # Keep a heading with at least two lines of what follows
+            self.ensure(size * 2 + self.BODY_SIZE * self.LEADING * 2)
+            self.space(size * 0.6)
+            self.paragraph(node['spans'], size, bold=True)
+            self.space(size * 0.3)
+        elif kind == 'paragraph':
+            self.paragraph(node['spans'], self.BODY_SIZE)
+            self.space(6)
+        elif kind == 'quote':
+            top, page = self.y, len(self.page_ids)
+            self.paragraph(node['spans'], self.BODY_SIZE, x_offset=14)
+            # The bar is only drawn for quotes that stay on one page
+            if len(self.page_ids) == page:
+                self.ops.append(f'0.75 G 2 w {self.MARGIN + 4:.2f} {top - 2:.2f} m '
+                                f'{self.MARGIN + 4:.2f} {self.y - 3:.2f} l S 0 G')
+            self.space(6)
+        elif kind == 'list':
+            for item in node['items']:
+                offset = self.LIST_INDENT * (item['level'] + 1)
+                self.paragraph(item['spans'], self.BODY_SIZE, x_offset=offset, marker=item['marker'])
+                self.space(2)
+            self.space(4)
+        elif kind == 'code':
+            self.code(node['text'])
+        elif kind == 'rule':
+            self.ensure(12)
+            self.space(6)
+            self.ops.append(f'0.7 G 0.5 w {self.MARGIN:.2f} {self.y:.2f} m '
+                            f'{self.MARGIN + self.width:.2f} {self.y:.2f} l S 0 G')
+            self.space(6)
+        elif kind == 'table':
+            self.table(node['header'], node['rows'])
+
+    def code(self, text):
+        leading = self.CODE_SIZE * 1.3
+        columns = int((self.width - 8) / (self.CODE_SIZE * 0.6))
+        self.space(2)
+        for source_line in text.split('\n'):
+            source_line = source_line.expandtabs(4)
+            for start in range(0, max(1, len(source_line)), columns):
+                self.ensure(leading)
+                self.y -= leading
+                self.ops.append(f'0.95 g {self.MARGIN:.2f} {self.y - 3:.2f} {self.width:.2f} {leading:.2f} re f 0 g')
+                chunk = source_line[start:start + columns]
+                if chunk:
+                    self.text_run(self.MARGIN + 4, self.y, [(chunk, 'F5', self.CODE_SIZE)])
+        self.space(8)
+
+    def table(self, header, rows):
+        columns = max(1, len(header))
+        column_width = self.width / columns
+        size = self.BODY_SIZE - 1
+        leading = size * 1.3
+        self.space(4)
+        for row_number, row in enumerate([header] + rows):
+            cells = [wrap(cell, size, column_width - 8, bold=row_number == 0) for cell in row]
+            height = max(len(lines) for lines in cells) * leading + 6
+            self.ensure(height)
+            top = self.y
+            for column, lines in enumerate(cells):
+                y = top - 2
+                for line in lines:
+                    y -= leading
+                    if line:
+                        self.text_run(self.MARGIN + column * column_width + 4, y, line)
+            self.y = top - height
+            self.ops.append(f'0.6 G 0.5 w {self.MARGIN:.2f} {self.y:.2f} m '
+                            f'{self.MARGIN + self.width:.2f} {self.y:.2f} l S 0 G')
+        self.space(8)
+
+def wrap(spans, size, width, bold=False):
+    """Break spans into lines of (text, font, size) runs no wider than width points"""
+    lines, line, line_width = [], [], 0.0
+    space_width = {}
+
+    def flush():
+        nonlocal line, line_width
+        # Drop the trailing space of a wrapped line
+        if line and line[-1][0].endswith(' '):
+            line[-1] = (line[-1][0].rstrip(' '), line[-1][1], line[-1][2])
+        lines.append(line)
+        line, line_width = [], 0.0
+
+    for text, style, _ in spans:
+        if text == '\n':
+            flush()
+            continue
+        if bold and style != 'code':
+            style = merge_style(style, 'b')
+        font = PdfRenderer.STYLE_FONTS.get(style, 'F1')
+        for word in re.findall(r'\S+\s*|\s+', text):
+            if not line and not word.strip():
+                continue
+            word_width = text_width(word.rstrip(' '), font, size)
+            if line and line_width + word_width > width:
+                flush()
+                word = word.lstrip(' ')
+            # A word wider than the line is split across lines
+            while text_width(word.rstrip(' '), font, size) > width and len(word) > 1:
+                cut = max(1, fit_chars(word, font, size, width - line_width))
+                add_run(line, word[:cut], font, size)
+                flush()
+                word = word[cut:]
+            if font not in space_width:
+                space_width[font] = text_width(' ', font, size)
+            add_run(line, word, font, size)
+            line_width += text_width(word.rstrip(' '), font, size) + space_width[font] * (len(word) - len(word.rstrip(' ')))
+    if line or not lines:
+        flush()
+    return lines
+
+def add_run(line, text, font, size):
+    """Append text to a line, merging with the previous run in the same font"""
+    if line and line[-1][1] == font and line[-1][2] == size:
+        line[-1] = (line[-1][0] + text, font, size)
+    else:
+        line.append((text, font, size))
+
+def text_width(text, font, size):
+    """Width of text in points"""
+    if font == 'F5':
+        return len(text) * 0.6 * size
+    widths = HELVETICA_BOLD_WIDTHS if font in ('F2', 'F4') else HELVETICA_WIDTHS
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += widths[code - 32] if 32 <= code <= 126 else EXTRA_WIDTHS.get(char, 556)
+    return total * size / 1000
+
+def fit_chars(word, font, size, width):
+    """How many leading characters of word fit in width points"""
+    total = 0.0
+    for count, char in enumerate(word):
+        total += text_width(char, font, size)
+        if total > width:
+            return count
+    return len(word)
+
+def pdf_string(text):
+    """PDF literal string in WinAnsi encoding"""
+    data = text.encode('cp1252', errors='replace')
+    return b'(' + data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'') + b')'
+
+# --- DOCX --------------------------------------------------------------------
+
+DOCX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '<Override PartName="/docProps/core.xml" ContentType="application/vnd.openxmlformats-package.core-properties+xml"/>'
+    '</Types>'
+)
+DOCX_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+    'Target="docProps/core.xml"/>'
+    '</Relationships>'
+)
+DOCX_DOCUMENT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '{links}</Relationships>'
+)
+DOCX_HYPERLINK_REL = (
+    '<Relationship Id="{id}" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/hyperlink" '
+    'Target="{target}" TargetMode="External"/>'
+)
+DOCX_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<w:styles xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>'
+    '<w:sz w:val="22"/></w:rPr></w:rPrDefault>'
+    '<w:pPrDefault><w:pPr><w:spacing w:after="120" w:line="264" w:lineRule="auto"/></w:pPr></w:pPrDefault>'
+    '</w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    + ''.join(
+        f'<w:style w:type="paragraph" w:styleId="Heading{level}"><w:name w:val="heading {level}"/>'
+        f'<w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:pPr><w:keepNext/>'
+        f'<w:spacing w:before="{360 - level * 60}" w:after="120"/><w:outlineLvl w:val="{level - 1}"/></w:pPr>'
+        f'<w:rPr><w:b/><w:sz w:val="{size}"/></w:rPr></w:style>'
+        for level, size in ((1, 36), (2, 30), (3, 26), (4, 23), (5, 22), (6, 22))
+    )
+    + '<w:style w:type="paragraph" w:styleId="Code"><w:name w:val="Code"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:spacing w:after="0" w:line="240" w:lineRule="auto"/><w:shd w:val="clear" w:color="auto" w:fill="F3F3F3"/></w:pPr>'
+    '<w:rPr><w:rFonts w:ascii="Consolas" w:hAnsi="Consolas" w:cs="Consolas"/><w:sz w:val="18"/></w:rPr></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Quote"><w:name w:val="Quote"/><w:basedOn w:val="Normal"/>'
+    '<w:pPr><w:ind w:left="567"/></w:pPr><w:rPr><w:i/><w:color w:val="555555"/></w:rPr></w:style>'
+    '<w:style w:type="character" w:styleId="InlineCode"><w:name w:val="Inline Code"/>'
+    '<w:rPr><w:rFonts w:ascii="Consolas" w:hAnsi="Consolas" w:cs="Consolas"/><w:sz w:val="20"/></w:rPr></w:style>'
+    '<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/>'
+    '<w:rPr><w:color w:val="0563C1"/><w:u w:val="single"/></w:rPr></w:style>'
+    '</w:styles>'
+)
+DOCX_NAMESPACE = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+DOCX_RELATIONSHIPS_NAMESPACE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+class DocxRenderer:
+    """Minimal WordprocessingML package; document.xml is streamed into the zip.
+
+    Hyperlink relationships are collected while writing and stored at close.
+    """
+
+    def __init__(self, out, title):
+        self.package = zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED)
+        self.links = {}
+        created = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.package.writestr('[Content_Types].xml', DOCX_CONTENT_TYPES)
+        self.package.writestr('_rels/.rels', DOCX_RELS)
+        self.package.writestr('word/styles.xml', DOCX_STYLES)
+        self.package.writestr('docProps/core.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<cp:coreProperties xmlns:cp="http://schemas.openxmlformats.org/package/2006/metadata/core-properties" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:dcterms="http://purl.org/dc/terms/" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">'
+            f'<dc:title>{docx_text(title)}</dc:title><dc:creator>DocGenius Worker</dc:creator>'
+            f'<dcterms:created xsi:type="dcterms:W3CDTF">{created}</dcterms:created>'
+            '</cp:coreProperties>'
+        ))
+        self.document = self.package.open('word/document.xml', 'w')
+        self.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                   f'<w:document xmlns:w="{DOCX_NAMESPACE}" xmlns:r="{DOCX_RELATIONSHIPS_NAMESPACE}"><w:body>')
+
+    def write(self, text):
+        self.document.write(text.encode('utf-8'))
+
+    def paragraph(self, spans, style=None, indent=None, prefix=None, extra=''):
+        properties = ''
+        if style:
+            properties += f'<w:pStyle w:val="{style}"/>'
+        if indent:
+            properties += f'<w:ind w:left="{indent}" w:hanging="360"/>'
+        properties += extra
+        runs = docx_run(prefix + '\t', '') if prefix else ''
+        runs += self.runs(spans)
+        self.write(f'<w:p><w:pPr>{properties}</w:pPr>{runs}</w:p>' if properties else f'<w:p>{runs}</w:p>')
+
+    def block(self, node):
+        kind = node['type']
+        if kind == 'heading':
+            self.paragraph(node['spans'], style=f"Heading{min(node['level'], 6)}")
+        elif kind == 'paragraph':
+            self.paragraph(node['spans'])
+        elif kind == 'quote':
+            self.paragraph(node['spans'], style='Quote')
+        elif kind == 'list':
+            for item in node['items']:
+                self.paragraph(item['spans'], indent=360 * (item['level'] + 1) + 360, prefix=item['marker'])
+        elif kind == 'code':
+            for line in node['text'].split('\n'):
+                self.paragraph([(line, '', None)], style='Code')
+            self.write('<w:p/>')
+        elif kind == 'rule':
+            self.write('<w:p><w:pPr><w:pBdr><w:bottom w:val="single" w:sz="6" w:space="1" w:color="AAAAAA"/>'
+                       '</w:pBdr></w:pPr></w:p>')
+        elif kind == 'table':
+            border = '<w:{0} w:val="single" w:sz="4" w:space="0" w:color="BBBBBB"/>'
+            borders = ''.join(border.format(side) for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'))
+            self.write(f'<w:tbl><w:tblPr><w:tblW w:w="5000" w:type="pct"/><w:tblBorders>{borders}</w:tblBorders>'
+                       f'</w:tblPr><w:tblGrid>' + f'<w:gridCol w:w="{9638 // max(1, len(node["header"]))}"/>' * len(node['header'])
+                       + '</w:tblGrid>')
+            for row_number, row in enumerate([node['header']] + node['rows']):
+                self.write('<w:tr>')
+                for cell in row:
+                    if row_number == 0:
+                        cell = [(text, merge_style(style, 'b'), href) for text, style, href in cell]
+                    self.write(f'<w:tc><w:p>{self.runs(cell)}</w:p></w:tc>')
+                self.write('</w:tr>')
+            self.write('</w:tbl><w:p/>')
+
+    def runs(self, spans):
+        """w:r elements for spans; linked spans go inside a w:hyperlink"""
+        parts = []
+        for text, style, href in spans:
+            run = docx_run(text, style, link=bool(href))
+            if href and text != '\n':
+                if href not in self.links:
+                    self.links[href] = f'rId{len(self.links) + 2}'
+                run = f'<w:hyperlink r:id="{self.links[href]}">{run}</w:hyperlink>'
+            parts.append(run)
+        return ''.join(parts)
+
+    def close(self):
+        self.write('<w:sectPr><w:pgSz w:w="11906" w:h="16838"/>'
+                   '<w:pgMar w:top="1134" w:right="1134" w:bottom="1134" w:left="1134" w:header="567" '
+                   'w:footer="567" w:gutter="0"/></w:sectPr></w:body></w:document>')
+        self.document.close()
+        links = ''.join(DOCX_HYPERLINK_REL.format(id=rel_id, target=html.escape(INVALID_XML_CHARS.sub('', href)))
+                        for href, rel_id in self.links.items())
+        self.package.writestr('word/_rels/document.xml.rels', DOCX_DOCUMENT_RELS.format(links=links))
+        self.package.close()
+
+def docx_text(text):
+    # html.escape, not xml.sax.saxutils (which drags in urllib.request at import)
+    return html.escape(INVALID_XML_CHARS.sub('', text), quote=False)
+
+def docx_run(text, style, link=False):
+    """One w:r element"""
+    if text == '\n':
+        return '<w:r><w:br/></w:r>'
+    if text.endswith('\t'):
+        return f'<w:r><w:t xml:space="preserve">{docx_text(text[:-1])}</w:t><w:tab/></w:r>'
+    properties = ''
+    if style == 'code':
+        properties = '<w:rStyle w:val="InlineCode"/>'
+    else:
+        if link:
+            properties += '<w:rStyle w:val="Hyperlink"/>'
+        if 'b' in style:
+            properties += '<w:b/>'
+        if 'i' in style:
+            properties += '<w:i/>'
+    properties = f'<w:rPr>{properties}</w:rPr>' if properties else ''
+    return f'<w:r>{properties}<w:t xml:space="preserve">{docx_text(text)}</w:t></w:r>'
+
+# format -> (file name, content type, renderer)
+RENDERERS = {
+    'html': ('spec.html', 'text/html', HtmlRenderer),
+    'pdf': ('spec.pdf', 'application/pdf', PdfRenderer),
+    'docx': ('spec.docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', DocxRenderer),
+}
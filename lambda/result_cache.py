@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+
+CACHE_TABLE = os.environ.get('CACHE_TABLE')
+# Outputs expire after a day in S3, so cache entries must expire sooner
+CACHE_TTL_HOURS = int(os.environ.get('CACHE_TTL_HOURS', '20'))
+
+# Descriptor fields that control caching, delivery or scheduling but do not change the result
+NON_CONTENT_FIELDS = ('bypassCache', 'callbackUrl', 'priority', 'stream', 'profile')
+
+def is_enabled(descriptor):
+    """Caching is on when a cache table is configured and the job did not opt out"""
+    return bool(CACHE_TABLE) and not descriptor.get('bypassCache')
+
+def normalize_source(content):
+    """Line endings and trailing whitespace never change the generated spec"""
+    lines = content.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+def cache_key(source_files, description, model_id, max_tokens, prompt_version, render_version, generation_mode):
+    """Content address of a generation request.
+
+    description is the feature description the prompts are built from (the
+    descriptor without job settings); the settings that still shape the
+    result are passed on their own.
+    """
+    digest = hashlib.sha256()
+
+    for file_info in sorted(source_files, key=lambda f: f['filename']):
+        digest.update(file_info['filename'].encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(hashlib.sha256(normalize_source(file_info['content']).encode('utf-8')).digest())
+
+    settings = {
+        'description': description,
+        'modelId': model_id,
+        'maxTokens': max_tokens,
+        'promptVersion': prompt_version,
+        'renderVersion': render_version,
+        'generationMode': generation_mode
+    }
+    digest.update(json.dumps(settings, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8'))
+
+    return digest.hexdigest()
+
+def lookup(table, key):
+    """Return the live cache entry for key, or None"""
+    item = table.get_item(Key={'cacheKey': key}).get('Item')
+
+    # DynamoDB TTL deletion is lazy, so check expiry ourselves
+    if not item or item['expiresAt'] <= int(datetime.utcnow().timestamp()):
+        return None
+    return item
+
+def restore(s3, bucket, entry, job_id, required=()):
+    """Copy cached outputs under the job's prefix; None if any of them is gone.
+
+    An entry lacking one of the required output names (a format this job
+    asks for that the cached job did not render) is a miss too.
+    """
+    missing = [name for name in required if name not in entry['outputs']]
+    if missing:
+        print(f"Cached outputs for {entry['cacheKey']} lack {', '.join(missing)}")
+        return None
+
+    outputs = {}
+
+    try:
+        for name, source_key in entry['outputs'].items():
+            target_key = f"{job_id}/{name}"
+            s3.copy_object(
+                Bucket=bucket,
+                Key=target_key,
+                CopySource={'Bucket': bucket, 'Key': source_key}
+            )
+            outputs[name] = target_key
+    except ClientError as e:
+        print(f"Cached output for {entry['cacheKey']} is no longer available: {e}")
+        return None
+
+    return outputs
+
+def store(table, key, job_id, outputs):
+    """Point the cache entry at a job's outputs (refreshes the TTL on every hit)"""
+    table.put_item(
+        Item={
+            'cacheKey': key,
+            'jobId': job_id,
+            'outputs': outputs,
+            'createdAt': int(datetime.utcnow().timestamp() * 1000),
+            'expiresAt': int((datetime.utcnow() + timedelta(hours=CACHE_TTL_HOURS)).timestamp())
+        }
+    )
@@ -0,0 +1,94 @@
+import os
+import threading
+
+# Shared AWS clients. boto3 is imported, and each client or resource built, on
+# first use and then cached for the life of the container: a handler only pays
+# for the services its invocation touches, and every module shares one pooled
+# connection set per service across invocations.
+
+# Sized for the widest fan-out in the package (parallel uploads and deletes, map calls)
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '32'))
+CONNECT_TIMEOUT_SECONDS = float(os.environ.get('AWS_CONNECT_TIMEOUT_SECONDS', '3'))
+READ_TIMEOUT_SECONDS = float(os.environ.get('AWS_READ_TIMEOUT_SECONDS', '20'))
+
+BEDROCK_REGION = os.environ.get('BEDROCK_REGION', 'us-east-1')
+# Non-streamed generations of a full output budget run past botocore's 60 s default
+BEDROCK_READ_TIMEOUT_SECONDS = float(os.environ.get('BEDROCK_READ_TIMEOUT_SECONDS', '120'))
+
+# Per-service overrides of the client arguments and Config settings
+SERVICE_SETTINGS = {
+    'bedrock-runtime': {
+        'region_name': BEDROCK_REGION,
+        # Throttles are retried by the shared limiter, not by the SDK: one attempt per call
+        # (legacy 'max_attempts' counts retries, so 1 would still retry once)
+        'config': {'read_timeout': BEDROCK_READ_TIMEOUT_SECONDS, 'retries': {'total_max_attempts': 1}}
+    }
+}
+
+_clients = {}
+_resources = {}
+_tables = {}
+_lock = threading.Lock()
+
+def client_kwargs(service):
+    """boto3 client arguments for a service: pooled keep-alive connections, bounded timeouts"""
+    from botocore.config import Config
+
+    settings = dict(SERVICE_SETTINGS.get(service, {}))
+    config = {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'connect_timeout': CONNECT_TIMEOUT_SECONDS,
+        'read_timeout': READ_TIMEOUT_SECONDS,
+        'tcp_keepalive': True
+    }
+    config.update(settings.pop('config', {}))
+    return dict(settings, config=Config(**config))
+
+def client(service):
+    """The container's cached client for a service"""
+    if service not in _clients:
+        with _lock:
+            if service not in _clients:
+                import boto3
+                _clients[service] = boto3.client(service, **client_kwargs(service))
+    return _clients[service]
+
+def resource(service):
+    """The container's cached resource for a service"""
+    if service not in _resources:
+        with _lock:
+            if service not in _resources:
+                import boto3
+                _resources[service] = boto3.resource(service, **client_kwargs(service))
+    return _resources[service]
+
+def table(name):
+    """A reusable DynamoDB Table handle"""
+    if name not in _tables:
+        handle = resource('dynamodb').Table(name)
+        with _lock:
+            _tables.setdefault(name, handle)
+    return _tables[name]
+
+class LazyClient:
+    """Module-level stand-in for a client or resource, built on first attribute access.
+
+    Lets modules keep 's3 = ...' globals (and pass them to helpers) without
+    creating anything at import time.
+    """
+
+    def __init__(self, factory, service):
+        self._factory = factory
+        self._service = service
+
+    def __getattr__(self, name):
+        return getattr(self._factory(self._service), name)
+
+    def __repr__(self):
+        return f"LazyClient({self._service!r})"
+
+def lazy_client(service):
+    return LazyClient(client, service)
+
+def lazy_resource(service):
+    return LazyClient(resource, service)
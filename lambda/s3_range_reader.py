@@ -0,0 +1,166 @@
+import io
+import time
+from collections import OrderedDict
+
+# Reads are served from fixed-size blocks fetched with ranged GETs
+DEFAULT_BLOCK_SIZE = 256 * 1024
+DEFAULT_CACHE_BLOCKS = 32  # 8 MB with the default block size
+
+class S3RangeReader(io.RawIOBase):
+    """Seekable read-only file object over an S3 object, backed by ranged GETs.
+
+    zipfile.ZipFile only needs seek/tell/read, so the archive is never
+    downloaded as a whole: the end-of-central-directory record and the
+    central directory come from the tail of the object and each member is
+    fetched with a single range covering its local header and data.
+    """
+
+    def __init__(self, s3_client, bucket, key, block_size=DEFAULT_BLOCK_SIZE,
+                 cache_blocks=DEFAULT_CACHE_BLOCKS, size=None):
+        super().__init__()
+        self._s3 = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._block_size = block_size
+        self._cache_blocks = max(cache_blocks, 1)
+        self._blocks = OrderedDict()
+        self._position = 0
+
+        if size is None:
+            head = s3_client.head_object(Bucket=bucket, Key=key)
+            size = head['ContentLength']
+        self.size = size
+
+        # Transfer statistics for logging and job metrics
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.fetch_seconds = 0.0
+
+    @property
+    def location(self):
+        """(bucket, key) of the object being read"""
+        return self._bucket, self._key
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            raise ValueError(f"Negative seek position {position}")
+
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        length = min(len(view), self.size - self._position)
+        if length <= 0:
+            return 0
+
+        data = self._read_range(self._position, length)
+        view[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+    def readall(self):
+        return self.read(self.size - self._position)
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self._position
+        length = min(size, self.size - self._position)
+        if length <= 0:
+            return b''
+
+        data = self._read_range(self._position, length)
+        self._position += len(data)
+        return data
+
+    def prefetch(self, start, length):
+        """Fetch [start, start + length) with one request so later reads hit the cache"""
+        end = min(start + length, self.size)
+        if start >= end:
+            return
+
+        # Never prefetch more than the cache can hold
+        end = min(end, start + self._block_size * self._cache_blocks)
+        first = start // self._block_size
+        last = (end - 1) // self._block_size
+
+        missing = [index for index in range(first, last + 1) if index not in self._blocks]
+        if missing:
+            self._fetch_blocks(missing[0], missing[-1])
+
+    def _read_range(self, start, length):
+        first = start // self._block_size
+        last = (start + length - 1) // self._block_size
+
+        # Reads larger than the cache bypass it instead of thrashing it
+        if last - first + 1 > self._cache_blocks:
+            return self._fetch(start, start + length - 1)
+
+        # Fetch each run of consecutive missing blocks with a single GET
+        index = first
+        while index <= last:
+            if index in self._blocks:
+                self._blocks.move_to_end(index)
+                index += 1
+                continue
+            run_end = index
+            while run_end + 1 <= last and run_end + 1 not in self._blocks:
+                run_end += 1
+            self._fetch_blocks(index, run_end)
+            index = run_end + 1
+
+        data = b''.join(self._blocks[index] for index in range(first, last + 1))
+        offset = start - first * self._block_size
+        return data[offset:offset + length]
+
+    def _fetch_blocks(self, first, last):
+        start = first * self._block_size
+        end = min((last + 1) * self._block_size, self.size) - 1
+        data = self._fetch(start, end)
+
+        for index in range(first, last + 1):
+            offset = (index - first) * self._block_size
+            self._blocks[index] = data[offset:offset + self._block_size]
+            self._blocks.move_to_end(index)
+
+        while len(self._blocks) > self._cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _fetch(self, start, end):
+        """Ranged GET of the inclusive byte range [start, end]"""
+        started = time.perf_counter()
+        response = self._s3.get_object(
+            Bucket=self._bucket,
+            Key=self._key,
+            Range=f"bytes={start}-{end}"
+        )
+        data = response['Body'].read()
+        self.requests += 1
+        self.bytes_fetched += len(data)
+        self.fetch_seconds += time.perf_counter() - started
+        return data
+
+def prefetch_member(reader, zip_info):
+    """Fetch a member's local header and compressed data with one ranged GET"""
+    # The local header repeats the name and may carry a different extra field
+    # than the central directory, so leave some slack after the data
+    header_size = 30 + len(zip_info.filename.encode('utf-8')) + len(zip_info.extra) + 1024
+    reader.prefetch(zip_info.header_offset, header_size + zip_info.compress_size)
@@ -0,0 +1,111 @@
+import gzip
+import json
+import zipfile
+from collections import namedtuple
+import output_stage
+from s3_range_reader import S3RangeReader, prefetch_member
+from source_selection import is_candidate
+
+# Every job keeps its archive next to its outputs ({jobId}/archive.zip) and
+# lists every candidate source entry, before selection's budget and count
+# cuts, in {jobId}/sources.json with the archive that holds it. A delta job
+# (descriptor 'baseJobId') sends only the files that changed, plus
+# 'deletedFiles'; the rest of its file set is the base job's list, so
+# selection sees the same files a full archive would have given it. Inputs
+# are deleted when a job finishes, so these copies are the only ones left;
+# they expire with the outputs.
+
+MANIFEST_NAME = 'sources.json'
+ARCHIVE_NAME = 'archive.zip'
+
+# Descriptor fields that only say how to assemble a delta job's sources
+DELTA_FIELDS = ('baseJobId', 'deletedFiles')
+
+# A file from an earlier job's archive, shaped like a zipfile.ZipInfo for source selection
+SourceRef = namedtuple('SourceRef', ['filename', 'file_size', 'archive_key'])
+
+def store(s3, bucket, job_id, archive, entries):
+    """Keep the job's archive and list its candidate entries; returns the manifest key.
+
+    entries are the job's merged candidates: ZipInfo from its own archive
+    and SourceRef carried over from a base job.
+    """
+    archive_key = f"{job_id}/{ARCHIVE_NAME}"
+    if isinstance(archive, S3RangeReader):
+        source_bucket, source_key = archive.location
+        s3.copy_object(
+            Bucket=bucket, Key=archive_key, CopySource={'Bucket': source_bucket, 'Key': source_key},
+            ContentType='application/zip'
+        )
+    else:
+        s3.put_object(Bucket=bucket, Key=archive_key, Body=archive.getvalue(), ContentType='application/zip')
+
+    files = [
+        {
+            'filename': entry.filename,
+            'size': entry.file_size,
+            'archiveKey': entry.archive_key if isinstance(entry, SourceRef) else archive_key
+        }
+        for entry in entries
+    ]
+    artifact = output_stage.prepare(MANIFEST_NAME, json.dumps({'jobId': job_id, 'files': files}), 'application/json')
+    key = f"{job_id}/{MANIFEST_NAME}"
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=artifact['body'],
+        ContentType='application/json',
+        ContentEncoding=artifact['entry']['contentEncoding']
+    )
+    return key
+
+def load(s3, bucket, key):
+    """The SourceRef list stored by store()"""
+    obj = s3.get_object(Bucket=bucket, Key=key)
+    body = obj['Body'].read()
+    if obj.get('ContentEncoding') == 'gzip':
+        body = gzip.decompress(body)
+    return [
+        SourceRef(file_info['filename'], file_info['size'], file_info['archiveKey'])
+        for file_info in json.loads(body.decode('utf-8'))['files']
+    ]
+
+def archive_keys(refs):
+    """Archives a list of SourceRef reads from"""
+    return sorted({ref.archive_key for ref in refs})
+
+def candidate_entries(zip_entries, base_refs=None, deleted_files=None):
+    """Every entry source selection may pick: the archive's candidates, plus for a
+    delta job every base file the archive does not replace and that is not deleted.
+
+    Any file in a delta archive replaces the base version, even one that no
+    longer qualifies as a source.
+    """
+    deleted = set(deleted_files or [])
+    entries = [
+        info for info in zip_entries
+        if info.filename not in deleted and is_candidate(info.filename, info.file_size)
+    ]
+    if base_refs:
+        replaced = {info.filename for info in zip_entries}
+        entries.extend(ref for ref in base_refs if ref.filename not in replaced and ref.filename not in deleted)
+    return entries
+
+def read_refs(s3, bucket, refs):
+    """filename -> bytes for SourceRef files, one ranged read per member of each archive"""
+    contents = {}
+    by_archive = {}
+    for ref in refs:
+        by_archive.setdefault(ref.archive_key, []).append(ref.filename)
+    for archive_key, names in by_archive.items():
+        reader = S3RangeReader(s3, bucket, archive_key)
+        with zipfile.ZipFile(reader, 'r') as zip_file:
+            infos = sorted((zip_file.getinfo(name) for name in names), key=lambda info: info.header_offset)
+            for info in infos:
+                prefetch_member(reader, info)
+                contents[info.filename] = zip_file.read(info)
+    return contents
+
+def without_delta_fields(descriptor):
+    """The descriptor as a full submission of the merged sources would have it"""
+    return {name: value for name, value in descriptor.items() if name not in DELTA_FIELDS}
@@ -0,0 +1,212 @@
+import os
+import re
+from errors import BadRequest, positive_int
+
+# Languages we can document, weighted by how much they say about a NopCommerce module
+LANGUAGE_WEIGHTS = {
+    '.cs': 1.0,
+    '.java': 0.9,
+    '.py': 0.9,
+    '.js': 0.7,
+}
+LANGUAGE_EXTENSIONS = {
+    'c#': '.cs', 'csharp': '.cs', 'java': '.java', 'python': '.py',
+    'javascript': '.js', 'js': '.js',
+}
+
+# Build output, vendored code and generated files never describe the module
+EXCLUDED_DIRS = {
+    'bin', 'obj', 'node_modules', 'packages', 'dist', 'build', 'target',
+    '.git', '.vs', '.idea', '__pycache__', 'venv', '.venv', 'vendor',
+}
+EXCLUDED_SUFFIXES = (
+    '.min.js', '.designer.cs', '.g.cs', '.g.i.cs', 'assemblyinfo.cs',
+    '.generated.cs', '.bundle.js',
+)
+
+# Names that usually carry a module's behaviour and data model
+ROLE_WORDS = {
+    'service', 'services', 'controller', 'manager', 'model', 'entity', 'domain',
+    'repository', 'handler', 'validator', 'factory', 'api', 'plugin',
+}
+TEST_WORDS = {'test', 'tests', 'spec', 'specs', 'mock', 'mocks', 'fake', 'fakes'}
+STOP_WORDS = {
+    'the', 'and', 'for', 'with', 'from', 'into', 'that', 'this', 'all', 'items',
+    'item', 'add', 'get', 'set', 'by', 'of', 'to', 'in', 'on', 'a', 'an', 'or',
+}
+
+MAX_FILE_BYTES = int(os.environ.get('SELECTION_MAX_FILE_BYTES', str(512 * 1024)))
+MAX_FILES = int(os.environ.get('SELECTION_MAX_FILES', '40'))
+SOURCE_BUDGET_BYTES = int(os.environ.get('SOURCE_BUDGET_BYTES', str(160 * 1024)))
+# Map-reduce summarizes files separately, so it can take far more of the archive
+MAP_REDUCE_MAX_FILES = int(os.environ.get('MAP_REDUCE_MAX_FILES', '200'))
+MAP_REDUCE_BUDGET_BYTES = int(os.environ.get('MAP_REDUCE_BUDGET_BYTES', str(1024 * 1024)))
+SOURCE_BUDGET_TOKENS = int(os.environ.get('SOURCE_BUDGET_TOKENS', '0'))
+BYTES_PER_TOKEN = 4
+
+_WORD = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+')
+
+def split_words(text):
+    """Split identifiers, paths and prose into lowercase words (camelCase aware)"""
+    return [word.lower() for word in _WORD.findall(text)]
+
+def descriptor_budget_bytes(descriptor):
+    """The descriptor's own source budget in bytes, or None; BadRequest unless a positive integer"""
+    budget_bytes = positive_int(descriptor, 'sourceBudgetBytes')
+    if budget_bytes:
+        return budget_bytes
+    budget_tokens = positive_int(descriptor, 'sourceBudgetTokens')
+    return budget_tokens * BYTES_PER_TOKEN if budget_tokens else None
+
+def source_budget_bytes(descriptor):
+    """Byte budget for selected sources; the descriptor may override the defaults"""
+    try:
+        budget_bytes = descriptor_budget_bytes(descriptor)
+    except BadRequest as e:
+        # Checked at submission; a job queued before that check gets the default
+        print(f"{e}; using the default source budget")
+        budget_bytes = None
+    if budget_bytes:
+        return budget_bytes
+    if descriptor.get('generationMode') == 'map-reduce':
+        return MAP_REDUCE_BUDGET_BYTES
+    if SOURCE_BUDGET_TOKENS:
+        return SOURCE_BUDGET_TOKENS * BYTES_PER_TOKEN
+    return SOURCE_BUDGET_BYTES
+
+def max_selected_files(descriptor):
+    """File count limit for the descriptor's generation mode"""
+    if descriptor.get('generationMode') == 'map-reduce':
+        return MAP_REDUCE_MAX_FILES
+    return MAX_FILES
+
+def descriptor_terms(descriptor):
+    """Collect the weighted search terms a descriptor gives us"""
+    module_name = descriptor.get('moduleName') or ''
+    module_words = {word for word in split_words(module_name) if len(word) > 1}
+
+    keywords = set()
+    for keyword in descriptor.get('keywords') or []:
+        keywords.update(word for word in split_words(str(keyword)) if len(word) > 2)
+
+    feature_words = set()
+    for feature in descriptor.get('features') or []:
+        text = feature.get('description', '') if isinstance(feature, dict) else str(feature)
+        feature_words.update(
+            word for word in split_words(text)
+            if len(word) > 3 and word not in STOP_WORDS
+        )
+
+    namespaces = []
+    for namespace in [descriptor.get('namespace')] + list(descriptor.get('namespaces') or []):
+        if namespace:
+            namespaces.append(namespace.lower().replace('.', '/'))
+
+    return {
+        'module': module_name.lower(),
+        'module_words': module_words,
+        'keywords': keywords - module_words,
+        'feature_words': feature_words - module_words - keywords,
+        'namespaces': namespaces,
+        'extension': LANGUAGE_EXTENSIONS.get((descriptor.get('language') or '').lower()),
+    }
+
+def is_candidate(filename, size):
+    """Cheap pre-filter applied to every central-directory entry before scoring"""
+    # Extension first: it rejects most entries (folders, assets, project files)
+    dot = filename.rfind('.')
+    if dot < 0 or filename[dot:].lower() not in LANGUAGE_WEIGHTS:
+        return False
+    if size <= 0 or size > MAX_FILE_BYTES:
+        return False
+
+    lowered = filename.lower()
+    if lowered.endswith(EXCLUDED_SUFFIXES):
+        return False
+
+    return not EXCLUDED_DIRS.intersection(lowered.split('/')[:-1])
+
+def score_directory(directory, terms):
+    """Directory part of the score: (bonus, is_test); shared by every file in it"""
+    dir_words = set(split_words(directory))
+
+    bonus = 1.5 * len(terms['module_words'] & dir_words)
+    bonus += 1 * len(terms['keywords'] & dir_words)
+    bonus += 0.25 * len(terms['feature_words'] & dir_words)
+
+    # Namespaces map onto directories (Nop.Services.Orders -> Nop.Services/Orders)
+    path = directory.lower().replace('.', '/')
+    for namespace in terms['namespaces']:
+        if namespace in path:
+            bonus += 4
+
+    return bonus, bool(TEST_WORDS & dir_words)
+
+def score_entry(filename, size, terms, directory_scores=None):
+    """Relevance of one archive entry to the descriptor (higher is better)"""
+    directory, _, basename = filename.rpartition('/')
+    stem, _, extension = basename.rpartition('.')
+    extension = '.' + extension.lower()
+    name_words = set(split_words(stem))
+
+    # Archives hold many files per directory, so score each directory once
+    if directory_scores is None:
+        directory_scores = {}
+    if directory not in directory_scores:
+        directory_scores[directory] = score_directory(directory, terms)
+    dir_bonus, in_test_dir = directory_scores[directory]
+
+    score = 1.0 + dir_bonus
+
+    if terms['module'] and terms['module'] in stem.lower():
+        score += 6
+    score += 3 * len(terms['module_words'] & name_words)
+    score += 2.5 * len(terms['keywords'] & name_words)
+    score += 0.75 * len(terms['feature_words'] & name_words)
+
+    if ROLE_WORDS & name_words:
+        score += 1
+    if in_test_dir or TEST_WORDS & name_words:
+        score *= 0.4
+
+    score *= 1.2 if extension == terms['extension'] else LANGUAGE_WEIGHTS[extension]
+
+    # Prefer files that fit a prompt; tiny stubs and huge files say less per byte
+    if size < 256:
+        score *= 0.5
+    elif size > 64 * 1024:
+        score *= 0.7
+
+    return score
+
+def rank_entries(entries, descriptor):
+    """Score every candidate entry (objects with filename and file_size), best first"""
+    terms = descriptor_terms(descriptor)
+    directory_scores = {}
+    ranked = [
+        (score_entry(entry.filename, entry.file_size, terms, directory_scores), entry)
+        for entry in entries
+        if is_candidate(entry.filename, entry.file_size)
+    ]
+    # Stable tie-break on path keeps selection deterministic across runs
+    ranked.sort(key=lambda pair: (-pair[0], pair[1].filename))
+    return ranked
+
+def select_source_files(entries, descriptor, budget_bytes=None, max_files=None):
+    """Pick the most relevant entries that fit the byte budget, best first"""
+    if budget_bytes is None:
+        budget_bytes = source_budget_bytes(descriptor)
+    if max_files is None:
+        max_files = max_selected_files(descriptor)
+
+    selected = []
+    used = 0
+    for score, entry in rank_entries(entries, descriptor):
+        if len(selected) >= max_files:
+            break
+        if used + entry.file_size > budget_bytes and selected:
+            continue
+        selected.append(entry)
+        used += entry.file_size
+
+    return selected
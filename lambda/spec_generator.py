@@ -1,13 +1,34 @@
 import json
-import boto3
+import runtime
 import os
+from botocore.exceptions import ClientError
+import time
+import uuid
 import zipfile
-import io
 from datetime import datetime
+from s3_range_reader import S3RangeReader, prefetch_member
+from source_selection import select_source_files, source_budget_bytes
+from prompt_packer import MODEL_CONTEXT_TOKENS, estimate_tokens, file_header, input_token_budget, pack_sources
+from code_compactor import compact_sources, fit_to_budget
+from map_reduce import MAP_PROMPT_VERSION, map_reduce
+from summary_cache import SUMMARY_TABLE, SummaryCache
+from stream_progress import StreamProgress
+from parallel import run_parallel
+from bedrock_limiter import Throttled, is_throttle_code
+from model_router import HedgedCaller, LatencyTracker, choose_route, load_routes
+import bedrock_limiter
+import download_urls
+import metrics
+import output_stage
+import profiling
+import render
+import result_cache
+import source_manifest
 
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
+s3 = runtime.lazy_client('s3')
+dynamodb = runtime.lazy_resource('dynamodb')
+# Throttles are retried by the shared limiter, not by the SDK (see runtime.SERVICE_SETTINGS)
+bedrock = runtime.lazy_client('bedrock-runtime')
 
 INPUT_BUCKET = os.environ['INPUT_BUCKET']
 OUTPUT_BUCKET = os.environ['OUTPUT_BUCKET']
@@ -15,126 +36,465 @@ JOB_TABLE = os.environ['JOB_TABLE']
 BEDROCK_MODEL_ID = os.environ['BEDROCK_MODEL_ID']
 MAX_TOKENS = int(os.environ['MAX_TOKENS'])
 
+# 'single', 'sections', 'map-reduce' or 'auto' (map-reduce when the sources overflow one prompt)
+GENERATION_MODE = os.environ.get('GENERATION_MODE', 'auto')
+
+# Section-parallel generation: one focused call per SRS section
+SECTION_MAX_TOKENS = int(os.environ.get('SECTION_MAX_TOKENS', '1500'))
+# Each section call gets SECTION_TIMEOUT_SECONDS before it is retried; the whole
+# fan-out, retries included, gets SECTION_DEADLINE_SECONDS
+SECTION_TIMEOUT_SECONDS = float(os.environ.get('SECTION_TIMEOUT_SECONDS', '90'))
+SECTION_MAX_RETRIES = int(os.environ.get('SECTION_MAX_RETRIES', '1'))
+SECTION_DEADLINE_SECONDS = float(os.environ.get(
+    'SECTION_DEADLINE_SECONDS', str(SECTION_TIMEOUT_SECONDS * (SECTION_MAX_RETRIES + 1) + 10)
+))
+
+# Stream the final generation and publish partial output (descriptor 'stream' overrides)
+STREAMING_ENABLED = os.environ.get('STREAMING_ENABLED', 'false').lower() == 'true'
+
+# Bump whenever build_prompt changes so cached results are not reused
+PROMPT_VERSION = '2'
+
+# Descriptor fields that configure the job rather than describe the feature;
+# they never reach the model or the cache key's description
+JOB_SETTING_FIELDS = result_cache.NON_CONTENT_FIELDS + (
+    'tenant', 'generationMode', 'detail', 'maxOutputTokens', 'modelRoute',
+    'sourceBudgetBytes', 'sourceBudgetTokens', 'outputFormats'
+)
+
+# Model and output budget are picked per job from the input size (MODEL_ROUTES)
+ROUTES = load_routes(BEDROCK_MODEL_ID, MAX_TOKENS, MODEL_CONTEXT_TOKENS)
+latency_tracker = LatencyTracker()
+
+# Every Bedrock call from every container goes through one shared limiter per model
+limiters = {}
+
+@metrics.instrumented('SpecGenerator')
 def handler(event, context):
+    # Only this attempt may finalize the job
+    attempt = str(uuid.uuid4())
     try:
         job_id = event['jobId']
         input_key = event['inputKey']
         descriptor_key = event['descriptorKey']
         
         # Update job status to Running
-        table = dynamodb.Table(JOB_TABLE)
+        table = runtime.table(JOB_TABLE)
         start_time = int(datetime.utcnow().timestamp() * 1000)
+        for limiter in limiters.values():
+            limiter.reset_stats()
         
-        table.update_item(
-            Key={'jobId': job_id},
-            UpdateExpression='SET #status = :status, startTime = :start_time',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'Running',
-                ':start_time': start_time
-            }
-        )
+        with metrics.span('start'):
+            table.update_item(
+                Key={'jobId': job_id},
+                UpdateExpression='SET #status = :status, startTime = :start_time, attempt = :attempt',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':status': 'Running',
+                    ':start_time': start_time,
+                    ':attempt': attempt
+                }
+            )
         
-        # Retrieve files from S3
-        archive_obj = s3.get_object(Bucket=INPUT_BUCKET, Key=input_key)
-        descriptor_obj = s3.get_object(Bucket=INPUT_BUCKET, Key=descriptor_key)
+        # Retrieve files from S3 (the archive is read lazily with ranged GETs)
+        with metrics.span('download'):
+            archive = S3RangeReader(s3, INPUT_BUCKET, input_key)
+            descriptor_obj = s3.get_object(Bucket=INPUT_BUCKET, Key=descriptor_key)
+            descriptor_body = descriptor_obj['Body'].read()
+        metrics.add('bytesIn', len(descriptor_body))
         
-        # Parse descriptor
-        descriptor = json.loads(descriptor_obj['Body'].read().decode('utf-8'))
+        # Parse descriptor (batch jobs point into a shared descriptor list)
+        descriptor = json.loads(descriptor_body.decode('utf-8'))
+        if 'descriptorIndex' in event:
+            descriptor = descriptor[event['descriptorIndex']]
         
-        # Extract source code from ZIP
-        archive_data = archive_obj['Body'].read()
-        source_files = extract_source_files(archive_data)
+        # Opt-in (descriptor 'profile' or PROFILE_SAMPLE_RATE); nothing runs otherwise
+        profiler = profiling.JobProfiler().start() if profiling.should_profile(descriptor) else None
+        try:
+            return generate_spec(job_id, archive, descriptor, table, start_time, attempt=attempt)
+        finally:
+            if profiler:
+                store_profile(table, job_id, profiler)
         
-        # Build prompt
-        prompt = build_prompt(source_files, descriptor)
+    except Exception as e:
+        print(f"Error processing job {job_id}: {str(e)}")
         
-        # Call Bedrock
-        spec_text = call_bedrock(prompt)
+        # Update job status to Failed, keeping the timings up to the failure
+        fail_job(table, job_id, str(e), attempt)
         
-        # Convert to Markdown and PDF
+        raise e
+
+def generate_spec(job_id, archive, descriptor, table, start_time, stream=None, cancelled=None, attempt=None):
+    """Generate, store and record the SRS for one job from an open archive.
+
+    Shared by the Step Functions task and the API's synchronous fast path.
+    stream overrides the descriptor/env streaming setting; once the optional
+    cancelled event is set, no outputs or job updates are written. The job is
+    only finalized while its record still carries this attempt.
+    """
+    # A delta job's archive holds only changed files; the rest come from its base job
+    base_refs = None
+    if descriptor.get('baseJobId'):
+        with metrics.span('download'):
+            base_refs = source_manifest.load(
+                s3, OUTPUT_BUCKET, f"{descriptor['baseJobId']}/{source_manifest.MANIFEST_NAME}"
+            )
+    
+    # Extract the most relevant source code from ZIP; ranged GETs happen during
+    # extraction, so their time is split out as the download stage
+    extract_started = time.perf_counter()
+    source_files, candidates = extract_source_files(archive, descriptor, base_refs)
+    extract_ms = (time.perf_counter() - extract_started) * 1000
+    if base_refs is not None:
+        # From here on (prompts, cache key) a delta job is its merged sources
+        descriptor = source_manifest.without_delta_fields(descriptor)
+    if isinstance(archive, S3RangeReader):
+        print(f"Fetched {archive.bytes_fetched} of {archive.size} archive bytes in {archive.requests} requests")
+        metrics.current().record('download', archive.fetch_seconds * 1000)
+        metrics.current().record('unzip', extract_ms - archive.fetch_seconds * 1000)
+        metrics.add('bytesIn', archive.bytes_fetched)
+    else:
+        metrics.current().record('unzip', extract_ms)
+        metrics.add('bytesIn', archive.getbuffer().nbytes)
+    
+    # Later delta jobs can build on this one's sources
+    source_stats = {}
+    check_cancelled(cancelled)
+    with metrics.span('upload'):
+        source_stats['sourcesKey'] = source_manifest.store(s3, OUTPUT_BUCKET, job_id, archive, candidates)
+    if base_refs is not None:
+        base_names = {ref.filename for ref in candidates if isinstance(ref, source_manifest.SourceRef)}
+        source_stats['baseFilesReused'] = sum(1 for f in source_files if f['filename'] in base_names)
+    
+    # Compact sources, then route the job to a model sized for them
+    with metrics.span('compact'):
+        compacted_files = compact_sources(source_files)
+        route = choose_route(ROUTES, sources_tokens(compacted_files), descriptor)
+    print(f"Compacted sources from {sum(len(f['content']) for f in source_files)} to "
+          f"{sum(len(f['content']) for f in compacted_files)} characters")
+    print(f"Routed job {job_id} to {route['name']} ({route['modelId']}, {route['maxTokens']} output tokens)")
+    
+    # Identical sources + descriptor + model settings: reuse the earlier result
+    cache_key = None
+    if result_cache.is_enabled(descriptor):
+        cache_table = runtime.table(result_cache.CACHE_TABLE)
+        with metrics.span('cache'):
+            cache_key = result_cache.cache_key(
+                source_files, feature_description(descriptor), route['modelId'], route['maxTokens'],
+                PROMPT_VERSION, render.RENDER_VERSION, descriptor.get('generationMode', GENERATION_MODE)
+            )
+            entry = result_cache.lookup(cache_table, cache_key)
+            check_cancelled(cancelled)
+            required = ['spec.md', output_stage.MANIFEST_NAME] + render.output_names(render.output_formats(descriptor))
+            outputs = result_cache.restore(s3, OUTPUT_BUCKET, entry, job_id, required) if entry else None
+        if outputs:
+            print(f"Cache hit for job {job_id} (key {cache_key})")
+            check_cancelled(cancelled)
+            result_cache.store(cache_table, cache_key, job_id, outputs)
+            complete_job(table, job_id, start_time, outputs['spec.pdf'], dict(source_stats, cacheHit=True), attempt)
+            return {
+                'jobId': job_id,
+                'status': 'Succeeded',
+                'outputKey': outputs['spec.pdf']
+            }
+    
+    # Generate in one call, per section, or map-reduce over summaries
+    template_tokens = estimate_tokens(build_prompt([], descriptor))
+    source_budget = input_token_budget(route['maxTokens'], route['contextTokens']) - template_tokens
+    
+    # Non-streaming calls on the route are hedged when they run past its latency percentile
+    caller = HedgedCaller(route, latency_tracker)
+    invoke = lambda prompt, max_tokens=None: caller.call(
+        call_bedrock, prompt, max_tokens or route['maxTokens'], route['modelId'],
+        max_tokens=max_tokens or route['maxTokens']
+    )
+    
+    # The final (SRS-writing) call can stream partial output to S3 as it arrives
+    progress = None
+    synthesize = invoke
+    if descriptor.get('stream', STREAMING_ENABLED) if stream is None else stream:
+        progress = StreamProgress(s3, OUTPUT_BUCKET, table, job_id)
+        synthesize = lambda prompt: call_bedrock_stream(prompt, progress, route['maxTokens'], route['modelId'])
+    
+    mode = generation_mode(descriptor, compacted_files, source_budget)
+    if mode == 'map-reduce':
+        summary_cache = SummaryCache(dynamodb, SUMMARY_TABLE, route['modelId'], MAP_PROMPT_VERSION) if SUMMARY_TABLE else None
+        # Map prompts are built between calls; the whole pass counts as Bedrock time
+        with metrics.span('bedrock'):
+            spec_text, generation_stats = map_reduce(
+                compacted_files, descriptor, invoke,
+                lambda summaries, descriptor: build_synthesis_prompt(summaries, descriptor, source_budget),
+                summary_cache=summary_cache, synthesize=synthesize
+            )
+    elif mode == 'sections':
+        spec_text, generation_stats = generate_sections(compacted_files, descriptor, source_budget, invoke)
+    else:
+        spec_text, generation_stats = generate_single(compacted_files, descriptor, source_budget, synthesize)
+    generation_stats['generationMode'] = mode
+    generation_stats.update(caller.stats())
+    generation_stats.update(limiter_stats())
+    if progress and progress.first_content_ms is not None:
+        generation_stats['timeToFirstContentMs'] = progress.first_content_ms
+    
+    # Format as Markdown, then parse it once and render every other format from that
+    with metrics.span('render'):
         markdown_content = format_as_markdown(spec_text, descriptor)
-        pdf_content = convert_to_pdf(markdown_content)
-        
-        # Store outputs
-        md_key = f"{job_id}/spec.md"
-        pdf_key = f"{job_id}/spec.pdf"
-        
-        s3.put_object(
-            Bucket=OUTPUT_BUCKET,
-            Key=md_key,
-            Body=markdown_content,
-            ContentType='text/markdown'
-        )
-        
-        s3.put_object(
-            Bucket=OUTPUT_BUCKET,
-            Key=pdf_key,
-            Body=pdf_content,
-            ContentType='application/pdf'
+        rendered = render.render_documents(markdown_content, render.output_formats(descriptor))
+    
+    # Store outputs (concurrently, text gzip-encoded, with a manifest)
+    check_cancelled(cancelled)
+    with metrics.span('upload'):
+        outputs, output_stats = output_stage.upload_outputs(
+            s3, OUTPUT_BUCKET, job_id, [('spec.md', markdown_content, 'text/markdown')] + rendered
         )
-        
-        # Update job status to Succeeded
-        end_time = int(datetime.utcnow().timestamp() * 1000)
-        latency_ms = end_time - start_time
-        
+    metrics.add('bytesOut', output_stats['outputStoredBytes'])
+    generation_stats.update(output_stats)
+    pdf_key = outputs['spec.pdf']
+    
+    check_cancelled(cancelled)
+    if cache_key:
+        result_cache.store(cache_table, cache_key, job_id, outputs)
+    
+    # Update job status to Succeeded
+    complete_job(table, job_id, start_time, pdf_key, dict(generation_stats, cacheHit=False, **source_stats), attempt)
+    
+    return {
+        'jobId': job_id,
+        'status': 'Succeeded',
+        'outputKey': pdf_key
+    }
+
+class GenerationCancelled(Exception):
+    """The job was handed to another worker while this generation was running"""
+
+def store_profile(table, job_id, profiler):
+    """Stop the profiler and publish its profile.* files on the job; never fails the job"""
+    try:
+        profiler.stop()
+        keys = profiling.upload_profile(s3, OUTPUT_BUCKET, job_id, profiler)
         table.update_item(
             Key={'jobId': job_id},
-            UpdateExpression='SET #status = :status, endTime = :end_time, outputKey = :output_key, latencyMs = :latency',
-            ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'Succeeded',
-                ':end_time': end_time,
-                ':output_key': pdf_key,
-                ':latency': latency_ms
-            }
+            UpdateExpression='SET profileKeys = :keys',
+            ExpressionAttributeValues={':keys': keys}
         )
-        
-        return {
-            'jobId': job_id,
-            'status': 'Succeeded',
-            'outputKey': pdf_key
-        }
-        
+        print(f"Stored profile for job {job_id} ({profiler.samples} samples): {', '.join(keys)}")
     except Exception as e:
-        print(f"Error processing job {job_id}: {str(e)}")
-        
-        # Update job status to Failed
-        table.update_item(
+        print(f"Error storing profile for job {job_id}: {e}")
+
+def check_cancelled(cancelled):
+    """Stop before writing anything once the caller has given up on this generation"""
+    if cancelled is not None and cancelled.is_set():
+        raise GenerationCancelled('Generation cancelled')
+
+def fail_job(table, job_id, error_message, attempt=None):
+    """Mark the job Failed with the timings up to the failure, unless another attempt owns it"""
+    update = {
+        'Key': {'jobId': job_id},
+        'UpdateExpression': 'SET #status = :status, errorMessage = :error, breakdown = :breakdown',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {
+            ':status': 'Failed',
+            ':error': error_message,
+            ':breakdown': metrics.current().breakdown()
+        }
+    }
+    if attempt:
+        # A failure before the start update leaves no attempt on the record yet
+        update['ConditionExpression'] = 'attribute_not_exists(attempt) OR attempt = :attempt'
+        update['ExpressionAttributeValues'][':attempt'] = attempt
+    try:
+        table.update_item(**update)
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        print(f"Job {job_id} belongs to another attempt; not marking it Failed")
+
+def complete_job(table, job_id, start_time, output_key, attributes, attempt=None):
+    """Mark the job Succeeded with its output, latency, stage breakdown and any extra attributes.
+
+    One conditional write: only a job that is still Running (under this
+    attempt, when given) is finalized, so a job that was failed or handed off
+    meanwhile is left as it is (False).
+    """
+    end_time = int(datetime.utcnow().timestamp() * 1000)
+    values = {
+        ':status': 'Succeeded',
+        ':running': 'Running',
+        ':end_time': end_time,
+        ':output_key': output_key,
+        ':latency': end_time - start_time
+    }
+    update = 'SET #status = :status, endTime = :end_time, outputKey = :output_key, latencyMs = :latency'
+    condition = '#status = :running'
+    if attempt:
+        condition += ' AND attempt = :attempt'
+        values[':attempt'] = attempt
+    
+    # Sign the download URL once here instead of on every status poll
+    attributes = dict(attributes, **download_urls.presign(s3, OUTPUT_BUCKET, output_key))
+    attributes['breakdown'] = metrics.current().breakdown()
+    
+    for name, value in attributes.items():
+        update += f', {name} = :{name}'
+        values[f':{name}'] = value
+    
+    try:
+        job = table.update_item(
             Key={'jobId': job_id},
-            UpdateExpression='SET #status = :status, errorMessage = :error',
+            UpdateExpression=update,
+            ConditionExpression=condition,
             ExpressionAttributeNames={'#status': 'status'},
-            ExpressionAttributeValues={
-                ':status': 'Failed',
-                ':error': str(e)
-            }
-        )
-        
-        raise e
+            ExpressionAttributeValues=values,
+            ReturnValues='ALL_NEW'
+        ).get('Attributes', {})
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        print(f"Job {job_id} is no longer Running under this attempt; leaving its record unchanged")
+        return False
+    
+    # The SLA runs from submission, so queueing time counts too
+    if 'submitTime' in job:
+        metrics.current().job_completed(end_time - int(job['submitTime']))
+    return True
 
-def extract_source_files(archive_data):
-    """Extract up to 5 source files from ZIP, max 200 lines each"""
+def extract_source_files(archive_file, descriptor, base_refs=None):
+    """Extract the source files most relevant to the descriptor, in relevance order.
+    
+    Returns (source files, every candidate entry). With base_refs (a delta
+    job) the archive's files replace or add to the base job's, less the
+    descriptor's 'deletedFiles', and selection runs over the merged set.
+    """
     source_files = []
     
-    with zipfile.ZipFile(io.BytesIO(archive_data), 'r') as zip_file:
-        for file_info in zip_file.filelist[:5]:  # Limit to 5 files
-            if file_info.filename.endswith(('.cs', '.js', '.py', '.java')):
-                try:
-                    content = zip_file.read(file_info.filename).decode('utf-8')
-                    lines = content.split('\n')[:200]  # Limit to 200 lines
-                    source_files.append({
-                        'filename': file_info.filename,
-                        'content': '\n'.join(lines)
-                    })
-                except:
-                    continue
-    
-    return source_files
+    with zipfile.ZipFile(archive_file, 'r') as zip_file:
+        candidates = source_manifest.candidate_entries(zip_file.infolist(), base_refs, descriptor.get('deletedFiles'))
+        selected = select_source_files(candidates, selection_descriptor(descriptor, candidates))
+        
+        # Base files come from the archives of earlier jobs
+        refs = [file_info for file_info in selected if isinstance(file_info, source_manifest.SourceRef)]
+        raw = source_manifest.read_refs(s3, OUTPUT_BUCKET, refs) if refs else {}
+        
+        # Read in archive order so prefetched ranges stay sequential
+        archived = [file_info for file_info in selected if not isinstance(file_info, source_manifest.SourceRef)]
+        for file_info in sorted(archived, key=lambda info: info.header_offset):
+            try:
+                if isinstance(archive_file, S3RangeReader):
+                    prefetch_member(archive_file, file_info)
+                raw[file_info.filename] = zip_file.read(file_info)
+            except (zipfile.BadZipFile, NotImplementedError) as e:
+                print(f"Skipping {file_info.filename}: {e}")
+        
+        contents = {}
+        for name, data in raw.items():
+            try:
+                contents[name] = data.decode('utf-8-sig')
+            except UnicodeDecodeError as e:
+                print(f"Skipping {name}: {e}")
+        
+        # Keep relevance order for the prompt
+        for file_info in selected:
+            if file_info.filename in contents:
+                source_files.append({
+                    'filename': file_info.filename,
+                    'content': contents[file_info.filename]
+                })
+    
+    return source_files, candidates
 
-def build_prompt(source_files, descriptor):
-    """Build Bedrock prompt from source files and descriptor"""
-    prompt = """You are a technical writer for a .NET e-commerce platform.
-Given the following source code snippets and feature description, produce a Software Requirements Specification (SRS) that includes:
+def selection_descriptor(descriptor, candidates):
+    """The descriptor source selection runs with, given the generation mode.
+
+    Map-reduce (asked for, or 'auto' with more candidate source than the
+    single-prompt selection budget) selects with the map-reduce budget, so
+    generation_mode sees the sources that do not fit one prompt rather than
+    a cut already sized for one.
+    """
+    mode = descriptor.get('generationMode', GENERATION_MODE)
+    if mode == 'auto' and sum(entry.file_size for entry in candidates) > source_budget_bytes(descriptor):
+        mode = 'map-reduce'
+    if mode == 'map-reduce':
+        return dict(descriptor, generationMode='map-reduce')
+    return descriptor
+
+def generation_mode(descriptor, compacted_files, source_budget):
+    """Pick single-call, section-parallel or map-reduce generation for this job"""
+    mode = descriptor.get('generationMode', GENERATION_MODE)
+    if mode in ('single', 'sections', 'map-reduce'):
+        return mode
+    return 'map-reduce' if sources_tokens(compacted_files) > source_budget else 'single'
+
+def sources_tokens(source_files):
+    """Estimated prompt tokens for source files packed whole"""
+    return sum(estimate_tokens(file_header(f['filename']) + f['content']) for f in source_files)
+
+def generate_single(compacted_files, descriptor, source_budget, synthesize=None):
+    """Pack as much source as fits the model's input budget into one prompt"""
+    with metrics.span('prompt'):
+        fitted_files = fit_to_budget(compacted_files, source_budget)
+        packed = pack_sources(fitted_files, source_budget)
+        prompt = build_prompt(packed['files'], descriptor)
+        prompt_tokens = estimate_tokens(prompt)
+    print(f"Packed {len(packed['files'])} files ({len(packed['partialFiles'])} partial, "
+          f"{sum(1 for f in fitted_files if f['compaction'] == 'skeleton')} skeletonized, "
+          f"{len(packed['omittedFiles'])} omitted) into ~{prompt_tokens} prompt tokens")
+    
+    with metrics.span('bedrock'):
+        spec_text = (synthesize or call_bedrock)(prompt)
+    return spec_text, {
+        'promptTokens': prompt_tokens,
+        'packedFiles': len(packed['files']),
+        'partialFiles': len(packed['partialFiles'])
+    }
+
+def generate_sections(compacted_files, descriptor, source_budget, invoke=None):
+    """Generate every SRS section in parallel from one shared packed context"""
+    with metrics.span('prompt'):
+        fitted_files = fit_to_budget(compacted_files, source_budget)
+        packed = pack_sources(fitted_files, source_budget)
+    
+    def generate_section(section):
+        prompt = build_section_prompt(packed['files'], descriptor, section)
+        return (invoke or call_bedrock)(prompt, SECTION_MAX_TOKENS).strip()
+    
+    with metrics.span('bedrock'):
+        results, errors = run_parallel(
+            SRS_SECTIONS, generate_section, len(SRS_SECTIONS),
+            retries=SECTION_MAX_RETRIES, timeout=SECTION_DEADLINE_SECONDS,
+            attempt_timeout=SECTION_TIMEOUT_SECONDS
+        )
+    
+    sections = []
+    for index, section in enumerate(SRS_SECTIONS):
+        if index not in errors:
+            sections.append((section['title'], results[index]))
+            continue
+        print(f"Section '{section['title']}' failed: {errors[index]}")
+        if section['required']:
+            raise RuntimeError(f"Required section '{section['title']}' failed: {errors[index]}")
+        sections.append((section['title'], '_This section could not be generated._'))
+    
+    return sections, {
+        'promptTokens': estimate_tokens(build_section_prompt(packed['files'], descriptor, SRS_SECTIONS[0])),
+        'packedFiles': len(packed['files']),
+        'partialFiles': len(packed['partialFiles']),
+        'failedSections': len(errors)
+    }
+
+SRS_SECTIONS = [
+    {'title': 'Overview', 'required': True,
+     'instruction': 'Describe the purpose, scope and main actors of the module.'},
+    {'title': 'Functional Requirements', 'required': True,
+     'instruction': 'List the functional requirements as a numbered list.'},
+    {'title': 'Non-Functional Requirements', 'required': True,
+     'instruction': 'Describe performance and security requirements.'},
+    {'title': 'Data Model', 'required': False,
+     'instruction': 'Describe the entities, fields and relationships, if applicable.'},
+    {'title': 'API Endpoints', 'required': False,
+     'instruction': 'List the API endpoints with method, path, inputs and outputs, if any.'},
+]
+
+SRS_INSTRUCTIONS = """produce a Software Requirements Specification (SRS) that includes:
 
 1. Overview
 2. Functional Requirements (numbered list)
@@ -143,15 +503,24 @@ Given the following source code snippets and feature description, produce a Soft
 5. API Endpoints (if any)
 
 Keep the total length ≤3000 words.
+"""
+
+def feature_description(descriptor):
+    """The descriptor as prompts show it: the feature, without job settings like callbackUrl"""
+    return {name: value for name, value in descriptor.items() if name not in JOB_SETTING_FIELDS}
 
+def build_prompt(source_files, descriptor):
+    """Build Bedrock prompt from source files and descriptor"""
+    prompt = f"""You are a technical writer for a .NET e-commerce platform.
+Given the following source code snippets and feature description, {SRS_INSTRUCTIONS}
 Feature Description:
 """
     
-    prompt += json.dumps(descriptor, indent=2)
+    prompt += json.dumps(feature_description(descriptor), indent=2)
     prompt += "\n\nSource Code Files:\n"
     
     for file_info in source_files:
-        prompt += f"\n--- {file_info['filename']} ---\n"
+        prompt += file_header(file_info['filename'])
         prompt += file_info['content']
         prompt += "\n"
     
@@ -159,27 +528,148 @@ Feature Description:
     
     return prompt
 
-def call_bedrock(prompt):
-    """Call Bedrock Titan model"""
-    body = {
+def build_section_prompt(source_files, descriptor, section):
+    """Build a focused prompt for one SRS section"""
+    prompt = f"""You are a technical writer for a .NET e-commerce platform.
+Given the following source code snippets and feature description, write only the
+"{section['title']}" section of a Software Requirements Specification (SRS).
+{section['instruction']}
+Do not write any other section and do not repeat the section heading.
+Keep it under 700 words.
+
+Feature Description:
+"""
+    
+    prompt += json.dumps(feature_description(descriptor), indent=2)
+    prompt += "\n\nSource Code Files:\n"
+    
+    for file_info in source_files:
+        prompt += file_header(file_info['filename'])
+        prompt += file_info['content']
+        prompt += "\n"
+    
+    prompt += f"\n\nPlease write the {section['title']} section based on the above information."
+    
+    return prompt
+
+def build_synthesis_prompt(summaries, descriptor, budget=None):
+    """Build the map-reduce synthesis prompt from per-file summaries"""
+    # Hundreds of summaries can still overflow the window; keep the most relevant
+    if budget is None:
+        budget = input_token_budget(MAX_TOKENS) - estimate_tokens(build_prompt([], descriptor))
+    summaries = pack_sources(summaries, budget)['files']
+    
+    prompt = f"""You are a technical writer for a .NET e-commerce platform.
+Given the following summaries of source files and feature description, {SRS_INSTRUCTIONS}
+Feature Description:
+"""
+    
+    prompt += json.dumps(feature_description(descriptor), indent=2)
+    prompt += "\n\nSource File Summaries:\n"
+    
+    for summary in summaries:
+        prompt += file_header(summary['filename'])
+        prompt += summary['content']
+        prompt += "\n"
+    
+    prompt += "\n\nPlease generate a comprehensive SRS document based on the above information."
+    
+    return prompt
+
+def bedrock_request(prompt, max_tokens=None):
+    """Request body for the Bedrock Titan text model"""
+    return json.dumps({
         "inputText": prompt,
         "textGenerationConfig": {
-            "maxTokenCount": MAX_TOKENS,
+            "maxTokenCount": max_tokens or MAX_TOKENS,
             "temperature": 0.1,
             "topP": 0.9
         }
-    }
-    
+    })
+
+def limiter_for(model_id):
+    """Shared rate limiter for one model"""
+    if model_id not in limiters:
+        limiters[model_id] = bedrock_limiter.from_env(dynamodb, model_id)
+    return limiters[model_id]
+
+def limiter_stats():
+    """Throttle and wait totals across every model the job called"""
+    stats = {'bedrockThrottles': 0, 'bedrockWaitMs': 0}
+    for limiter in limiters.values():
+        for name, value in limiter.stats().items():
+            stats[name] += value
+    return stats
+
+def call_bedrock(prompt, max_tokens=None, model_id=None):
+    """Call Bedrock Titan model through the shared rate limiter"""
+    model_id = model_id or BEDROCK_MODEL_ID
+    return limiter_for(model_id).call(invoke_bedrock, prompt, max_tokens, model_id)
+
+def call_bedrock_stream(prompt, progress, max_tokens=None, model_id=None):
+    """Streaming Bedrock call through the shared rate limiter"""
+    model_id = model_id or BEDROCK_MODEL_ID
+    return limiter_for(model_id).call(invoke_bedrock_stream, prompt, progress, max_tokens, model_id)
+
+def invoke_bedrock(prompt, max_tokens=None, model_id=None):
+    """Call Bedrock Titan model"""
     response = bedrock.invoke_model(
-        modelId=BEDROCK_MODEL_ID,
-        body=json.dumps(body)
+        modelId=model_id or BEDROCK_MODEL_ID,
+        body=bedrock_request(prompt, max_tokens)
     )
     
     response_body = json.loads(response['body'].read())
-    return response_body['results'][0]['outputText']
+    result = response_body['results'][0]
+    metrics.add('inputTokens', response_body.get('inputTextTokenCount') or estimate_tokens(prompt))
+    metrics.add('outputTokens', result.get('tokenCount') or estimate_tokens(result['outputText']))
+    return result['outputText']
+
+def invoke_bedrock_stream(prompt, progress, max_tokens=None, model_id=None):
+    """Call Bedrock Titan model with a response stream, reporting progress per chunk"""
+    response = bedrock.invoke_model_with_response_stream(
+        modelId=model_id or BEDROCK_MODEL_ID,
+        body=bedrock_request(prompt, max_tokens)
+    )
+    
+    parts = []
+    tokens = 0
+    input_tokens = None
+    for event in response['body']:
+        if 'chunk' not in event:
+            # Stream-level errors arrive as events rather than exceptions
+            error = next(iter(event.items()), ('UnknownError', {}))
+            if is_throttle_code(error[0]):
+                raise Throttled(f"Bedrock stream error {error[0]}: {error[1]}")
+            raise RuntimeError(f"Bedrock stream error {error[0]}: {error[1]}")
+        
+        chunk = json.loads(event['chunk']['bytes'])
+        input_tokens = chunk.get('inputTextTokenCount') or input_tokens
+        parts.append(chunk.get('outputText', ''))
+        tokens = chunk.get('totalOutputTextTokenCount') or tokens + estimate_tokens(parts[-1])
+        progress.update(parts, tokens)
+    
+    text = ''.join(parts)
+    progress.flush(text, tokens, complete=True)
+    metrics.add('inputTokens', input_tokens or estimate_tokens(prompt))
+    metrics.add('outputTokens', tokens)
+    return text
+
+def assemble_sections(sections):
+    """Stitch (title, text) section results into one document in SRS order"""
+    parts = []
+    for number, (title, text) in enumerate(sections, 1):
+        lines = text.strip().split('\n')
+        # Drop a heading the model added despite being asked not to
+        if lines and lines[0].lstrip('#').strip().rstrip(':').lower().endswith(title.lower()):
+            lines = lines[1:]
+        parts.append(f"## {number}. {title}\n\n" + '\n'.join(lines).strip())
+    return '\n\n'.join(parts)
 
 def format_as_markdown(spec_text, descriptor):
-    """Format spec text as Markdown with front matter"""
+    """Format spec text (or a list of (title, text) sections) as Markdown with front matter"""
+    if isinstance(spec_text, list):
+        spec_text = assemble_sections(spec_text)
+    
     module_name = descriptor.get('moduleName', 'Unknown Module')
     version = descriptor.get('version', '1.0')
     
@@ -194,24 +684,3 @@ def format_as_markdown(spec_text, descriptor):
 """
     
     return markdown
-
-def convert_to_pdf(markdown_content):
-    """Convert Markdown to PDF (simplified for PoC)"""
-    # For PoC, return HTML-wrapped content as "PDF"
-    html_content = f"""
-    <html>
-    <head>
-        <title>Software Requirements Specification</title>
-        <style>
-            body {{ font-family: Arial, sans-serif; margin: 40px; }}
-            h1, h2, h3 {{ color: #333; }}
-            pre {{ background: #f5f5f5; padding: 10px; }}
-        </style>
-    </head>
-    <body>
-        <pre>{markdown_content}</pre>
-    </body>
-    </html>
-    """
-    
-    return html_content.encode('utf-8')
\ No newline at end of file
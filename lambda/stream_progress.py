@@ -0,0 +1,61 @@
+import os
+import time
+from datetime import datetime
+
+PROGRESS_INTERVAL_SECONDS = float(os.environ.get('PROGRESS_INTERVAL_SECONDS', '3'))
+
+class StreamProgress:
+    """Publishes a streaming generation's partial output and token count.
+
+    S3 has no appendable objects and multipart uploads stay invisible until
+    completed, so the partial Markdown is rewritten as one small object at
+    most every PROGRESS_INTERVAL_SECONDS, alongside a job record update.
+    """
+
+    def __init__(self, s3, bucket, table, job_id, interval=None):
+        self._s3 = s3
+        self._bucket = bucket
+        self._table = table
+        self._job_id = job_id
+        self._interval = PROGRESS_INTERVAL_SECONDS if interval is None else interval
+        self._last_flush = 0.0
+        self.partial_key = f"{job_id}/spec.partial.md"
+        self.first_content_ms = None
+        self._started = time.monotonic()
+
+    def update(self, parts, tokens):
+        """Called for every streamed chunk with the chunks so far; flushes when the interval has passed.
+
+        The chunks are only joined when a flush is due, so the cost per chunk stays constant.
+        """
+        if self.first_content_ms is None and parts and parts[-1]:
+            self.first_content_ms = int((time.monotonic() - self._started) * 1000)
+            self.flush(''.join(parts), tokens)
+        elif time.monotonic() - self._last_flush >= self._interval:
+            self.flush(''.join(parts), tokens)
+
+    def flush(self, text, tokens, complete=False):
+        """Write the partial output and progress to S3 and the job record"""
+        self._last_flush = time.monotonic()
+        try:
+            self._s3.put_object(
+                Bucket=self._bucket,
+                Key=self.partial_key,
+                Body=text.encode('utf-8'),
+                ContentType='text/markdown'
+            )
+            self._table.update_item(
+                Key={'jobId': self._job_id},
+                UpdateExpression='SET generatedTokens = :tokens, partialKey = :partial_key, '
+                                 'partialAvailable = :available, generationComplete = :complete, progressTime = :time',
+                ExpressionAttributeValues={
+                    ':tokens': tokens,
+                    ':partial_key': self.partial_key,
+                    ':available': True,
+                    ':complete': complete,
+                    ':time': int(datetime.utcnow().timestamp() * 1000)
+                }
+            )
+        except Exception as e:
+            # Progress is best effort; never fail the generation because of it
+            print(f"Error publishing progress for job {self._job_id}: {e}")
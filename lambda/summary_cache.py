@@ -0,0 +1,79 @@
+import hashlib
+import os
+from decimal import Decimal
+from datetime import datetime, timedelta
+
+SUMMARY_TABLE = os.environ.get('SUMMARY_TABLE')
+SUMMARY_TTL_DAYS = int(os.environ.get('SUMMARY_TTL_DAYS', '30'))
+
+# DynamoDB BatchGetItem limit
+BATCH_GET_SIZE = 100
+
+class SummaryCache:
+    """Per-file summaries keyed by content hash, map prompt version and model.
+
+    Unchanged files between archive versions hit the cache, so only new or
+    edited files are summarized again before synthesis.
+    """
+
+    def __init__(self, dynamodb, table_name, model_id, prompt_version):
+        self._dynamodb = dynamodb
+        self._table_name = table_name
+        self._table = dynamodb.Table(table_name)
+        self._model_id = model_id
+        self._prompt_version = prompt_version
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, content, context=''):
+        """Cache key for a map item's content and the prompt context it was summarized with"""
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        settings = hashlib.sha256(
+            f"{self._model_id}\0{self._prompt_version}\0{context}".encode('utf-8')
+        ).hexdigest()[:16]
+        return f"{digest}:{settings}"
+
+    def get_many(self, keys):
+        """Fetch cached summaries; returns key -> summary for the hits"""
+        found = {}
+        unique = list(dict.fromkeys(keys))
+
+        for start in range(0, len(unique), BATCH_GET_SIZE):
+            request = {
+                self._table_name: {
+                    'Keys': [{'summaryKey': key} for key in unique[start:start + BATCH_GET_SIZE]],
+                    'ProjectionExpression': 'summaryKey, summary'
+                }
+            }
+            while request:
+                response = self._dynamodb.batch_get_item(RequestItems=request)
+                for item in response['Responses'].get(self._table_name, []):
+                    found[item['summaryKey']] = item['summary']
+                request = response.get('UnprocessedKeys') or None
+
+        self.hits += sum(1 for key in keys if key in found)
+        self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, summaries):
+        """Store key -> summary pairs"""
+        expires_at = int((datetime.utcnow() + timedelta(days=SUMMARY_TTL_DAYS)).timestamp())
+        created_at = int(datetime.utcnow().timestamp() * 1000)
+
+        with self._table.batch_writer(overwrite_by_pkeys=['summaryKey']) as batch:
+            for key, summary in summaries.items():
+                batch.put_item(Item={
+                    'summaryKey': key,
+                    'summary': summary,
+                    'createdAt': created_at,
+                    'expiresAt': expires_at
+                })
+
+    def stats(self):
+        """Hit/miss counts for the job record"""
+        total = self.hits + self.misses
+        return {
+            'summaryCacheHits': self.hits,
+            'summaryCacheMisses': self.misses,
+            'summaryCacheHitRatio': Decimal(str(round(self.hits / total, 3))) if total else Decimal('0')
+        }
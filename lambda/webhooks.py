@@ -0,0 +1,143 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import time
+import uuid
+from urllib.parse import urlparse
+from errors import BadRequest
+
+WEBHOOK_QUEUE_URL = os.environ.get('WEBHOOK_QUEUE_URL')
+WEBHOOK_TIMEOUT_SECONDS = float(os.environ.get('WEBHOOK_TIMEOUT_SECONDS', '5'))
+
+# Failed deliveries reappear after an exponentially growing delay (SQS caps it at 12 h)
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 900
+
+MAX_CALLBACK_URL_LENGTH = 2048
+SIGNATURE_HEADER = 'X-DocGenius-Signature'
+TIMESTAMP_HEADER = 'X-DocGenius-Timestamp'
+DELIVERY_HEADER = 'X-DocGenius-Delivery'
+
+def callback_fields(descriptor):
+    """Callback URL recorded on a job from the descriptor's 'callbackUrl'.
+
+    Raises BadRequest for anything but a public https URL.
+    """
+    url = descriptor.get('callbackUrl')
+    if not url:
+        return {}
+    if not isinstance(url, str) or len(url) > MAX_CALLBACK_URL_LENGTH:
+        raise BadRequest('callbackUrl must be a URL string')
+
+    parsed = urlparse(url)
+    if parsed.scheme != 'https' or not parsed.hostname or parsed.username or parsed.password:
+        raise BadRequest('callbackUrl must be an https URL without credentials')
+    try:
+        address = ipaddress.ip_address(parsed.hostname)
+    except ValueError:
+        address = None
+    if address and not address.is_global:
+        raise BadRequest('callbackUrl must not point at a private address')
+
+    return {'callbackUrl': url}
+
+def enqueue_delivery(sqs, callback_url, payload):
+    """Queue a webhook for delivery; the queue's redrive policy dead-letters repeated failures"""
+    if not WEBHOOK_QUEUE_URL:
+        return
+    try:
+        sqs.send_message(
+            QueueUrl=WEBHOOK_QUEUE_URL,
+            MessageBody=json.dumps({
+                'deliveryId': str(uuid.uuid4()),
+                'callbackUrl': callback_url,
+                'payload': payload
+            })
+        )
+    except Exception as e:
+        # Clients can still fall back to polling job-status
+        print(f"Error queueing webhook for job {payload.get('jobId')}: {e}")
+
+def sign(secret, timestamp, body):
+    """HMAC-SHA256 over '<timestamp>.<body>', as sent in the signature header"""
+    message = f"{timestamp}.{body}".encode('utf-8')
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+def deliver(delivery, secret):
+    """POST one signed webhook; raises on network errors, non-2xx responses and private destinations"""
+    # Only the delivery Lambda needs urllib.request; api_handler imports this module too
+    import urllib.request
+
+    parsed = urlparse(delivery['callbackUrl'])
+    if parsed.scheme != 'https':
+        raise ValueError('callbackUrl must be an https URL')
+    address = public_address(parsed.hostname, parsed.port or 443)
+
+    body = json.dumps(delivery['payload'], sort_keys=True)
+    timestamp = str(int(time.time()))
+    request = urllib.request.Request(
+        delivery['callbackUrl'],
+        data=body.encode('utf-8'),
+        method='POST',
+        headers={
+            'Content-Type': 'application/json',
+            'User-Agent': 'DocGenius-Webhook/1.0',
+            SIGNATURE_HEADER: sign(secret, timestamp, body),
+            TIMESTAMP_HEADER: timestamp,
+            DELIVERY_HEADER: delivery['deliveryId']
+        }
+    )
+    opener = urllib.request.build_opener(no_redirect_handler(), pinned_https_handler(address))
+    with opener.open(request, timeout=WEBHOOK_TIMEOUT_SECONDS) as response:
+        return response.status
+
+def retry_delay(receive_count):
+    """Visibility timeout before the next attempt of a failed delivery (full jitter)"""
+    ceiling = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, receive_count - 1))
+    return int(random.uniform(RETRY_BASE_SECONDS, ceiling))
+
+def public_address(host, port):
+    """An address host resolves to; ValueError if any of its addresses is not public.
+
+    callback_fields only sees literal IPs at submit time, and a DNS name can
+    point anywhere (or change) later, so every delivery resolves it again.
+    """
+    import socket
+
+    addresses = [info[4][0] for info in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)]
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ValueError(f"callbackUrl host {host} resolves to non-public address {address}")
+    return addresses[0]
+
+def pinned_https_handler(address):
+    """An HTTPS handler that connects to the checked address, not whatever a second lookup returns"""
+    import http.client
+    import socket
+    import urllib.request
+
+    class PinnedHTTPSConnection(http.client.HTTPSConnection):
+        def connect(self):
+            # Certificate and SNI still use the URL's host name
+            sock = socket.create_connection((address, self.port), self.timeout)
+            self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+    class PinnedHTTPSHandler(urllib.request.HTTPSHandler):
+        def https_open(self, req):
+            return self.do_open(PinnedHTTPSConnection, req, context=self._context)
+
+    return PinnedHTTPSHandler()
+
+def no_redirect_handler():
+    """A handler that treats redirects as failures, so a callback cannot be bounced to another host"""
+    import urllib.error
+    import urllib.request
+
+    class NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, req, fp, code, msg, headers, newurl):
+            raise urllib.error.HTTPError(req.full_url, code, f"redirect to {newurl} not followed", headers, fp)
+
+    return NoRedirect()
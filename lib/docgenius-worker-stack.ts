@@ -2,13 +2,18 @@ import * as cdk from 'aws-cdk-lib';
 import * as lambda from 'aws-cdk-lib/aws-lambda';
 import * as apigateway from 'aws-cdk-lib/aws-apigateway';
 import * as s3 from 'aws-cdk-lib/aws-s3';
+import * as s3n from 'aws-cdk-lib/aws-s3-notifications';
 import * as dynamodb from 'aws-cdk-lib/aws-dynamodb';
 import * as sns from 'aws-cdk-lib/aws-sns';
+import * as sqs from 'aws-cdk-lib/aws-sqs';
+import * as lambdaEventSources from 'aws-cdk-lib/aws-lambda-event-sources';
 import * as stepfunctions from 'aws-cdk-lib/aws-stepfunctions';
 import * as sfnTasks from 'aws-cdk-lib/aws-stepfunctions-tasks';
 import * as iam from 'aws-cdk-lib/aws-iam';
 import * as kms from 'aws-cdk-lib/aws-kms';
+import * as secretsmanager from 'aws-cdk-lib/aws-secretsmanager';
 import * as events from 'aws-cdk-lib/aws-events';
+import * as cloudwatch from 'aws-cdk-lib/aws-cloudwatch';
 import * as targets from 'aws-cdk-lib/aws-events-targets';
 import { Construct } from 'constructs';
 
@@ -36,6 +41,14 @@ export class DocGeniusWorkerStack extends cdk.Stack {
         id: 'DeleteAfterOneDay',
         enabled: true,
         expiration: cdk.Duration.days(1),
+        abortIncompleteMultipartUploadAfter: cdk.Duration.days(1),
+      }],
+      cors: [{
+        // Browsers upload archives straight to S3 via presigned URLs
+        allowedMethods: [s3.HttpMethods.PUT],
+        allowedOrigins: ['*'],
+        allowedHeaders: ['*'],
+        exposedHeaders: ['ETag'],
       }],
       removalPolicy: cdk.RemovalPolicy.DESTROY,
     });
@@ -68,11 +81,139 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       partitionKey: { name: 'status', type: dynamodb.AttributeType.STRING },
     });
 
+    // Sparse: only jobs submitted through POST /generate-spec/batch carry a batchId
+    jobTable.addGlobalSecondaryIndex({
+      indexName: 'batch-index',
+      partitionKey: { name: 'batchId', type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.INCLUDE,
+      nonKeyAttributes: ['status', 'descriptorIndex'],
+    });
+
+    // Sparse: jobs by submission hour until cleaned, so the cleanup sweep queries instead of scanning
+    jobTable.addGlobalSecondaryIndex({
+      indexName: 'cleanup-index',
+      partitionKey: { name: 'cleanupBucket', type: dynamodb.AttributeType.STRING },
+      sortKey: { name: 'submitTime', type: dynamodb.AttributeType.NUMBER },
+      projectionType: dynamodb.ProjectionType.INCLUDE,
+      nonKeyAttributes: ['status', 'inputKey', 'descriptorKey', 'batchId'],
+    });
+
+    // Content-addressed result cache: identical submissions skip Bedrock
+    const cacheTable = new dynamodb.Table(this, 'CacheTable', {
+      tableName: 'DocGeniusWorkerResultCache',
+      partitionKey: { name: 'cacheKey', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: 'expiresAt',
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
+    // Per-file summaries keyed by content hash, reused across archive versions
+    const summaryTable = new dynamodb.Table(this, 'SummaryTable', {
+      tableName: 'DocGeniusWorkerSummaries',
+      partitionKey: { name: 'summaryKey', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      timeToLiveAttribute: 'expiresAt',
+      encryption: dynamodb.TableEncryption.CUSTOMER_MANAGED,
+      encryptionKey: kmsKey,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
+    // Shared Bedrock token bucket: one item per model, updated with conditional writes
+    const rateLimitTable = new dynamodb.Table(this, 'RateLimitTable', {
+      tableName: 'DocGeniusWorkerRateLimits',
+      partitionKey: { name: 'limiterKey', type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
     // SNS Topic
     const eventsTopic = new sns.Topic(this, 'EventsTopic', {
       topicName: 'DocGeniusWorkerEvents',
     });
 
+    // Admission queue signals: the jobs table holds the queue, messages wake the dispatcher
+    const dispatchQueue = new sqs.Queue(this, 'DispatchQueue', {
+      queueName: 'DocGeniusWorkerDispatch',
+      visibilityTimeout: cdk.Duration.seconds(360),
+      retentionPeriod: cdk.Duration.hours(1),
+      encryption: sqs.QueueEncryption.KMS_MANAGED,
+    });
+
+    // Job callback webhooks: deliveries are retried with backoff, then dead-lettered
+    const webhookDeadLetterQueue = new sqs.Queue(this, 'WebhookDeadLetterQueue', {
+      queueName: 'DocGeniusWorkerWebhooksDLQ',
+      retentionPeriod: cdk.Duration.days(14),
+      encryption: sqs.QueueEncryption.KMS_MANAGED,
+    });
+
+    const webhookQueue = new sqs.Queue(this, 'WebhookQueue', {
+      queueName: 'DocGeniusWorkerWebhooks',
+      visibilityTimeout: cdk.Duration.seconds(60),
+      retentionPeriod: cdk.Duration.days(1),
+      encryption: sqs.QueueEncryption.KMS_MANAGED,
+      deadLetterQueue: {
+        queue: webhookDeadLetterQueue,
+        maxReceiveCount: 6,
+      },
+    });
+
+    // Receivers verify the X-DocGenius-Signature HMAC with this secret
+    const webhookSigningSecret = new secretsmanager.Secret(this, 'WebhookSigningSecret', {
+      description: 'HMAC key for DocGenius Worker webhook signatures',
+      encryptionKey: kmsKey,
+      generateSecretString: {
+        passwordLength: 48,
+        excludePunctuation: true,
+      },
+    });
+
+    // Handlers log per-stage timings as embedded metrics under this namespace;
+    // jobs slower than the SLA (submission to completion) count as breaches
+    const metricsNamespace = 'DocGenius';
+    const slaSeconds = 120;
+
+    // Generation settings shared by SpecGenerator and the API's synchronous fast path
+    const generationEnvironment = {
+      BEDROCK_MODEL_ID: 'amazon.nova-micro-v1:0',
+      MAX_TOKENS: '4000',
+      MODEL_CONTEXT_TOKENS: '128000',
+      CACHE_TABLE: cacheTable.tableName,
+      CACHE_TTL_HOURS: '20',
+      GENERATION_MODE: 'auto',
+      MAP_CONCURRENCY: '4',
+      MAP_MAX_RETRIES: '2',
+      SUMMARY_TABLE: summaryTable.tableName,
+      SUMMARY_TTL_DAYS: '30',
+      SECTION_MAX_TOKENS: '1500',
+      SECTION_TIMEOUT_SECONDS: '90',
+      SECTION_DEADLINE_SECONDS: '200',
+      STREAMING_ENABLED: 'true',
+      PROGRESS_INTERVAL_SECONDS: '3',
+      OUTPUT_UPLOAD_CONCURRENCY: '4',
+      OUTPUT_FORMATS: 'html,pdf',
+      RATE_LIMIT_TABLE: rateLimitTable.tableName,
+      BEDROCK_RATE_INITIAL: '4',
+      BEDROCK_RATE_MAX: '20',
+      BEDROCK_MAX_RETRIES: '6',
+      MODEL_ROUTES: JSON.stringify([
+        { name: 'small', modelId: 'amazon.nova-micro-v1:0', maxInputTokens: 8000, maxTokens: 2000, contextTokens: 128000 },
+        { name: 'standard', modelId: 'amazon.nova-micro-v1:0', maxInputTokens: 100000, maxTokens: 4000, contextTokens: 128000 },
+        { name: 'large', modelId: 'amazon.nova-lite-v1:0', maxTokens: 4000, contextTokens: 300000 },
+      ]),
+      HEDGING_ENABLED: 'false',
+      HEDGE_PERCENTILE: '95',
+      HEDGE_DEFAULT_MS: '30000',
+      METRICS_NAMESPACE: metricsNamespace,
+      SLA_SECONDS: String(slaSeconds),
+      PROFILE_SAMPLE_RATE: '0',
+    };
+
+    const bedrockInvokePolicy = new iam.PolicyStatement({
+      effect: iam.Effect.ALLOW,
+      actions: ['bedrock:InvokeModel', 'bedrock:InvokeModelWithResponseStream'],
+      resources: ['*'],
+    });
+
     // Lambda Functions
     const apiHandlerRole = new iam.Role(this, 'ApiHandlerRole', {
       assumedBy: new iam.ServicePrincipal('lambda.amazonaws.com'),
@@ -81,8 +222,16 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       ],
     });
 
-    inputBucket.grantWrite(apiHandlerRole);
-    jobTable.grantWriteData(apiHandlerRole);
+    inputBucket.grantReadWrite(apiHandlerRole);
+    jobTable.grantReadWriteData(apiHandlerRole);
+    dispatchQueue.grantSendMessages(apiHandlerRole);
+
+    // ?mode=sync generates small jobs inside the API handler
+    outputBucket.grantReadWrite(apiHandlerRole);
+    cacheTable.grantReadWriteData(apiHandlerRole);
+    summaryTable.grantReadWriteData(apiHandlerRole);
+    rateLimitTable.grantReadWriteData(apiHandlerRole);
+    apiHandlerRole.addToPolicy(bedrockInvokePolicy);
 
     const apiHandler = new lambda.Function(this, 'ApiHandler', {
       runtime: lambda.Runtime.PYTHON_3_9,
@@ -90,13 +239,41 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       code: lambda.Code.fromAsset('lambda'),
       role: apiHandlerRole,
       timeout: cdk.Duration.seconds(300),
+      memorySize: 1024,
       environment: {
         INPUT_BUCKET: inputBucket.bucketName,
+        OUTPUT_BUCKET: outputBucket.bucketName,
         JOB_TABLE: jobTable.tableName,
         KMS_KEY_ARN: kmsKey.keyArn,
+        DISPATCH_QUEUE_URL: dispatchQueue.queueUrl,
+        MAX_BATCH_JOBS: '100',
+        SYNC_MAX_ARCHIVE_BYTES: String(256 * 1024),
+        SYNC_TIMEOUT_SECONDS: '25',
+        IDEMPOTENCY_TTL_HOURS: '24',
+        ...generationEnvironment,
+      },
+    });
+
+    // Starts jobs once a presigned archive upload lands in the input bucket
+    const uploadCompleteHandler = new lambda.Function(this, 'UploadCompleteHandler', {
+      runtime: lambda.Runtime.PYTHON_3_9,
+      handler: 'api_handler.upload_complete_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      role: apiHandlerRole,
+      timeout: cdk.Duration.seconds(60),
+      environment: {
+        INPUT_BUCKET: inputBucket.bucketName,
+        JOB_TABLE: jobTable.tableName,
+        DISPATCH_QUEUE_URL: dispatchQueue.queueUrl,
       },
     });
 
+    inputBucket.addEventNotification(
+      s3.EventType.OBJECT_CREATED,
+      new s3n.LambdaDestination(uploadCompleteHandler),
+      { suffix: 'archive.zip' },
+    );
+
     const specGeneratorRole = new iam.Role(this, 'SpecGeneratorRole', {
       assumedBy: new iam.ServicePrincipal('lambda.amazonaws.com'),
       managedPolicies: [
@@ -105,14 +282,13 @@ export class DocGeniusWorkerStack extends cdk.Stack {
     });
 
     inputBucket.grantRead(specGeneratorRole);
-    outputBucket.grantWrite(specGeneratorRole);
+    outputBucket.grantReadWrite(specGeneratorRole);
     jobTable.grantReadWriteData(specGeneratorRole);
+    cacheTable.grantReadWriteData(specGeneratorRole);
+    summaryTable.grantReadWriteData(specGeneratorRole);
+    rateLimitTable.grantReadWriteData(specGeneratorRole);
     
-    specGeneratorRole.addToPolicy(new iam.PolicyStatement({
-      effect: iam.Effect.ALLOW,
-      actions: ['bedrock:InvokeModel'],
-      resources: ['*'],
-    }));
+    specGeneratorRole.addToPolicy(bedrockInvokePolicy);
 
     const specGenerator = new lambda.Function(this, 'SpecGenerator', {
       runtime: lambda.Runtime.PYTHON_3_9,
@@ -125,8 +301,7 @@ export class DocGeniusWorkerStack extends cdk.Stack {
         INPUT_BUCKET: inputBucket.bucketName,
         OUTPUT_BUCKET: outputBucket.bucketName,
         JOB_TABLE: jobTable.tableName,
-        BEDROCK_MODEL_ID: 'amazon.nova-micro-v1:0',
-        MAX_TOKENS: '4000',
+        ...generationEnvironment,
       },
     });
 
@@ -139,6 +314,8 @@ export class DocGeniusWorkerStack extends cdk.Stack {
 
     inputBucket.grantDelete(cleanupRole);
     outputBucket.grantDelete(cleanupRole);
+    // Failed jobs' outputs are found by listing their prefix
+    outputBucket.grantRead(cleanupRole);
     jobTable.grantReadWriteData(cleanupRole);
 
     const cleanup = new lambda.Function(this, 'Cleanup', {
@@ -151,6 +328,9 @@ export class DocGeniusWorkerStack extends cdk.Stack {
         INPUT_BUCKET: inputBucket.bucketName,
         OUTPUT_BUCKET: outputBucket.bucketName,
         JOB_TABLE: jobTable.tableName,
+        CLEANUP_RETENTION_HOURS: '24',
+        CLEANUP_TIME_RESERVE_SECONDS: '30',
+        CLEANUP_CONCURRENCY: '16',
       },
     });
 
@@ -162,6 +342,8 @@ export class DocGeniusWorkerStack extends cdk.Stack {
     });
 
     eventsTopic.grantPublish(notifyRole);
+    dispatchQueue.grantSendMessages(notifyRole);
+    webhookQueue.grantSendMessages(notifyRole);
     outputBucket.grantRead(notifyRole);
     jobTable.grantReadData(notifyRole);
 
@@ -174,6 +356,8 @@ export class DocGeniusWorkerStack extends cdk.Stack {
         SNS_TOPIC_ARN: eventsTopic.topicArn,
         OUTPUT_BUCKET: outputBucket.bucketName,
         JOB_TABLE: jobTable.tableName,
+        DISPATCH_QUEUE_URL: dispatchQueue.queueUrl,
+        WEBHOOK_QUEUE_URL: webhookQueue.queueUrl,
       },
     });
 
@@ -185,9 +369,32 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       environment: {
         SNS_TOPIC_ARN: eventsTopic.topicArn,
         JOB_TABLE: jobTable.tableName,
+        DISPATCH_QUEUE_URL: dispatchQueue.queueUrl,
+        WEBHOOK_QUEUE_URL: webhookQueue.queueUrl,
       },
     });
 
+    const webhookDelivery = new lambda.Function(this, 'WebhookDelivery', {
+      runtime: lambda.Runtime.PYTHON_3_9,
+      handler: 'notify.webhook_handler',
+      code: lambda.Code.fromAsset('lambda'),
+      timeout: cdk.Duration.seconds(60),
+      environment: {
+        JOB_TABLE: jobTable.tableName,
+        WEBHOOK_QUEUE_URL: webhookQueue.queueUrl,
+        WEBHOOK_SECRET_ARN: webhookSigningSecret.secretArn,
+        WEBHOOK_TIMEOUT_SECONDS: '5',
+      },
+    });
+
+    webhookSigningSecret.grantRead(webhookDelivery);
+    webhookQueue.grantConsumeMessages(webhookDelivery);
+    webhookDelivery.addEventSource(new lambdaEventSources.SqsEventSource(webhookQueue, {
+      batchSize: 10,
+      maxBatchingWindow: cdk.Duration.seconds(1),
+      reportBatchItemFailures: true,
+    }));
+
     // Step Functions State Machine
     const generateSpecTask = new sfnTasks.LambdaInvoke(this, 'GenerateSpecTask', {
       lambdaFunction: specGenerator,
@@ -213,6 +420,8 @@ export class DocGeniusWorkerStack extends cdk.Stack {
     const definition = generateSpecTask
       .addCatch(notifyFailureTask.next(cleanupTask), {
         errors: ['States.ALL'],
+        // Keep the job input (jobId) alongside the error
+        resultPath: '$.error',
       })
       .next(notifySuccessTask)
       .next(waitForRetention)
@@ -236,6 +445,7 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       defaultCorsPreflightOptions: {
         allowOrigins: apigateway.Cors.ALL_ORIGINS,
         allowMethods: apigateway.Cors.ALL_METHODS,
+        allowHeaders: [...apigateway.Cors.DEFAULT_HEADERS, 'Idempotency-Key', 'If-None-Match'],
       },
       binaryMediaTypes: [
         'multipart/form-data',
@@ -246,24 +456,36 @@ export class DocGeniusWorkerStack extends cdk.Stack {
 
     const generateSpecIntegration = new apigateway.LambdaIntegration(apiHandler);
     
-    api.root.addResource('generate-spec').addMethod('POST', generateSpecIntegration);
+    const generateSpecResource = api.root.addResource('generate-spec');
+    generateSpecResource.addMethod('POST', generateSpecIntegration);
+    generateSpecResource.addResource('batch').addMethod('POST', generateSpecIntegration);
+    generateSpecResource
+      .addResource('{jobId}')
+      .addResource('complete')
+      .addMethod('POST', generateSpecIntegration);
 
     const jobStatusHandler = new lambda.Function(this, 'JobStatusHandler', {
       runtime: lambda.Runtime.PYTHON_3_9,
       handler: 'job_status.handler',
       code: lambda.Code.fromAsset('lambda'),
+      // Long enough for a ?waitSeconds= long-poll
+      timeout: cdk.Duration.seconds(29),
       environment: {
         JOB_TABLE: jobTable.tableName,
         OUTPUT_BUCKET: outputBucket.bucketName,
+        MAX_WAIT_SECONDS: '20',
       },
     });
 
-    jobTable.grantReadData(jobStatusHandler);
+    // Read-write so a stale download URL can be re-signed and stored once
+    jobTable.grantReadWriteData(jobStatusHandler);
     outputBucket.grantRead(jobStatusHandler);
 
     const jobStatusIntegration = new apigateway.LambdaIntegration(jobStatusHandler);
     const jobResource = api.root.addResource('job-status');
     jobResource.addResource('{jobId}').addMethod('GET', jobStatusIntegration);
+    jobResource.addResource('batch').addMethod('POST', jobStatusIntegration);
+    api.root.addResource('batch-status').addResource('{batchId}').addMethod('GET', jobStatusIntegration);
 
     // EventBridge rule for cleanup
     new events.Rule(this, 'CleanupRule', {
@@ -271,9 +493,100 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       targets: [new targets.LambdaFunction(cleanup)],
     });
 
-    // Grant API handler permission to start Step Functions
-    stateMachine.grantStartExecution(apiHandlerRole);
-    apiHandler.addEnvironment('STATE_MACHINE_ARN', stateMachine.stateMachineArn);
+    // Admission dispatcher: the only starter of Step Functions executions
+    const dispatcherRole = new iam.Role(this, 'DispatcherRole', {
+      assumedBy: new iam.ServicePrincipal('lambda.amazonaws.com'),
+      managedPolicies: [
+        iam.ManagedPolicy.fromAwsManagedPolicyName('service-role/AWSLambdaBasicExecutionRole'),
+      ],
+    });
+
+    jobTable.grantReadWriteData(dispatcherRole);
+    stateMachine.grantStartExecution(dispatcherRole);
+
+    const dispatcher = new lambda.Function(this, 'Dispatcher', {
+      runtime: lambda.Runtime.PYTHON_3_9,
+      handler: 'dispatcher.handler',
+      code: lambda.Code.fromAsset('lambda'),
+      role: dispatcherRole,
+      timeout: cdk.Duration.seconds(60),
+      // One dispatcher at a time keeps the in-flight count honest
+      reservedConcurrentExecutions: 1,
+      environment: {
+        JOB_TABLE: jobTable.tableName,
+        STATE_MACHINE_ARN: stateMachine.stateMachineArn,
+        MAX_INFLIGHT_JOBS: '10',
+        ESTIMATED_JOB_SECONDS: '90',
+        PRIORITY_AGING_SECONDS: '900',
+        STALE_IN_FLIGHT_SECONDS: '1800',
+      },
+    });
+
+    dispatcher.addEventSource(new lambdaEventSources.SqsEventSource(dispatchQueue, {
+      batchSize: 10,
+      maxBatchingWindow: cdk.Duration.seconds(1),
+    }));
+
+    // Catch slots freed by jobs that ended without a notification
+    new events.Rule(this, 'DispatchRule', {
+      schedule: events.Schedule.rate(cdk.Duration.minutes(1)),
+      targets: [new targets.LambdaFunction(dispatcher)],
+    });
+
+    // p95 end-to-end job latency above the SLA in 2 of 3 five-minute periods
+    const jobLatency = (statistic: string) => new cloudwatch.Metric({
+      namespace: metricsNamespace,
+      metricName: 'JobLatencyMs',
+      statistic,
+      period: cdk.Duration.minutes(5),
+    });
+    const slaAlarm = new cloudwatch.Alarm(this, 'JobLatencySlaAlarm', {
+      alarmName: 'DocGeniusWorkerJobLatencySla',
+      alarmDescription: `p95 job latency (submission to completion) is above the ${slaSeconds} s SLA`,
+      metric: jobLatency('p95'),
+      threshold: slaSeconds * 1000,
+      comparisonOperator: cloudwatch.ComparisonOperator.GREATER_THAN_THRESHOLD,
+      evaluationPeriods: 3,
+      datapointsToAlarm: 2,
+      treatMissingData: cloudwatch.TreatMissingData.NOT_BREACHING,
+    });
+
+    // Where generation time goes: p50/p95 per SpecGenerator stage
+    const generationStages = ['start', 'download', 'unzip', 'compact', 'cache', 'prompt', 'bedrock', 'render', 'upload'];
+    const stageMetric = (stage: string, statistic: string) => new cloudwatch.Metric({
+      namespace: metricsNamespace,
+      metricName: 'StageMs',
+      dimensionsMap: { Function: 'SpecGenerator', Stage: stage },
+      statistic,
+      label: `${stage} ${statistic}`,
+      period: cdk.Duration.minutes(5),
+    });
+    new cloudwatch.Dashboard(this, 'LatencyDashboard', {
+      dashboardName: 'DocGeniusWorkerLatency',
+      widgets: [
+        [
+          new cloudwatch.GraphWidget({
+            title: 'Job latency (ms)',
+            left: [jobLatency('p50'), jobLatency('p95')],
+            leftAnnotations: [{ value: slaSeconds * 1000, label: 'SLA' }],
+            width: 24,
+          }),
+        ],
+        [
+          new cloudwatch.GraphWidget({
+            title: 'Generation stages p50 (ms)',
+            left: generationStages.map((stage) => stageMetric(stage, 'p50')),
+            stacked: true,
+            width: 12,
+          }),
+          new cloudwatch.GraphWidget({
+            title: 'Generation stages p95 (ms)',
+            left: generationStages.map((stage) => stageMetric(stage, 'p95')),
+            width: 12,
+          }),
+        ],
+      ],
+    });
 
     // Outputs
     new cdk.CfnOutput(this, 'ApiUrl', {
@@ -290,5 +603,20 @@ export class DocGeniusWorkerStack extends cdk.Stack {
       value: outputBucket.bucketName,
       description: 'Output S3 Bucket Name',
     });
+
+    new cdk.CfnOutput(this, 'WebhookSigningSecretArn', {
+      value: webhookSigningSecret.secretArn,
+      description: 'Secret used to sign webhook callbacks',
+    });
+
+    new cdk.CfnOutput(this, 'WebhookDeadLetterQueueUrl', {
+      value: webhookDeadLetterQueue.queueUrl,
+      description: 'Webhook deliveries that exhausted their retries',
+    });
+
+    new cdk.CfnOutput(this, 'JobLatencySlaAlarmArn', {
+      value: slaAlarm.alarmArn,
+      description: 'Alarm on p95 job latency above the SLA',
+    });
   }
 }
\ No newline at end of file
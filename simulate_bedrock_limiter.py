@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Burst simulation for the shared Bedrock rate limiter
+Runs many simulated SpecGenerator containers against a fake throttling model,
+with and without the limiter, using the in-memory bucket store
+"""
+
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, 'lambda')
+
+from bedrock_limiter import InMemoryBucketStore, RateLimiter
+
+class ThrottlingError(Exception):
+    """Looks like a botocore ClientError for ThrottlingException"""
+
+    def __init__(self):
+        super().__init__('Rate exceeded')
+        self.response = {'Error': {'Code': 'ThrottlingException'}}
+
+class FakeModel:
+    """Admits `capacity` requests per second and throttles everything above it"""
+
+    def __init__(self, capacity, latency):
+        self.capacity = capacity
+        self.latency = latency
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.accepted = 0
+        self.throttled = 0
+
+    def invoke(self, prompt):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity)
+            self.updated = now
+            if self.tokens < 1:
+                self.throttled += 1
+                raise ThrottlingError()
+            self.tokens -= 1
+            self.accepted += 1
+        time.sleep(self.latency)
+        return f"summary of {prompt}"
+
+def run(containers, calls, model, use_limiter):
+    store = InMemoryBucketStore()
+    failures = []
+
+    def container(number):
+        limiter = RateLimiter(store, 'bedrock:fake', initial_rate=model.capacity / 2, max_rate=model.capacity * 2)
+        for call in range(calls):
+            try:
+                if use_limiter:
+                    limiter.call(model.invoke, f"{number}-{call}")
+                else:
+                    model.invoke(f"{number}-{call}")
+            except Exception as e:
+                failures.append(e)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=containers) as executor:
+        list(executor.map(container, range(containers)))
+    elapsed = time.monotonic() - started
+
+    total = containers * calls
+    print(f"{'limiter' if use_limiter else 'no limiter':>10}: "
+          f"{total - len(failures)}/{total} calls succeeded, {len(failures)} failed, "
+          f"{model.throttled} throttles, {model.accepted / elapsed:.1f} calls/s "
+          f"(capacity {model.capacity}/s) in {elapsed:.1f}s")
+    return len(failures)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--containers', type=int, default=40)
+    parser.add_argument('--calls', type=int, default=5)
+    parser.add_argument('--capacity', type=float, default=20)
+    parser.add_argument('--latency', type=float, default=0.2)
+    args = parser.parse_args()
+
+    run(args.containers, args.calls, FakeModel(args.capacity, args.latency), use_limiter=False)
+    failed = run(args.containers, args.calls, FakeModel(args.capacity, args.latency), use_limiter=True)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
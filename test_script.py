@@ -135,25 +135,36 @@ def submit_job():
         print(f"Error submitting job: {response.status_code} - {response.text}")
         return None
 
-def check_job_status(job_id):
-    """Check the status of a job"""
+def check_job_status(job_id, wait_seconds=0, etag=None):
+    """Check the status of a job, long-polling for up to wait_seconds for a change"""
     
     print(f"Checking status for job {job_id}...")
-    response = requests.get(f"{API_BASE_URL}/job-status/{job_id}")
+    headers = {"If-None-Match": etag} if etag else {}
+    response = requests.get(
+        f"{API_BASE_URL}/job-status/{job_id}",
+        params={"waitSeconds": wait_seconds} if wait_seconds else None,
+        headers=headers,
+        timeout=wait_seconds + 10
+    )
     
     if response.status_code == 200:
-        return response.json()
+        return response.json(), response.headers.get("ETag")
+    elif response.status_code == 304:
+        return None, etag
     else:
         print(f"Error checking status: {response.status_code} - {response.text}")
-        return None
+        time.sleep(5)
+        return None, etag
 
 def wait_for_completion(job_id, max_wait_time=300):
-    """Wait for job completion with polling"""
+    """Wait for job completion with long-polling"""
     
     start_time = time.time()
+    etag = None
     
     while time.time() - start_time < max_wait_time:
-        status_data = check_job_status(job_id)
+        # Returns as soon as the job changes, or after 20 seconds without a change
+        status_data, etag = check_job_status(job_id, wait_seconds=20, etag=etag)
         
         if status_data:
             status = status_data['status']
@@ -168,9 +179,6 @@ def wait_for_completion(job_id, max_wait_time=300):
                 error_msg = status_data.get('errorMessage', 'Unknown error')
                 print(f"Job failed: {error_msg}")
                 return False
-        
-        print("Waiting 10 seconds before next check...")
-        time.sleep(10)
     
     print("Timeout waiting for job completion")
     return False